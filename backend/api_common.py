@@ -0,0 +1,322 @@
+# api_common.py
+# Description: response cache, predictors and request/response formatting shared by the
+# Flask app (app.py) and the async server (async_app.py). Importing it starts nothing:
+# no web app, no background refresh or pre-warm threads.
+import os
+import json
+from typing import Dict, Any, List, Union
+from datetime import datetime, timedelta
+
+import diskcache as dc
+from flask.json.provider import DefaultJSONProvider
+
+from clients import load_env
+from event_prediction.event_predictor import EventPredictor, PredictorType
+from event_prediction.event_predictor import Event, NewsEvent, News
+
+# Set environment variable to avoid tokenizers warning
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+# Load environment variables
+load_env()
+API_KEY = os.getenv("EVENT_PREDICTION_OPENAI_API_KEY")
+
+from news_handler.advisor import generate_tactical_signals
+from news_handler.risk_opportunity_advisor import generate_risk_opportunity_signals
+
+# Use disk-based cache for larger responses
+cache_dir = os.path.join(os.path.dirname(__file__), 'cache')
+os.makedirs(cache_dir, exist_ok=True)
+cache = dc.Cache(cache_dir)
+
+# Entries younger than the soft TTL are fresh. Between soft and hard TTL the stale
+# entry is served immediately and recomputed in the background; past the hard TTL
+# the request recomputes synchronously.
+CACHE_SOFT_TTL_MINUTES = float(os.getenv("CACHE_SOFT_TTL_MINUTES", 25))
+CACHE_HARD_TTL_MINUTES = float(os.getenv("CACHE_HARD_TTL_MINUTES", 120))
+# Scenarios one /api/predict/batch request may ask for
+PREDICTION_BATCH_MAX_SCENARIOS = int(os.getenv("PREDICTION_BATCH_MAX_SCENARIOS", 20))
+
+# Initialize event predictors for both market and personal predictions
+market_predictor = EventPredictor(api_key=API_KEY, predictor_type=PredictorType.PUBLIC)
+personal_predictor = EventPredictor(api_key=API_KEY, predictor_type=PredictorType.PUBLIC)
+
+def json_dumps(data) -> str:
+    """JSON the way Flask's jsonify writes it (News dataclasses in results, datetimes)"""
+    return json.dumps(data, default=DefaultJSONProvider.default, ensure_ascii=DefaultJSONProvider.ensure_ascii,
+                      sort_keys=DefaultJSONProvider.sort_keys)
+
+# Helper function to check cache validity
+def is_cache_valid(cache_time, max_age_minutes=30):
+    """Check if cached data is still valid"""
+    if not cache_time:
+        return False
+    age = datetime.now() - cache_time
+    return age < timedelta(minutes=max_age_minutes)
+
+# Helper function to read a cache entry with its age
+def get_cache_entry(data_source, cache_key):
+    """Return (data, age in minutes), or (None, None) when there is no entry"""
+    full_key = f"{data_source}_{cache_key}"
+    cached_data = cache.get(full_key)
+    if not cached_data or not cached_data.get("timestamp"):
+        return None, None
+    age = (datetime.now() - cached_data["timestamp"]).total_seconds() / 60
+    return cached_data["data"], age
+
+# Helper function to get cached data
+def get_cached_data(data_source, cache_key, max_age_minutes=CACHE_SOFT_TTL_MINUTES):
+    """Get data from cache if valid"""
+    full_key = f"{data_source}_{cache_key}"
+    data, age = get_cache_entry(data_source, cache_key)
+    if data and age < max_age_minutes:
+        print(f"Using cached data for {full_key}")
+        return data
+    return None
+
+# Helper function to store data in cache
+def set_cached_data(data_source, cache_key, data):
+    """Store data in cache with timestamp"""
+    full_key = f"{data_source}_{cache_key}"
+    cache.set(full_key, {
+        "data": data,
+        "timestamp": datetime.now()
+    }, expire=CACHE_HARD_TTL_MINUTES * 60)
+    print(f"Cached data for {full_key}")
+
+# Helper functions for data formatting
+def format_news_item(item: Union[dict, Any]) -> Dict[str, Any]:
+    """
+    Normalize a news‐item into {title, news_content}.
+    Handles either:
+     - A dict (with keys "title" and "news_content" or "summary")
+     - Any object with .title and .news_content attributes
+    """
+    # object with attributes
+    if hasattr(item, "title") and hasattr(item, "news_content"):
+        return {
+            "title": item.title,
+            "news_content": item.news_content
+        }
+
+    # plain dict
+    if isinstance(item, dict):
+        return {
+            "title": item.get("title", ""),
+            # some of your dicts use "news_content", others "summary"
+            "news_content": item.get("news_content", item.get("summary", ""))
+        }
+
+    # ultimate fallback
+    return {
+        "title": str(item),
+        "news_content": ""
+    }
+
+def format_event_for_response(event, event_id: int, max_news: int = 5) -> Dict[str, Any]:
+    print(f"checking event: {event} \n\n ---")
+    if isinstance(event, NewsEvent):
+        event_content = event.event_content
+        event_topic = getattr(event, "topic", "Unknown Topic")
+        # news_list = [format_news_item(news) for news in event.news_list[:max_news]]
+        news_list = [news for news in event.news_list[:max_news]]
+        risk = getattr(event, "risk", None)
+        opportunity = getattr(event, "opportunity", None)
+        rationale = getattr(event, "rationale", None)
+    else:
+        event_content = event.get("summary", "Summary not available.")
+        event_topic = event.get("topic", "Unknown Topic")  # <-- TODO: FIX THIS LINE!!
+        # news_list = [format_news_item(news) for news in event.get("news_list", [])[:max_news]]
+        news_list = [news for news in event.get("news_list", [])[:max_news]]
+        risk = event.get("risk")
+        opportunity = event.get("opportunity")
+        rationale = event.get("rationale")
+        
+    
+    return {
+        "event_id": event_id,
+        "event_content": event_content,
+        "topic": event_topic,
+        "news_list": news_list,
+        "risk": risk,
+        "opportunity": opportunity,
+        "rationale": rationale
+    }
+
+def format_prediction_for_response(prediction) -> Dict[str, Any]:
+    """Format a prediction for API response"""
+    return {
+        "content": prediction.content,
+        "confidence_score": prediction.confidency_score,
+        "reason": prediction.reason,
+        "cause": [{
+            "weight": cause.weight,
+            "event": {
+                "event_id": cause.event.event_id,
+                "event_content": cause.event.event_content
+            }
+        } for cause in prediction.cause]
+    }
+
+def get_predictor(data_source: str):
+    """Get the appropriate predictor based on data source"""
+    return personal_predictor if data_source.lower() == "personal" else market_predictor
+
+def events_2_pure_json(events) -> Dict[str, Any]:
+    for e in events:
+        for news in e["news_list"]:
+            news["json_news"] = news.to_json()
+
+def build_news_events(news_results) -> List[NewsEvent]:
+    """Convert real_time_query() results to NewsEvent objects for prediction"""
+    news_events = []
+    for idx, event_data in enumerate(news_results):
+        event = event_data["Event"]
+        news_list = []
+        
+        # The prompt builder ranks these and keeps what fits its token budget
+        for news in event["news_list"]:
+            news_list.append(News(
+                title=news.title,
+                news_content=news.summary,
+                post_time=news.post_time,
+                link=news.link
+            ))
+        
+        news_events.append(NewsEvent(
+            event_id=idx + 1,
+            event_content=event["summary"],
+            news_list=news_list
+        ))
+    return news_events
+
+def format_news_results(news_results) -> List[Dict[str, Any]]:
+    """Format real_time_query() results as response events with their impact"""
+    formatted_events = []
+    for idx, news_result in enumerate(news_results):
+        # grab the raw dict that came out of real_time_query()
+        raw = news_result["Event"]   # this has keys: summary, topic, news_list
+
+        # format off of the dict, not your NewsEvent object
+        formatted = format_event_for_response(raw, idx + 1, max_news=5)
+
+        # now attach impact
+        formatted["impact"] = news_result["Percentage"]
+        formatted_events.append(formatted)
+    return formatted_events
+
+def advice_clusters(news_results) -> List[Dict[str, Any]]:
+    """Topic and summary of every event, the input of both advisors"""
+    return [
+        {
+            "topic": raw["Event"]["topic"],
+            "summary": raw["Event"]["summary"]
+        }
+        for raw in news_results
+    ]
+
+def tactical_advice(clusters_for_advice) -> Dict[str, Any]:
+    """{"advice": ...} for the personal portfolio, or {} if the advisor failed"""
+    try:
+        return {"advice": generate_tactical_signals(clusters_for_advice)}
+    except Exception as e:
+        print(f"[advisor error] {e}")
+        return {}
+
+def risk_opportunity_advice(clusters_for_advice, formatted_events) -> Dict[str, Any]:
+    """
+    {"riskOpportunitySignals": ...}, or {} if the advisor failed.
+    Risk/opportunity scores are merged into formatted_events in place.
+    """
+    # The combined cluster analysis already scored every event; only ask the
+    # RO advisor when some event came back without scores
+    if all(event.get("risk") is not None for event in formatted_events):
+        return {
+            "riskOpportunitySignals": [
+                {
+                    "risk": event["risk"],
+                    "opportunity": event["opportunity"],
+                    "rationale": event["rationale"]
+                }
+                for event in formatted_events
+            ]
+        }
+    print("[RO advisor] payload clusters_for_advice =", json.dumps(clusters_for_advice, indent=2))
+    try:
+        ro_signals = generate_risk_opportunity_signals(clusters_for_advice)
+        print("[RO advisor] returned signals =", ro_signals)
+
+        # 🛠 NEW: Merge R/O back into events
+        for event, ro_signal in zip(formatted_events, ro_signals):
+            event["risk"] = ro_signal.get("risk")
+            event["opportunity"] = ro_signal.get("opportunity")
+            event["rationale"] = ro_signal.get("rationale")
+
+        # Also include separately if you want
+        return {"riskOpportunitySignals": ro_signals}
+    except Exception as e:
+        print(f"[RO advisor error] {e}")
+        return {}
+
+def parse_events(events_data) -> List[Union[NewsEvent, Event]]:
+    """Build Event / NewsEvent objects from the JSON body of /api/predict"""
+    events = []
+    for event_data in events_data:
+        if "news_list" in event_data and event_data["news_list"]:
+            # Create NewsEvent with news
+            news_list = [
+                News(title=news["title"], news_content=news["news_content"], post_time=news.get("post_time"))
+                for news in event_data["news_list"]
+            ]
+            event = NewsEvent(
+                event_id=event_data["event_id"],
+                event_content=event_data["event_content"],
+                news_list=news_list
+            )
+        else:
+            # Create simple Event
+            event = Event(
+                event_id=event_data["event_id"],
+                event_content=event_data["event_content"]
+            )
+        events.append(event)
+    return events
+
+def parse_scenarios(data) -> Dict[str, List[Union[NewsEvent, Event]]]:
+    """
+    Build the scenarios of a /api/predict/batch body. Scenario entries are events, or
+    event_ids of the shared "events" list, which is parsed once for all scenarios.
+    Raises ValueError for a malformed body.
+    """
+    scenarios = data.get("scenarios")
+    if not isinstance(scenarios, dict) or not scenarios:
+        raise ValueError("'scenarios' must map scenario names to event lists")
+    if len(scenarios) > PREDICTION_BATCH_MAX_SCENARIOS:
+        raise ValueError(f"At most {PREDICTION_BATCH_MAX_SCENARIOS} scenarios per request")
+    shared = {event.event_id: event for event in parse_events(data.get("events", []))}
+    parsed = {}
+    for name, entries in scenarios.items():
+        events = []
+        for entry in entries:
+            if isinstance(entry, int):
+                if entry not in shared:
+                    raise ValueError(f"Scenario '{name}' refers to unknown event_id {entry}")
+                events.append(shared[entry])
+            else:
+                events.extend(parse_events([entry]))
+        parsed[name] = events
+    return parsed
+
+def format_batch_results(results, metadata) -> Dict[str, Any]:
+    """Response body of /api/predict/batch, keyed by scenario"""
+    return {
+        "results": {
+            name: {
+                "predictions": [format_prediction_for_response(pred) for pred in predictions.predictions],
+                "prompt": metadata["prompts"].get(name)
+            }
+            for name, predictions in results.items()
+        },
+        "errors": metadata.pop("errors"),
+        "metadata": {key: value for key, value in metadata.items() if key != "prompts"}
+    }
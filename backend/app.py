@@ -1,145 +1,88 @@
 # app.py
 import os
 import time
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from event_prediction.event_predictor import EventPredictor, PredictorType
-from typing import Dict, Any, List, Optional, Union
-from event_prediction.event_predictor import Event, NewsEvent, News, PredictedEventList
-from dotenv import load_dotenv
+from clients import client_stats
+from llm_gateway import gateway_stats
+from llm_cache import llm_cache_stats
 import json
 import traceback
-import diskcache as dc
-from datetime import datetime, timedelta
 
-# Set environment variable to avoid tokenizers warning
-os.environ["TOKENIZERS_PARALLELISM"] = "false"
-
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("EVENT_PREDICTION_OPENAI_API_KEY")
+# Cache, predictors and formatting are shared with the async server (async_app.py)
+from api_common import (
+    cache, cache_dir, get_cache_entry, get_cached_data, set_cached_data, get_predictor,
+    format_news_results, build_news_events, format_prediction_for_response,
+    advice_clusters, tactical_advice, risk_opportunity_advice, parse_events, parse_scenarios,
+    format_batch_results, CACHE_SOFT_TTL_MINUTES, CACHE_HARD_TTL_MINUTES,
+)
 
 # Import from news_handler directly
 from news_handler.news_query import real_time_query
-from news_handler.advisor import generate_tactical_signals
-from news_handler.risk_opportunity_advisor import generate_risk_opportunity_signals
+from news_handler.embedding_store import embedding_store_stats
+from news_handler.summary_cache import summary_cache_stats
+from news_handler.dedup import dedup_stats
+from news_handler.snapshot_store import get_latest_snapshot
+from single_flight import SingleFlight
+from stage_graph import StageGraph
+from background_refresh import BackgroundRefresher
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Use disk-based cache for larger responses
-cache_dir = os.path.join(os.path.dirname(__file__), 'cache')
-os.makedirs(cache_dir, exist_ok=True)
-cache = dc.Cache(cache_dir)
-
-# Initialize event predictors for both market and personal predictions
-market_predictor = EventPredictor(api_key=API_KEY, predictor_type=PredictorType.PUBLIC)
-personal_predictor = EventPredictor(api_key=API_KEY, predictor_type=PredictorType.PUBLIC)
+# Concurrent misses on the same key share one computation (threads and worker processes)
+single_flight = SingleFlight(os.path.join(cache_dir, 'locks'))
 
-# Helper function to check cache validity
-def is_cache_valid(cache_time, max_age_minutes=30):
-    """Check if cached data is still valid"""
-    if not cache_time:
-        return False
-    age = datetime.now() - cache_time
-    return age < timedelta(minutes=max_age_minutes)
+# Pre-warming refreshes the common dashboard keys this long before they go stale
+CACHE_PREWARM_ENABLED = os.getenv("CACHE_PREWARM", "0") == "1"
+CACHE_PREWARM_INTERVAL_MINUTES = float(os.getenv("CACHE_PREWARM_INTERVAL_MINUTES", 5))
+CACHE_PREWARM_LEAD_MINUTES = float(os.getenv("CACHE_PREWARM_LEAD_MINUTES", 5))
+refresher = BackgroundRefresher(max_workers=int(os.getenv("CACHE_REFRESH_WORKERS", 2)))
+stale_served = 0
 
-# Helper function to get cached data
-def get_cached_data(data_source, cache_key, max_age_minutes=25):
-    """Get data from cache if valid"""
-    full_key = f"{data_source}_{cache_key}"
-    cached_data = cache.get(full_key)
-    if cached_data and is_cache_valid(cached_data.get("timestamp"), max_age_minutes):
-        print(f"Using cached data for {full_key}")
-        return cached_data["data"]
-    return None
-
-# Helper function to store data in cache
-def set_cached_data(data_source, cache_key, data):
-    """Store data in cache with timestamp"""
-    full_key = f"{data_source}_{cache_key}"
-    cache.set(full_key, {
-        "data": data,
-        "timestamp": datetime.now()
-    })
-    print(f"Cached data for {full_key}")
-
-# Helper functions for data formatting
-def format_news_item(item: Union[dict, Any]) -> Dict[str, Any]:
+def compute_cached(data_source, cache_key, compute, max_age_minutes=CACHE_SOFT_TTL_MINUTES):
     """
-    Normalize a news‐item into {title, news_content}.
-    Handles either:
-     - A dict (with keys "title" and "news_content" or "summary")
-     - Any object with .title and .news_content attributes
+    Run compute() once for all concurrent callers of the same key and cache its
+    result (falsy results are not cached). An entry younger than max_age_minutes
+    that appears while waiting for the key is reused instead.
     """
-    # object with attributes
-    if hasattr(item, "title") and hasattr(item, "news_content"):
-        return {
-            "title": item.title,
-            "news_content": item.news_content
-        }
+    def compute_and_store():
+        data = compute()
+        if data:
+            set_cached_data(data_source, cache_key, data)
+        return data
 
-    # plain dict
-    if isinstance(item, dict):
-        return {
-            "title": item.get("title", ""),
-            # some of your dicts use "news_content", others "summary"
-            "news_content": item.get("news_content", item.get("summary", ""))
-        }
+    return single_flight.do(
+        f"{data_source}_{cache_key}",
+        compute_and_store,
+        lambda: get_cached_data(data_source, cache_key, max_age_minutes)
+    )
 
-    # ultimate fallback
-    return {
-        "title": str(item),
-        "news_content": ""
-    }
+def schedule_refresh(data_source, cache_key, compute, max_age_minutes=CACHE_SOFT_TTL_MINUTES):
+    """Recompute a cache entry in the background (at most one pending refresh per key)"""
+    refresher.schedule(
+        f"{data_source}_{cache_key}",
+        lambda: compute_cached(data_source, cache_key, compute, max_age_minutes)
+    )
 
-def format_event_for_response(event, event_id: int, max_news: int = 5) -> Dict[str, Any]:
-    print(f"checking event: {event} \n\n ---")
-    if isinstance(event, NewsEvent):
-        event_content = event.event_content
-        event_topic = getattr(event, "topic", "Unknown Topic")
-        # news_list = [format_news_item(news) for news in event.news_list[:max_news]]
-        news_list = [news for news in event.news_list[:max_news]]
-    else:
-        event_content = event.get("summary", "Summary not available.")
-        event_topic = event.get("topic", "Unknown Topic")  # <-- TODO: FIX THIS LINE!!
-        # news_list = [format_news_item(news) for news in event.get("news_list", [])[:max_news]]
-        news_list = [news for news in event.get("news_list", [])[:max_news]]
-        
-    
-    return {
-        "event_id": event_id,
-        "event_content": event_content,
-        "topic": event_topic,
-        "news_list": news_list,
-        "risk": getattr(event, "risk", None),
-        "opportunity": getattr(event, "opportunity", None),
-        "rationale": getattr(event, "rationale", None)
-    }
-
-def format_prediction_for_response(prediction) -> Dict[str, Any]:
-    """Format a prediction for API response"""
-    return {
-        "content": prediction.content,
-        "confidence_score": prediction.confidency_score,
-        "reason": prediction.reason,
-        "cause": [{
-            "weight": cause.weight,
-            "event": {
-                "event_id": cause.event.event_id,
-                "event_content": cause.event.event_content
-            }
-        } for cause in prediction.cause]
-    }
-
-def get_predictor(data_source: str):
-    """Get the appropriate predictor based on data source"""
-    return personal_predictor if data_source.lower() == "personal" else market_predictor
+def get_or_compute_cached(data_source, cache_key, compute):
+    """
+    Stale-while-revalidate read: fresh entries are returned as is, stale ones
+    (between soft and hard TTL) are returned immediately while a background worker
+    recomputes them, and missing or expired ones are computed synchronously.
+    """
+    global stale_served
+    data, age = get_cache_entry(data_source, cache_key)
+    if data and age < CACHE_SOFT_TTL_MINUTES:
+        print(f"Using cached data for {data_source}_{cache_key}")
+        return data
+    if data and age < CACHE_HARD_TTL_MINUTES:
+        print(f"Serving stale data for {data_source}_{cache_key} ({age:.1f} min old), refreshing in background")
+        stale_served += 1
+        schedule_refresh(data_source, cache_key, compute)
+        return data
+    return compute_cached(data_source, cache_key, compute)
 
-def events_2_pure_json(events) -> Dict[str, Any]:
-    for e in events:
-        for news in e["news_list"]:
-            news["json_news"] = news.to_json()
 # Health check endpoint
 print(f"check point")
 @app.route('/api/health', methods=['GET'])
@@ -159,23 +102,9 @@ def get_news():
         
         limit = request.args.get('limit', default=5, type=int)
         
-        # Check cache first
+        # Served from cache; concurrent misses share one computation
         cache_key = f"news_{time_period}_{limit}"
-        cached_data = get_cached_data("general", cache_key)
-        if cached_data:
-            return jsonify(cached_data)
-        
-        # Fetch fresh data if not in cache
-        news_results = real_time_query(time_range=time_period)
-        news_results = news_results[:limit]
-        response_data = news_results
-        # events = [format_event_for_response(event_data["Event"], idx + 1) 
-        #          for idx, event_data in enumerate(news_results)]
-        # events_2_pure_json(events)
-        # response_data = {"events": events}
-        
-        # Cache the result
-        set_cached_data("general", cache_key, response_data)
+        response_data = get_or_compute_cached("general", cache_key, lambda: compute_news(time_period, limit))
         
         return jsonify(response_data)
     except Exception as e:
@@ -184,6 +113,99 @@ def get_news():
         print(error_trace)
         return jsonify({"error": str(e)}), 500
 
+def compute_news(time_period: str, limit: int):
+    """
+    Latest precomputed snapshot for the period when there is a recent one,
+    otherwise fetch, cluster and summarize fresh news
+    """
+    news_results = get_latest_snapshot(time_period)
+    if news_results is None:
+        news_results = real_time_query(time_range=time_period)
+    return news_results[:limit]
+
+def parse_prediction_args():
+    """Read and validate time_period and limit from the query string"""
+    time_period = request.args.get('time_period', default="week", type=str).lower()
+    if time_period not in ["day", "week", "month"]:
+        time_period = "week"
+    limit = request.args.get('limit', default=5, type=int)
+    return time_period, limit
+
+def run_prediction_pipeline(data_source: str, time_period: str, limit: int):
+    """
+    Run fetch -> cluster/summarize, then predict and (personal only) the two
+    advisors concurrently, yielding (stage, payload) as soon as each is done:
+    - ("events", formatted events), always first
+    - ("predictions", formatted predictions)
+    - ("advice", {"advice", "riskOpportunitySignals"}), personal data source only,
+      once both advisors are done; may come before "predictions"
+    - ("result", full response data)
+    Per-stage wall times in ms go to the response metadata under "stage_timings_ms".
+    Yields nothing when no news was found.
+    """
+    print(f"Predicting from news with data_source={data_source}, time_period={time_period}, limit={limit}")
+    
+    start_time = time.time()
+    
+    # Fetch news
+    metadata = {}
+    news_results = real_time_query(time_range=time_period, metadata=metadata)
+    if not news_results:
+        return
+    
+    timings = {"news": round((time.time() - start_time) * 1000, 1)}
+    print(f"News fetch took {time.time() - start_time:.2f}s")
+    
+    # Limit results
+    news_results = news_results[:limit]
+    formatted_events = format_news_results(news_results)
+    yield "events", formatted_events
+    
+    # Get appropriate predictor
+    predictor = get_predictor(data_source)
+    
+    # Predictions and the advisors only depend on the news, not on each other
+    graph = StageGraph().add("predictions", lambda: [
+        format_prediction_for_response(pred)
+        for pred in predictor.predict_events(events=build_news_events(news_results), num_predictions=3,
+                                             metadata=metadata).predictions
+    ])
+    if data_source == "personal":
+        clusters_for_advice = advice_clusters(news_results)
+        graph.add("advice", lambda: tactical_advice(clusters_for_advice))
+        graph.add("risk_opportunity", lambda: risk_opportunity_advice(clusters_for_advice, formatted_events))
+    
+    response_data = {
+        "events": formatted_events,
+        "metadata": metadata
+    }
+    advice_data = {}
+    advisors_left = {"advice", "risk_opportunity"}
+    for stage, payload in graph.run():
+        if stage == "predictions":
+            response_data["predictions"] = payload
+            yield "predictions", payload
+        else:
+            advice_data.update(payload)
+            advisors_left.discard(stage)
+            if not advisors_left:
+                response_data.update(advice_data)
+                yield "advice", advice_data
+    
+    timings.update(graph.timings_ms)
+    timings["total"] = round((time.time() - start_time) * 1000, 1)
+    metadata["stage_timings_ms"] = timings
+    print(f"Total processing took {time.time() - start_time:.2f}s")
+    yield "result", response_data
+
+def compute_predictions(data_source: str, time_period: str, limit: int):
+    """Run the whole prediction pipeline; returns the response data, or None when no news was found"""
+    response_data = None
+    for stage, payload in run_prediction_pipeline(data_source, time_period, limit):
+        if stage == "result":
+            response_data = payload
+    return response_data
+
 # Main prediction API endpoint - handles both personal and market data
 @app.route('/api/<data_source>/predict-from-news', methods=['GET'])
 def predict_from_news(data_source):
@@ -198,125 +220,17 @@ def predict_from_news(data_source):
         if data_source not in ["personal", "market"]:
             return jsonify({"error": f"Invalid data source '{data_source}'. Must be 'personal' or 'market'."}), 400
         
-        # Get and validate time period
-        time_period = request.args.get('time_period', default="week", type=str).lower()
-        if time_period not in ["day", "week", "month"]:
-            time_period = "week"
-        
-        # Get limit
-        limit = request.args.get('limit', default=5, type=int)
+        time_period, limit = parse_prediction_args()
         
         # Cache key based on parameters
         cache_key = f"{time_period}_{limit}"
         
-        # Check if we have valid cached data
-        cached_data = get_cached_data(data_source, cache_key)
-        if cached_data:
-            return jsonify(cached_data)
-        
-        print(f"Predicting from news with data_source={data_source}, time_period={time_period}, limit={limit}")
-        
-        start_time = time.time()
-        
-        # Fetch news
-        news_results = real_time_query(time_range=time_period)
-        if not news_results:
-            return jsonify({"error": "No news events found"}), 404
-        
-        print(f"News fetch took {time.time() - start_time:.2f}s")
-        
-        # Limit results
-        news_results = news_results[:limit]
-        
-        # Convert to NewsEvent objects for prediction
-        news_events = []
-        for idx, event_data in enumerate(news_results):
-            event = event_data["Event"]
-            news_list = []
-            
-            # Include up to 5 news articles per event
-            for news in event["news_list"][:5]:
-                news_list.append(News(
-                    title=news.title,
-                    news_content=news.summary,
-                    post_time=news.post_time,
-                    link=news.link
-                ))
-            
-            news_events.append(NewsEvent(
-                event_id=idx + 1,
-                event_content=event["summary"],
-                news_list=news_list
-            ))
-        
-        prediction_start = time.time()
-        # Get appropriate predictor
-        predictor = get_predictor(data_source)
-        
-        # Generate predictions
-        predictions = predictor.predict_events(
-            events=news_events,
-            num_predictions=3
+        # Served from cache; concurrent misses share one computation
+        response_data = get_or_compute_cached(
+            data_source, cache_key, lambda: compute_predictions(data_source, time_period, limit)
         )
-        
-        print(f"Prediction took {time.time() - prediction_start:.2f}s")
-        
-        # Format response
-            # Format response
-        formatted_events = []
-        for idx, news_result in enumerate(news_results):
-            # grab the raw dict that came out of real_time_query()
-            raw = news_result["Event"]   # this has keys: summary, topic, news_list
-
-            # format off of the dict, not your NewsEvent object
-            formatted = format_event_for_response(raw, idx + 1, max_news=5)
-
-            # now attach impact
-            formatted["impact"] = news_result["Percentage"]
-            formatted_events.append(formatted)
-
-        
-        formatted_predictions = [format_prediction_for_response(pred) for pred in predictions.predictions]
-        
-        response_data = {
-            "events": formatted_events,
-            "predictions": formatted_predictions
-        }
-        if data_source == "personal":
-            clusters_for_advice = [
-                {
-                    "topic": raw["Event"]["topic"],
-                    "summary": raw["Event"]["summary"]
-                }
-                for raw in news_results
-            ]
-            print("[RO advisor] payload clusters_for_advice =", json.dumps(clusters_for_advice, indent=2))
-            try:
-                advice = generate_tactical_signals(clusters_for_advice)
-                response_data["advice"] = advice
-            except Exception as e:
-                print(f"[advisor error] {e}")
-            try:
-                ro_signals = generate_risk_opportunity_signals(clusters_for_advice)
-                print("[RO advisor] returned signals =", ro_signals)
-
-                # 🛠 NEW: Merge R/O back into events
-                for event, ro_signal in zip(formatted_events, ro_signals):
-                    event["risk"] = ro_signal.get("risk")
-                    event["opportunity"] = ro_signal.get("opportunity")
-                    event["rationale"] = ro_signal.get("rationale")
-
-                # Also include separately if you want
-                response_data["riskOpportunitySignals"] = ro_signals
-            except Exception as e:
-                print(f"[RO advisor error] {e}")
-
-
-        
-        # Cache the results
-        set_cached_data(data_source, cache_key, response_data)
-        
-        print(f"Total processing took {time.time() - start_time:.2f}s")
+        if response_data is None:
+            return jsonify({"error": "No news events found"}), 404
         
         return jsonify(response_data)
     except Exception as e:
@@ -325,6 +239,123 @@ def predict_from_news(data_source):
         print(error_trace)
         return jsonify({"error": str(e), "traceback": error_trace}), 500
 
+# Streaming variant of predict-from-news
+@app.route('/api/<data_source>/predict-from-news/stream', methods=['GET'])
+def predict_from_news_stream(data_source):
+    """
+    Same as predict-from-news, but each stage is sent as soon as it is ready:
+    "events", then "predictions", then "advice" (personal only), then "done"
+    (carrying the response metadata).
+    Every message is {"type": <stage>, "data": <payload>}.
+    Parameters:
+    - time_period, limit: as for predict-from-news
+    - format: "ndjson" (default, one JSON object per line) or "sse" (Server-Sent Events)
+    """
+    if data_source not in ["personal", "market"]:
+        return jsonify({"error": f"Invalid data source '{data_source}'. Must be 'personal' or 'market'."}), 400
+    
+    time_period, limit = parse_prediction_args()
+    use_sse = request.args.get('format', default="ndjson", type=str).lower() == "sse"
+    cache_key = f"{time_period}_{limit}"
+    
+    def message(stage, payload):
+        line = app.json.dumps({"type": stage, "data": payload})
+        return f"event: {stage}\ndata: {line}\n\n" if use_sse else line + "\n"
+    
+    def replay(response_data):
+        yield message("events", response_data["events"])
+        yield message("predictions", response_data["predictions"])
+        if data_source == "personal":
+            yield message("advice", {key: response_data[key] for key in ("advice", "riskOpportunitySignals") if key in response_data})
+        yield message("done", response_data.get("metadata"))
+    
+    def generate():
+        try:
+            cached_data, age = get_cache_entry(data_source, cache_key)
+            if cached_data and age < CACHE_HARD_TTL_MINUTES:
+                if age >= CACHE_SOFT_TTL_MINUTES:
+                    schedule_refresh(data_source, cache_key, lambda: compute_predictions(data_source, time_period, limit))
+                yield from replay(cached_data)
+                return
+            
+            # Wait for an identical request that is already computing; otherwise lead
+            # (streaming leaders coalesce within this process only)
+            full_key = f"{data_source}_{cache_key}"
+            future, is_leader = single_flight.join(full_key)
+            if not is_leader:
+                response_data = future.result()
+                if response_data is None:
+                    yield message("error", {"error": "No news events found"})
+                else:
+                    yield from replay(response_data)
+                return
+            
+            response_data = None
+            disconnected = False
+            stages = run_prediction_pipeline(data_source, time_period, limit)
+            try:
+                try:
+                    for stage, payload in stages:
+                        if stage == "result":
+                            response_data = payload
+                        else:
+                            yield message(stage, payload)
+                except GeneratorExit:
+                    # The client went away: finish the pipeline for the requests waiting
+                    # on this key (nothing more may be yielded)
+                    disconnected = True
+                    response_data = next((payload for stage, payload in stages if stage == "result"), None)
+                if response_data is not None:
+                    set_cached_data(data_source, cache_key, response_data)
+            except BaseException as e:
+                single_flight.finish(full_key, future, error=e)
+                if disconnected and isinstance(e, Exception):
+                    print(f"Error in predict_from_news_stream after the client disconnected: {str(e)}")
+                    return
+                raise
+            single_flight.finish(full_key, future, value=response_data)
+            if disconnected:
+                return
+            
+            if response_data is None:
+                yield message("error", {"error": "No news events found"})
+                return
+            yield message("done", response_data.get("metadata"))
+        except Exception as e:
+            print(f"Error in predict_from_news_stream: {str(e)}")
+            print(traceback.format_exc())
+            yield message("error", {"error": str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Dashboard keys kept warm by the pre-warm scheduler: (data_source, time_period, limit)
+PREWARM_KEYS = [
+    (data_source, time_period, 5)
+    for data_source in ("personal", "market")
+    for time_period in ("day", "week", "month")
+]
+
+def prewarm_cache():
+    """Refresh every pre-warm key that is missing or will go stale within the lead time"""
+    refresh_before = CACHE_SOFT_TTL_MINUTES - CACHE_PREWARM_LEAD_MINUTES
+    for data_source, time_period, limit in PREWARM_KEYS:
+        cache_key = f"{time_period}_{limit}"
+        data, age = get_cache_entry(data_source, cache_key)
+        if data is None or age >= refresh_before:
+            print(f"[prewarm] refreshing {data_source}_{cache_key}")
+            schedule_refresh(
+                data_source, cache_key,
+                lambda ds=data_source, tp=time_period, lim=limit: compute_predictions(ds, tp, lim),
+                max_age_minutes=refresh_before
+            )
+
+if CACHE_PREWARM_ENABLED:
+    refresher.start_periodic(CACHE_PREWARM_INTERVAL_MINUTES * 60, prewarm_cache)
+
 # Direct prediction endpoint from provided events
 @app.route('/api/predict', methods=['POST'])
 def predict_events():
@@ -335,41 +366,23 @@ def predict_events():
         if not data or "events" not in data:
             return jsonify({"error": "Invalid request. 'events' field is required"}), 400
         
-        # Parse events
-        events = []
-        for event_data in data["events"]:
-            if "news_list" in event_data and event_data["news_list"]:
-                # Create NewsEvent with news
-                news_list = [
-                    News(title=news["title"], news_content=news["news_content"])
-                    for news in event_data["news_list"]
-                ]
-                event = NewsEvent(
-                    event_id=event_data["event_id"],
-                    event_content=event_data["event_content"],
-                    news_list=news_list
-                )
-            else:
-                # Create simple Event
-                event = Event(
-                    event_id=event_data["event_id"],
-                    event_content=event_data["event_content"]
-                )
-            events.append(event)
+        events = parse_events(data["events"])
         
         # Get predictor
         data_source = data.get("data_source", "market").lower()
         predictor = get_predictor(data_source)
         
         # Get predictions
+        metadata = {}
         predictions = predictor.predict_events(
             events=events,
-            num_predictions=data.get("num_predictions", 3)
+            num_predictions=data.get("num_predictions", 3),
+            metadata=metadata
         )
         
         # Format response
         formatted_predictions = [format_prediction_for_response(pred) for pred in predictions.predictions]
-        return jsonify({"predictions": formatted_predictions})
+        return jsonify({"predictions": formatted_predictions, "metadata": metadata})
     
     except Exception as e:
         error_trace = traceback.format_exc()
@@ -377,6 +390,51 @@ def predict_events():
         print(error_trace)
         return jsonify({"error": str(e), "traceback": error_trace}), 500
 
+# Predictions for several alternative event sets in one request
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict events for several scenarios (e.g. per sector or time window).
+    Body: {"scenarios": {name: [events or event_ids]}, "events": [shared events],
+           "num_predictions": 3, "data_source": "market"}
+    """
+    try:
+        data = request.json
+        if not data:
+            return jsonify({"error": "Invalid request. 'scenarios' field is required"}), 400
+        try:
+            scenarios = parse_scenarios(data)
+        except (ValueError, KeyError, TypeError) as e:
+            return jsonify({"error": f"Invalid request. {e}"}), 400
+        
+        predictor = get_predictor(data.get("data_source", "market").lower())
+        metadata = {}
+        results = predictor.predict_batch(
+            scenarios,
+            num_predictions=data.get("num_predictions", 3),
+            metadata=metadata
+        )
+        return jsonify(format_batch_results(results, metadata))
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"Error in predict_batch: {str(e)}")
+        print(error_trace)
+        return jsonify({"error": str(e), "traceback": error_trace}), 500
+
+# Cache and pipeline counters
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "embedding_cache": embedding_store_stats(),
+        "summary_cache": summary_cache_stats(),
+        "dedup": dedup_stats(),
+        "clients": client_stats(),
+        "llm_gateway": gateway_stats(),
+        "llm_cache": llm_cache_stats(),
+        "coalescing": single_flight.stats(),
+        "refresh": dict(refresher.stats(), stale_served=stale_served)
+    })
+
 
 # manually clear cache
 @app.route('/api/clear-cache', methods=['POST'])
@@ -0,0 +1,305 @@
+# async_app.py
+# Description: asyncio serving path (aiohttp) with the same routes as app.py. Upstream
+# calls use async HTTP and OpenAI clients, so one process keeps many requests in flight.
+#
+# Disk caches, stores and CPU-bound formatting are called through asyncio.to_thread so
+# they never block the event loop.
+#
+# usage: python async_app.py   (PORT, default 5001)
+
+import os
+import time
+import asyncio
+import traceback
+
+from aiohttp import web, ClientSession, ClientTimeout, TCPConnector
+
+# Cache, formatting and predictors are shared with the Flask app (same disk cache)
+from api_common import (
+    cache, get_cache_entry, set_cached_data, get_predictor, parse_events, parse_scenarios,
+    format_batch_results,
+    format_news_results, build_news_events, format_prediction_for_response,
+    advice_clusters, tactical_advice, risk_opportunity_advice, json_dumps,
+    CACHE_SOFT_TTL_MINUTES, CACHE_HARD_TTL_MINUTES,
+)
+from clients import client_stats
+from llm_gateway import gateway_stats
+from llm_cache import llm_cache_stats
+from news_handler.news_query import real_time_query_async
+from news_handler.snapshot_store import get_latest_snapshot
+from news_handler.embedding_store import embedding_store_stats
+from news_handler.summary_cache import summary_cache_stats
+from news_handler.dedup import dedup_stats
+from news_handler.alpha_vantage import ALPHA_VANTAGE_TIMEOUT
+
+# Connections the shared aiohttp session keeps open to upstreams (Alpha Vantage)
+ASYNC_UPSTREAM_MAX_CONNECTIONS = int(os.getenv("ASYNC_UPSTREAM_MAX_CONNECTIONS", 100))
+
+
+class AsyncCache:
+    """
+    Stale-while-revalidate over the shared disk cache for the async server.
+
+    Concurrent misses on a key await one shared task; stale entries are served
+    immediately while a single background task per key recomputes them.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.coalesced = 0
+        self.computed = 0
+        self.stale_served = 0
+
+    async def _compute_and_store(self, data_source, cache_key, compute):
+        data = await compute()
+        self.computed += 1
+        if data:
+            await asyncio.to_thread(set_cached_data, data_source, cache_key, data)
+        return data
+
+    def compute(self, data_source, cache_key, compute) -> asyncio.Future:
+        full_key = f"{data_source}_{cache_key}"
+        task = self._inflight.get(full_key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = asyncio.ensure_future(self._compute_and_store(data_source, cache_key, compute))
+        self._inflight[full_key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(full_key, None))
+        return task
+
+    async def get_or_compute(self, data_source, cache_key, compute):
+        data, age = await asyncio.to_thread(get_cache_entry, data_source, cache_key)
+        if data and age < CACHE_SOFT_TTL_MINUTES:
+            return data
+        if data and age < CACHE_HARD_TTL_MINUTES:
+            self.stale_served += 1
+            self.compute(data_source, cache_key, compute)
+            return data
+        # Shielded: a client that disconnects does not cancel the shared computation
+        return await asyncio.shield(self.compute(data_source, cache_key, compute))
+
+    def stats(self) -> dict:
+        return {
+            "saved_requests": self.coalesced,
+            "computations": self.computed,
+            "in_flight": len(self._inflight),
+            "stale_served": self.stale_served,
+        }
+
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=json_dumps)
+
+
+def prediction_args(request):
+    """time_period and limit from the query string, validated like parse_prediction_args()"""
+    time_period = request.query.get("time_period", "week").lower()
+    if time_period not in ["day", "week", "month"]:
+        time_period = "week"
+    try:
+        limit = int(request.query.get("limit", 5))
+    except ValueError:
+        limit = 5
+    return time_period, limit
+
+
+async def compute_news(http, time_period: str, limit: int):
+    news_results = await asyncio.to_thread(get_latest_snapshot, time_period)
+    if news_results is None:
+        news_results = await real_time_query_async(http, time_range=time_period)
+    return news_results[:limit]
+
+
+async def timed(timings: dict, stage: str, awaitable):
+    """Await and record the stage's wall time in ms"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def compute_predictions(http, data_source: str, time_period: str, limit: int):
+    """
+    Async counterpart of app.compute_predictions(); None when no news was found.
+    Predictions and the personal advisors run concurrently.
+    """
+    start_time = time.time()
+    metadata = {}
+    timings = {}
+    news_results = await timed(timings, "news",
+                               real_time_query_async(http, time_range=time_period, metadata=metadata))
+    if not news_results:
+        return None
+    news_results = news_results[:limit]
+    formatted_events = await asyncio.to_thread(format_news_results, news_results)
+    news_events = await asyncio.to_thread(build_news_events, news_results)
+
+    stages = [timed(timings, "predictions", get_predictor(data_source).predict_events_async(
+        events=news_events,
+        num_predictions=3,
+        metadata=metadata
+    ))]
+    if data_source == "personal":
+        clusters_for_advice = advice_clusters(news_results)
+        stages.append(timed(timings, "advice", asyncio.to_thread(tactical_advice, clusters_for_advice)))
+        stages.append(timed(timings, "risk_opportunity", asyncio.to_thread(
+            risk_opportunity_advice, clusters_for_advice, formatted_events)))
+    predictions, *advice = await asyncio.gather(*stages)
+
+    response_data = {
+        "events": formatted_events,
+        "predictions": [format_prediction_for_response(pred) for pred in predictions.predictions],
+        "metadata": metadata
+    }
+    for advice_data in advice:
+        response_data.update(advice_data)
+    timings["total"] = round((time.time() - start_time) * 1000, 1)
+    metadata["stage_timings_ms"] = timings
+    print(f"Total processing took {time.time() - start_time:.2f}s")
+    return response_data
+
+
+async def health_check(request):
+    return json_response({"status": "ok", "message": "Event prediction API is running"})
+
+
+async def get_news(request):
+    try:
+        time_period, limit = prediction_args(request)
+        http = request.app["http"]
+        response_data = await request.app["cache"].get_or_compute(
+            "general", f"news_{time_period}_{limit}", lambda: compute_news(http, time_period, limit))
+        return json_response(response_data)
+    except Exception as e:
+        print(f"Error in get_news: {str(e)}")
+        print(traceback.format_exc())
+        return json_response({"error": str(e)}, status=500)
+
+
+async def predict_from_news(request):
+    data_source = request.match_info["data_source"]
+    if data_source not in ["personal", "market"]:
+        return json_response({"error": f"Invalid data source '{data_source}'. Must be 'personal' or 'market'."}, status=400)
+    try:
+        time_period, limit = prediction_args(request)
+        http = request.app["http"]
+        response_data = await request.app["cache"].get_or_compute(
+            data_source, f"{time_period}_{limit}",
+            lambda: compute_predictions(http, data_source, time_period, limit))
+        if response_data is None:
+            return json_response({"error": "No news events found"}, status=404)
+        return json_response(response_data)
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"Error in predict_from_news: {str(e)}")
+        print(error_trace)
+        return json_response({"error": str(e), "traceback": error_trace}, status=500)
+
+
+async def predict_events(request):
+    try:
+        data = await request.json()
+        if not data or "events" not in data:
+            return json_response({"error": "Invalid request. 'events' field is required"}, status=400)
+        predictor = get_predictor(data.get("data_source", "market").lower())
+        metadata = {}
+        predictions = await predictor.predict_events_async(
+            events=parse_events(data["events"]),
+            num_predictions=data.get("num_predictions", 3),
+            metadata=metadata
+        )
+        return json_response({"predictions": [format_prediction_for_response(pred) for pred in predictions.predictions],
+                              "metadata": metadata})
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"Error in predict_events: {str(e)}")
+        print(error_trace)
+        return json_response({"error": str(e), "traceback": error_trace}, status=500)
+
+
+
+async def predict_batch(request):
+    try:
+        data = await request.json()
+        if not data:
+            return json_response({"error": "Invalid request. 'scenarios' field is required"}, status=400)
+        try:
+            scenarios = parse_scenarios(data)
+        except (ValueError, KeyError, TypeError) as e:
+            return json_response({"error": f"Invalid request. {e}"}, status=400)
+        predictor = get_predictor(data.get("data_source", "market").lower())
+        metadata = {}
+        results = await predictor.predict_batch_async(
+            scenarios,
+            num_predictions=data.get("num_predictions", 3),
+            metadata=metadata
+        )
+        return json_response(format_batch_results(results, metadata))
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"Error in predict_batch: {str(e)}")
+        print(error_trace)
+        return json_response({"error": str(e), "traceback": error_trace}, status=500)
+
+async def stats(request):
+    return json_response({
+        "embedding_cache": embedding_store_stats(),
+        "summary_cache": summary_cache_stats(),
+        "dedup": dedup_stats(),
+        "clients": client_stats(),
+        "llm_gateway": gateway_stats(),
+        # Counts entries and size on disk
+        "llm_cache": await asyncio.to_thread(llm_cache_stats),
+        "coalescing": request.app["cache"].stats(),
+    })
+
+
+async def clear_cache(request):
+    await asyncio.to_thread(cache.clear)
+    return json_response({"status": "ok", "message": "Cache cleared."})
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    # Same open CORS policy as flask_cors on the Flask app
+    response = web.Response() if request.method == "OPTIONS" else await handler(request)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+    return response
+
+
+async def _open_http_session(app):
+    app["http"] = ClientSession(
+        connector=TCPConnector(limit=ASYNC_UPSTREAM_MAX_CONNECTIONS),
+        timeout=ClientTimeout(total=ALPHA_VANTAGE_TIMEOUT),
+    )
+
+
+async def _close_http_session(app):
+    await app["http"].close()
+
+
+def create_app() -> web.Application:
+    app = web.Application(middlewares=[cors_middleware])
+    app["cache"] = AsyncCache()
+    app.on_startup.append(_open_http_session)
+    app.on_cleanup.append(_close_http_session)
+    app.add_routes([
+        web.get("/api/health", health_check),
+        web.get("/api/news", get_news),
+        web.get("/api/{data_source}/predict-from-news", predict_from_news),
+        web.post("/api/predict", predict_events),
+        web.post("/api/predict/batch", predict_batch),
+        web.get("/api/stats", stats),
+        web.post("/api/clear-cache", clear_cache),
+        web.route("OPTIONS", "/{tail:.*}", health_check),
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 5001))
+    web.run_app(create_app(), host="0.0.0.0", port=port)
@@ -0,0 +1,72 @@
+# background_refresh.py
+# Description: background recomputation of cache entries (stale-while-revalidate and pre-warming)
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class BackgroundRefresher:
+    """
+    Runs cache refreshes on a small thread pool.
+
+    A key is refreshed by at most one queued or running task at a time, so a burst
+    of requests for the same stale entry schedules a single recomputation.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cache-refresh")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def schedule(self, key: str, refresh: Callable[[], None]) -> bool:
+        """Queue refresh() for key unless one is already pending; returns True if queued."""
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            self.scheduled += 1
+        self._pool.submit(self._run, key, refresh)
+        return True
+
+    def _run(self, key: str, refresh: Callable[[], None]):
+        try:
+            refresh()
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            print(f"[cache refresh] {key} failed: {e}")
+            print(traceback.format_exc())
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def start_periodic(self, interval_seconds: float, tick: Callable[[], None]) -> threading.Thread:
+        """Call tick() now and then every interval_seconds on a daemon thread."""
+        def loop():
+            while True:
+                try:
+                    tick()
+                except Exception as e:
+                    print(f"[cache refresh] periodic tick failed: {e}")
+                time.sleep(interval_seconds)
+
+        thread = threading.Thread(target=loop, name="cache-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "failed": self.failed,
+                "pending": len(self._pending),
+            }
@@ -0,0 +1,119 @@
+# benchmarks/bench_async_serving.py
+# Description: throughput and tail latency of /api/market/predict-from-news under concurrent
+# load, Flask (threaded) vs the aiohttp server, with every upstream replaced by local stubs.
+#
+# usage: python benchmarks/bench_async_serving.py [requests] [concurrency] [latency_seconds]
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stub_servers import start_stub_server, news_feed_route, embeddings_route, chat_completions_route
+
+SERVERS = [
+    ("flask (threaded)", ["app.py"], 5101),
+    ("aiohttp", ["async_app.py"], 5102),
+]
+
+
+def server_env(base_url, port):
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "ALPHA_VANTAGE_URL": f"{base_url}/query",
+        "ALPHA_VANTAGE_API_KEY": "stub",
+        "ALPHA_VANTAGE_REQUESTS_PER_MINUTE": "600000",
+        "ALPHA_VANTAGE_BURST": "1000",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "OPEN_AI_KEY": "stub",
+        "EVENT_PREDICTION_OPENAI_API_KEY": "stub",
+        # Every request must reach the upstreams, so no layer may answer from cache
+        "EMBEDDING_CACHE": "0",
+        "SUMMARY_CACHE": "0",
+        "LLM_CACHE": "0",
+        "NEWS_SNAPSHOTS": "0",
+        "CACHE_PREWARM": "0",
+    })
+    return env
+
+
+def peak_rss_mb(pid):
+    # Linux only; threads per request is where the two servers differ most in memory
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+async def wait_until_up(http, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with http.get(url) as r:
+                if r.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+async def load(port, requests, concurrency):
+    base = f"http://127.0.0.1:{port}"
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300)) as http:
+        await wait_until_up(http, f"{base}/api/health")
+        await http.post(f"{base}/api/clear-cache")
+
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                # A distinct limit per request gives every request its own response-cache key
+                start = time.perf_counter()
+                async with http.get(f"{base}/api/market/predict-from-news",
+                                    params={"time_period": "day", "limit": 1000 + i}) as r:
+                    await r.read()
+                    if r.status != 200:
+                        errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        await http.post(f"{base}/api/clear-cache")
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return requests / elapsed, latencies[len(latencies) // 2], p99, errors
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+
+    routes = {**news_feed_route(), **embeddings_route(), **chat_completions_route()}
+    stub, base_url = start_stub_server(routes, latency=latency)
+    print(f"{requests} requests, {concurrency} concurrent, {latency * 1000:.0f} ms upstream latency")
+
+    for label, args, port in SERVERS:
+        proc = subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=server_env(base_url, port),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            rps, p50, p99, errors = asyncio.run(load(port, requests, concurrency))
+            print(f"{label:<18} {rps:7.1f} req/s  p50 {p50 * 1000:7.0f} ms  p99 {p99 * 1000:7.0f} ms  "
+                  f"peak RSS {peak_rss_mb(proc.pid):6.0f} MB  {errors} errors")
+        finally:
+            proc.terminate()
+            proc.wait()
+    stub.shutdown()
@@ -0,0 +1,60 @@
+# benchmarks/bench_backfill.py
+# Description: weeks per minute of the historical backfill (summarize_week jobs) with one
+# worker against a process pool, with Alpha Vantage and OpenAI replaced by local stubs.
+#
+# usage: python benchmarks/bench_backfill.py [weeks] [workers, e.g. 1,4] [latency_seconds]
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stub_servers import start_stub_server, news_feed_route, embeddings_route, chat_completions_route
+
+
+if __name__ == "__main__":
+    weeks = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    worker_counts = [int(n) for n in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 4]
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+
+    routes = {**news_feed_route(articles_per_window=20), **embeddings_route(), **chat_completions_route()}
+    server, base_url = start_stub_server(routes, latency=latency)
+    os.environ.update({
+        "ALPHA_VANTAGE_URL": f"{base_url}/query",
+        "ALPHA_VANTAGE_API_KEY": "stub",
+        "ALPHA_VANTAGE_REQUESTS_PER_MINUTE": "600000",
+        "ALPHA_VANTAGE_BURST": "1000",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "OPEN_AI_KEY": "stub",
+        "EVENT_PREDICTION_OPENAI_API_KEY": "stub",
+        # Every week must reach the stubs, so no cache may answer
+        "EMBEDDING_CACHE": "0",
+        "SUMMARY_CACHE": "0",
+        "LLM_CACHE": "0",
+        "ETL_DAY_CACHE": "0",
+    })
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.append(backend_dir)
+    sys.path.append(os.path.join(backend_dir, "news_handler", "scripts"))
+    from job_runner import JobQueue, JobRunner
+    from backfill_jobs import plan_weeks, summarize_week
+
+    start = datetime(2024, 1, 1)
+    items = plan_weeks(start, start + timedelta(days=7 * weeks - 1))
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in worker_counts:
+            queue = JobQueue(os.path.join(directory, f"queue_{workers}.db"))
+            queue.enqueue("summarize", items)
+            written = []
+            runner = JobRunner(queue, {"summarize": summarize_week}, {"summarize": written.extend},
+                               max_workers=workers, processes=workers > 1)
+            counts = runner.run("summarize")
+            rows.append((workers, counts, len(written)))
+    server.shutdown()
+
+    print(f"{weeks} weeks, {latency}s stub latency")
+    print(f"{'workers':>8} {'done':>5} {'failed':>7} {'time':>8} {'weeks/min':>10}")
+    for workers, counts, _ in rows:
+        print(f"{workers:>8} {counts['done']:>5} {counts['failed']:>7} {counts['elapsed_s']:>7.1f}s {counts['per_minute']:>10}")
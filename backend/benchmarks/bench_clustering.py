@@ -0,0 +1,63 @@
+# benchmarks/bench_clustering.py
+# Description: runtime and peak memory of the clustering backends on synthetic
+# 1536-dim embeddings, against the previous path (Python lists into agglomerative).
+#
+# usage: python benchmarks/bench_clustering.py [sizes, e.g. 1000,5000,20000] [dim]
+
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from news_handler.clustering import BACKENDS, choose_backend, cluster_embeddings
+
+N_CLUSTERS = 5
+# The full distance matrix gets impractical beyond this
+MAX_N_FOR_AGGLOMERATIVE = 10000
+
+
+def synthetic_embeddings(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(N_CLUSTERS, dim)).astype(np.float32)
+    labels = rng.integers(0, N_CLUSTERS, size=n)
+    return centers[labels] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+def old_path(embeddings):
+    from sklearn.cluster import AgglomerativeClustering
+    # What cluster() used to do: a list of Python float lists straight into sklearn
+    as_lists = embeddings.tolist()
+    AgglomerativeClustering(n_clusters=N_CLUSTERS).fit_predict(as_lists)
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1000, 5000, 20000]
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'articles':>9} {'backend':<24} {'time':>10} {'peak mem':>10}")
+    for n in sizes:
+        embeddings = synthetic_embeddings(n, dim)
+        runs = [("old path (lists)", lambda: old_path(embeddings))]
+        runs += [(name, lambda name=name: cluster_embeddings(embeddings, N_CLUSTERS, backend=name)) for name in BACKENDS]
+        for label, fn in runs:
+            if n > MAX_N_FOR_AGGLOMERATIVE and label in ("old path (lists)", "agglomerative"):
+                print(f"{n:>9} {label:<24} {'skipped (O(n^2) memory)':>21}")
+                continue
+            elapsed, peak_mb = measure(fn)
+            print(f"{n:>9} {label:<24} {elapsed:>9.2f}s {peak_mb:>8.0f} MB")
+        print(f"{n:>9} auto picks {choose_backend(n)}")
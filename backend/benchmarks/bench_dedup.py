@@ -0,0 +1,59 @@
+# benchmarks/bench_dedup.py
+# Description: articles left for embedding and clustering after deduplication (dedup.py),
+# and its run time, on a synthetic feed where stories are syndicated under several URLs,
+# headlines and byline prefixes.
+#
+# usage: python benchmarks/bench_dedup.py [stories] [max_copies]
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "news_handler"))
+from news import News
+from dedup import Deduplicator
+
+WORDS = ("shares stocks bond yields rally slump earnings forecast revenue guidance fed rate cut inflation "
+         "oil crude demand supply chips semiconductor bank lender merger deal regulator probe tariff china "
+         "europe dollar treasury investors analysts quarter record growth outlook margin buyback dividend").split()
+OUTLETS = ("reuters.com", "finance.yahoo.com", "marketwatch.com", "benzinga.com", "fool.com", "cnbc.com")
+
+
+def synthetic_feed(stories, max_copies, seed=7):
+    rng = random.Random(seed)
+    feed = []
+    for story in range(stories):
+        title = " ".join(rng.choice(WORDS) for _ in range(8)).capitalize()
+        summary = " ".join(rng.choice(WORDS) for _ in range(40)) + "."
+        for copy in range(rng.randint(1, max_copies)):
+            outlet = OUTLETS[copy % len(OUTLETS)]
+            variant = rng.random()
+            if variant < 0.3:
+                # Same article, tracking parameters on the link
+                link, copy_title, copy_summary = f"https://www.{OUTLETS[0]}/{story}?utm_source=feed{copy}", title, summary
+            elif variant < 0.6:
+                link, copy_title, copy_summary = f"https://{outlet}/{story}-{copy}", title + f" - {outlet}", summary
+            else:
+                link = f"https://{outlet}/news/{story}/{copy}"
+                copy_title = " ".join(rng.choice(WORDS) for _ in range(7)).capitalize()
+                copy_summary = f"({outlet.split('.')[0]}) - " + summary
+            feed.append(News("20240101T1200", copy_title, link, copy_summary))
+    rng.shuffle(feed)
+    return feed
+
+
+if __name__ == "__main__":
+    stories = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    max_copies = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    feed = synthetic_feed(stories, max_copies)
+    print(f"{len(feed)} articles from {stories} stories (up to {max_copies} copies each)")
+    print(f"{'mode':>12} {'kept':>6} {'exact':>6} {'near':>6} {'reduction':>10} {'time':>9}")
+    for name, threshold in (("exact only", 1.0), ("exact+near", 0.8)):
+        stats = {}
+        start = time.perf_counter()
+        Deduplicator(near_threshold=threshold).dedupe(feed, stats)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{name:>12} {stats['unique']:>6} {stats['exact_duplicates']:>6} {stats['near_duplicates']:>6} "
+              f"{stats['reduction']:>10.1%} {elapsed:>7.1f}ms")
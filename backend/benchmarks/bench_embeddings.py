@@ -0,0 +1,47 @@
+# benchmarks/bench_embeddings.py
+# Description: cold-path embedding latency, one request per article vs batched requests,
+# against a local stub embedding server.
+#
+# usage: python benchmarks/bench_embeddings.py [num_articles] [latency_seconds]
+
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from openai import OpenAI
+from news_handler.embeddings import embed_texts
+from stub_servers import start_stub_server, embeddings_route
+
+
+def run(client, texts, batch_size, max_concurrency):
+    stats = []
+    start = time.perf_counter()
+    embeddings = embed_texts(client, texts, batch_size=batch_size, max_concurrency=max_concurrency, stats=stats)
+    elapsed = time.perf_counter() - start
+    assert len(embeddings) == len(texts)
+    return elapsed, stats
+
+
+if __name__ == "__main__":
+    num_articles = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server, base_url = start_stub_server(embeddings_route(), latency=latency)
+    client = OpenAI(api_key="stub", base_url=f"{base_url}/v1")
+    texts = [f"Synthetic market news summary number {i}." for i in range(num_articles)]
+
+    print(f"{num_articles} articles, {latency * 1000:.0f} ms stub latency per request")
+    for label, batch_size, concurrency in [
+        ("per-article (old path)", 1, 1),
+        ("batched, sequential", 50, 1),
+        ("batched, concurrent", 50, 4),
+    ]:
+        elapsed, stats = run(client, texts, batch_size, concurrency)
+        latencies = sorted(s["latency_ms"] for s in stats)
+        print(f"{label:<24} total {elapsed * 1000:8.0f} ms  "
+              f"batches {len(stats):4d}  median batch {latencies[len(latencies) // 2]:6.0f} ms")
+
+    server.shutdown()
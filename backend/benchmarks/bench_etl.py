@@ -0,0 +1,96 @@
+# benchmarks/bench_etl.py
+# Description: upstream calls of a nightly day / week / month snapshot run, the three
+# separate pipelines (one fetch per day per rollup) against the shared ETL (etl.py),
+# cold and with the previous night's days cached. Alpha Vantage and OpenAI are local stubs.
+#
+# usage: python benchmarks/bench_etl.py [articles_per_day] [latency_seconds]
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stub_servers import start_stub_server, news_feed_route, embeddings_route, chat_completions_route
+
+
+def counting(routes, counts, lock):
+    """Wrap stub routes so every request and embedded input is counted."""
+    def wrap(key, handle):
+        def counted(path, body):
+            with lock:
+                counts[key[1]] += 1
+                if body and "input" in body:
+                    counts["embedded"] += len(body["input"]) if isinstance(body["input"], list) else 1
+            return handle(path, body)
+        return counted
+    return {key: wrap(key, handle) for key, handle in routes.items()}
+
+
+def separate_pipelines(end_day):
+    """The day, week and month pipelines as they ran before etl.py: each fetches its own days."""
+    from news_query import cluster, get_summary, data_to_news, dedupe_by_link, hash_event_label
+    from news_handler.alpha_vantage import fetch_news_windows
+    for days, limit, max_clusters in ((1, 1000, 5), (7, 1000, 10), (30, 50, 5)):
+        windows = [((end_day - timedelta(days=d)).strftime("%Y%m%dT0000"),
+                    (end_day - timedelta(days=d - 1)).strftime("%Y%m%dT0000")) for d in range(days)]
+        news_list = []
+        for data in fetch_news_windows(windows, limit=limit):
+            news_list.extend(data_to_news(data))
+        news_list = dedupe_by_link(news_list)
+        get_summary(hash_event_label(cluster(news_list, max_clusters=max_clusters), news_list), max_words=150)
+
+
+if __name__ == "__main__":
+    articles = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+
+    counts, lock = Counter(), threading.Lock()
+    routes = {**news_feed_route(articles_per_window=articles), **embeddings_route(), **chat_completions_route()}
+    server, base_url = start_stub_server(counting(routes, counts, lock), latency=latency)
+    cache_dir = tempfile.mkdtemp()
+    os.environ.update({
+        "ALPHA_VANTAGE_URL": f"{base_url}/query",
+        "ALPHA_VANTAGE_API_KEY": "stub",
+        "ALPHA_VANTAGE_REQUESTS_PER_MINUTE": "600000",
+        "ALPHA_VANTAGE_BURST": "1000",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "OPEN_AI_KEY": "stub",
+        "EVENT_PREDICTION_OPENAI_API_KEY": "stub",
+        # Only the per-day ETL store may answer, so the counts show what it saves
+        "EMBEDDING_CACHE": "0",
+        "SUMMARY_CACHE": "0",
+        "LLM_CACHE": "0",
+        "ETL_CACHE_DIR": cache_dir,
+    })
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.append(backend_dir)
+    sys.path.append(os.path.join(backend_dir, "news_handler"))
+    from etl import run_rollups
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    last_night, tonight = today - timedelta(days=2), today - timedelta(days=1)
+
+    def measure(name, run):
+        counts.clear()
+        start = time.perf_counter()
+        run()
+        return name, dict(counts), time.perf_counter() - start
+
+    rows = [
+        measure("separate pipelines", lambda: separate_pipelines(tonight)),
+        measure("etl, cold cache", lambda: list(run_rollups(end_day=last_night))),
+        measure("etl, nightly", lambda: list(run_rollups(end_day=tonight))),
+    ]
+    server.shutdown()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"{articles} articles per day, {latency}s stub latency")
+    print(f"{'run':>20} {'av calls':>9} {'embed calls':>12} {'embedded':>9} {'llm calls':>10} {'time':>7}")
+    for name, c, elapsed in rows:
+        print(f"{name:>20} {c.get('/query', 0):>9} {c.get('/v1/embeddings', 0):>12} {c.get('embedded', 0):>9} "
+              f"{c.get('/v1/chat/completions', 0):>10} {elapsed:>6.1f}s")
@@ -0,0 +1,48 @@
+# benchmarks/bench_local_embeddings.py
+# Description: local CPU embedding throughput (articles per second) per runtime and
+# thread count. Downloads the model on first run.
+#
+# usage: python benchmarks/bench_local_embeddings.py [num_articles] [threads, e.g. 1,4] [runtimes, e.g. torch,quantized]
+
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import news_handler.local_embeddings as local_embeddings
+
+
+def synthetic_summaries(n):
+    return [
+        f"Shares of company {i % 97} moved {i % 13}% after quarterly results beat estimates "
+        f"and management raised guidance for the coming fiscal year, citing demand number {i}."
+        for i in range(n)
+    ]
+
+
+if __name__ == "__main__":
+    num_articles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    thread_counts = [int(t) for t in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, os.cpu_count()]
+    runtimes = sys.argv[3].split(",") if len(sys.argv) > 3 else ["torch", "quantized"]
+    logging.getLogger().setLevel(logging.WARNING)
+    texts = synthetic_summaries(num_articles)
+
+    print(f"{num_articles} articles, model {local_embeddings.LOCAL_EMBEDDING_MODEL}")
+    for runtime in runtimes:
+        for threads in thread_counts:
+            local_embeddings.LOCAL_EMBEDDING_RUNTIME = runtime
+            local_embeddings.LOCAL_EMBEDDING_THREADS = threads
+            local_embeddings._model = None
+
+            start = time.perf_counter()
+            local_embeddings.get_local_model()
+            load_s = time.perf_counter() - start
+            # Warm-up batch so one-time kernel setup is not counted
+            local_embeddings.embed_texts_local(texts[:32])
+
+            start = time.perf_counter()
+            vectors = local_embeddings.embed_texts_local(texts)
+            elapsed = time.perf_counter() - start
+            print(f"{runtime:<10} threads {threads:>3}  load {load_s:5.1f}s  "
+                  f"{num_articles / elapsed:8.0f} articles/s  dim {vectors.shape[1]}")
@@ -0,0 +1,78 @@
+# benchmarks/bench_predict_batch.py
+# Description: scenarios per second of EventPredictor.predict_batch (threads and async)
+# against one predict_events call per scenario, with the LLM replaced by a local stub.
+#
+# usage: python benchmarks/bench_predict_batch.py [scenarios] [distinct event sets] [latency_seconds]
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stub_servers import start_stub_server, chat_completions_route
+
+CONCURRENCY = [1, 4, 8]
+
+
+def scenarios(n, distinct):
+    from event_prediction.event_predictor import NewsEvent, News
+    # Sector scenarios share the macro events; every `distinct`-th one repeats an earlier set
+    macro = [NewsEvent(event_id=1, event_content="Central bank holds rates", news_list=[
+        News(title="Rates unchanged", news_content="The central bank kept rates steady.")])]
+    return {
+        f"scenario_{i}": macro + [NewsEvent(event_id=2, event_content=f"Sector {i % distinct} earnings beat", news_list=[
+            News(title=f"Sector {i % distinct} results", news_content="Quarterly earnings came in above estimates.")])]
+        for i in range(n)
+    }
+
+
+def run_all(predictor, batch):
+    rows = []
+    start = time.perf_counter()
+    for events in batch.values():
+        predictor.predict_events(events)
+    rows.append(("one call per scenario", time.perf_counter() - start, None))
+
+    for concurrency in CONCURRENCY:
+        metadata = {}
+        start = time.perf_counter()
+        predictor.predict_batch(batch, max_concurrency=concurrency, metadata=metadata)
+        rows.append((f"predict_batch (x{concurrency})", time.perf_counter() - start, metadata))
+
+    for concurrency in CONCURRENCY:
+        metadata = {}
+        start = time.perf_counter()
+        asyncio.run(predictor.predict_batch_async(batch, max_concurrency=concurrency, metadata=metadata))
+        rows.append((f"predict_batch_async (x{concurrency})", time.perf_counter() - start, metadata))
+    return rows
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+
+    server, base_url = start_stub_server(chat_completions_route(), latency=latency)
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "EVENT_PREDICTION_OPENAI_API_KEY": "stub",
+        # Every scenario must reach the stub, so repeats are not answered from the response cache
+        "LLM_CACHE": "0",
+    })
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from event_prediction.event_predictor import EventPredictor
+
+    batch = scenarios(n, distinct)
+    # The predictor prints every prompt
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = run_all(EventPredictor(), batch)
+    server.shutdown()
+
+    print(f"{n} scenarios, {distinct} distinct event sets, {latency}s stub latency")
+    print(f"{'path':<28} {'calls':>6} {'time':>9} {'scenarios/s':>12}")
+    for label, elapsed, metadata in rows:
+        calls = metadata["model_calls"] if metadata else n
+        print(f"{label:<28} {calls:>6} {elapsed:>8.2f}s {n / elapsed:>12.1f}")
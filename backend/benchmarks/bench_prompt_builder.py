@@ -0,0 +1,66 @@
+# benchmarks/bench_prompt_builder.py
+# Description: prediction prompt size (tokens) and build time against event count,
+# for the previous unbounded += concatenation and the token-budgeted builder.
+#
+# usage: python benchmarks/bench_prompt_builder.py [event counts, e.g. 5,20,100,500] [news per event]
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from event_prediction.event_predictor import NewsEvent, News
+from event_prediction.prompt_builder import build_prompt, count_tokens, PREDICTION_PROMPT_TOKEN_BUDGET
+
+HEADER = "Based on the given past events and their associated news, predict future events that might happen.\n<past_events>\n"
+WORDS = ("market rates inflation earnings guidance tariffs supply chain demand chips energy oil bank "
+         "regulator merger layoffs growth forecast dividend bond yields currency consumer retail").split()
+REPEATS = 5
+
+
+def synthetic_events(n, news_per_event, seed=0):
+    rng = random.Random(seed)
+    text = lambda k: " ".join(rng.choice(WORDS) for _ in range(k))
+    return [
+        NewsEvent(event_id=idx + 1, event_content=text(40), news_list=[
+            News(title=text(8), news_content=text(120), post_time=f"2025-04-{rng.randint(1, 28):02d}T12:00:00")
+            for _ in range(news_per_event)
+        ])
+        for idx in range(n)
+    ]
+
+
+def old_prompt(events):
+    # What get_prediction_prompt() used to do: += every event and every article, no limit
+    prompt = HEADER
+    for event in events:
+        prompt += f"\nEvent {event.event_id}: {event.event_content}\n"
+        if event.news_list:
+            prompt += "Related News:\n"
+            for news in event.news_list:
+                prompt += f"- {news.title}: {news.news_content}\n"
+    prompt += "</past_events>"
+    return prompt
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return result, (time.perf_counter() - start) / REPEATS * 1000
+
+
+if __name__ == "__main__":
+    counts = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [5, 20, 100, 500]
+    news_per_event = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    print(f"budget: {PREDICTION_PROMPT_TOKEN_BUDGET} tokens, {news_per_event} articles per event")
+    print(f"{'events':>7} {'path':<10} {'tokens':>9} {'build ms':>9} {'events kept':>12} {'news kept':>10}")
+    for n in counts:
+        events = synthetic_events(n, news_per_event)
+        prompt, elapsed = timed(lambda: old_prompt(events))
+        print(f"{n:>7} {'old (+=)':<10} {count_tokens(prompt):>9} {elapsed:>9.2f} {n:>12} {n * news_per_event:>10}")
+        (prompt, stats), elapsed = timed(lambda: build_prompt(HEADER, events))
+        print(f"{n:>7} {'budgeted':<10} {stats['prompt_tokens']:>9} {elapsed:>9.2f} "
+              f"{stats['events_included']:>12} {stats['news_included']:>10}")
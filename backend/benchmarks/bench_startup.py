@@ -0,0 +1,55 @@
+# benchmarks/bench_startup.py
+# Description: cold-start cost of importing the Flask app, measured with
+# `python -X importtime` in fresh interpreters.
+#
+# usage: python benchmarks/bench_startup.py [module, default app] [runs] [top]
+
+import os
+import re
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Imports that should only happen on first use, not at boot
+HEAVY_MODULES = ["openai", "sentence_transformers", "torch", "transformers", "sklearn", "scipy", "pymongo"]
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_once(module):
+    env = dict(os.environ)
+    # Keys only need to exist so module-level configuration can be read
+    for key in ("OPEN_AI_KEY", "OPENAI_API_KEY", "EVENT_PREDICTION_OPENAI_API_KEY", "ALPHA_VANTAGE_API_KEY"):
+        env.setdefault(key, "bench")
+    env["CACHE_PREWARM"] = "0"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    modules = {}
+    for match in LINE.finditer(result.stderr):
+        _, cumulative, indent, name = match.groups()
+        modules[name] = (int(cumulative), len(indent))
+    return wall, modules
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "app"
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    top = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    walls = []
+    for _ in range(runs):
+        wall, modules = import_once(module)
+        walls.append(wall)
+
+    print(f"import {module}: median wall {sorted(walls)[len(walls) // 2] * 1000:.0f} ms over {runs} runs "
+          f"(own import {modules[module][0] / 1000:.0f} ms)")
+    print("heavy modules loaded at import:",
+          ", ".join(name for name in HEAVY_MODULES if name in modules) or "none")
+    print(f"top {top} direct imports by cumulative time:")
+    direct = [(cumulative, name) for name, (cumulative, depth) in modules.items() if depth <= 3 and name != module]
+    for cumulative, name in sorted(direct, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
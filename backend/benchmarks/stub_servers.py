@@ -0,0 +1,147 @@
+# benchmarks/stub_servers.py
+# Description: local stand-ins for the upstream APIs so the pipeline can be benchmarked offline
+
+import base64
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # Set on the subclass created by start_stub_server
+    routes = {}
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, method):
+        path = self.path.split("?", 1)[0]
+        handler = self.routes.get((method, path))
+        if handler is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = None
+        if method == "POST":
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.latency)
+        payload = json.dumps(handler(self.path, body)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._reply("GET")
+
+    def do_POST(self):
+        self._reply("POST")
+
+
+def start_stub_server(routes, latency=0.05):
+    """
+    Start a threaded HTTP server on a free local port.
+
+    Args:
+        routes: {(method, path): fn(path, json_body) -> json-serializable response}
+        latency: Seconds every request sleeps before answering, to mimic network time.
+
+    Returns:
+        (server, base_url); call server.shutdown() when done.
+    """
+    handler = type("StubHandler", (_StubHandler,), {"routes": routes, "latency": latency})
+    # The default listen backlog of 5 drops connections under concurrent load
+    server_class = type("StubServer", (ThreadingHTTPServer,), {"request_queue_size": 1024})
+    server = server_class(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def embeddings_route(dim=1536):
+    """
+    OpenAI-compatible POST /v1/embeddings returning random vectors, base64-encoded
+    float32 when the client asks for encoding_format=base64 (the openai default).
+    """
+    # A fixed pool keeps the stub cheap enough that it is not what a benchmark measures
+    vectors = [[random.random() for _ in range(dim)] for _ in range(256)]
+    encoded = [base64.b64encode(struct.pack(f"<{dim}f", *v)).decode() for v in vectors]
+
+    def handle(path, body):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        pool = encoded if body.get("encoding_format") == "base64" else vectors
+        return {
+            "object": "list",
+            "model": body.get("model", "stub"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": random.choice(pool)}
+                for i in range(len(inputs))
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+    return {("POST", "/v1/embeddings"): handle}
+
+
+def news_feed_route(articles_per_window=30):
+    """Alpha Vantage-compatible GET /query returning articles unique to each window."""
+    def handle(path, body):
+        params = parse_qs(urlparse(path).query)
+        time_from = params.get("time_from", ["20240101T0000"])[0]
+        limit = min(int(params.get("limit", [articles_per_window])[0]), articles_per_window)
+        return {
+            "items": str(limit),
+            "feed": [
+                {
+                    "title": f"Story {i} from {time_from}",
+                    "url": f"https://news.example.com/{time_from}/{i}",
+                    "time_published": time_from + "00",
+                    "summary": f"Synthetic summary {i} for the window starting {time_from}.",
+                }
+                for i in range(limit)
+            ],
+        }
+    return {("GET", "/query"): handle}
+
+
+def chat_completions_route():
+    """
+    OpenAI-compatible POST /v1/chat/completions. JSON-object requests get a
+    combined cluster analysis for every cluster in the user message, structured
+    (json_schema) requests get a TopicResult or a PredictedEventList, anything else
+    plain text.
+    """
+    def handle(path, body):
+        response_format = (body.get("response_format") or {}).get("type")
+        if response_format == "json_object":
+            clusters = json.loads(body["messages"][-1]["content"])
+            content = json.dumps({"clusters": [
+                {"cluster_id": cluster["cluster_id"], "summary": f"Stub summary of {len(cluster['news'])} articles.",
+                 "topic": "Markets", "risk": 4, "opportunity": 6, "rationale": "Stub rationale."}
+                for cluster in clusters
+            ]})
+        elif response_format == "json_schema" and body["response_format"]["json_schema"]["name"] == "TopicResult":
+            content = json.dumps({"topic": "Stub topic"})
+        elif response_format == "json_schema":
+            content = json.dumps({"predictions": [
+                {"cause": [{"weight": 100, "event": {"event_id": 1, "event_content": "Stub cause."}}],
+                 "content": f"Stub prediction {i}.", "confidency_score": 60, "reason": "Stub reason."}
+                for i in range(3)
+            ]})
+        else:
+            content = "Stub completion."
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content, "refusal": None}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+    return {("POST", "/v1/chat/completions"): handle}
@@ -0,0 +1,77 @@
+# clients.py
+# Description: process-wide API clients, created on first use and shared by every module
+
+import os
+import threading
+import weakref
+from typing import Optional
+
+_env_loaded = False
+_clients = {}
+# Event loop -> {(key, base_url): client}; entries go with their loop
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def load_env() -> None:
+    """Load .env into the environment once per process."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def get_openai_client(api_key_env: str = "OPEN_AI_KEY", base_url: Optional[str] = None,
+                      api_key: Optional[str] = None):
+    """
+    Shared OpenAI client for an API key and base URL.
+
+    The key is api_key if given, otherwise the value of the api_key_env environment
+    variable, falling back to OPENAI_API_KEY. The openai package is only imported
+    when the first client is created, and every caller asking for the same key and
+    base URL gets the same client (and its connection pool). Clients do not retry on
+    their own; calls go through llm_gateway, which does.
+    """
+    load_env()
+    key = api_key or os.getenv(api_key_env) or os.getenv("OPENAI_API_KEY")
+    with _lock:
+        client = _clients.get((key, base_url))
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=key, base_url=base_url, max_retries=0)
+            _clients[(key, base_url)] = client
+        return client
+
+
+def get_async_openai_client(api_key_env: str = "OPEN_AI_KEY", base_url: Optional[str] = None,
+                            api_key: Optional[str] = None):
+    """
+    Shared AsyncOpenAI client for an API key and base URL on the running event loop.
+
+    Async clients hold connections bound to the loop that opened them, so there is
+    one per event loop; call this from inside a coroutine. Clients of a loop are
+    dropped once the loop is closed or garbage collected.
+    """
+    import asyncio
+
+    load_env()
+    key = api_key or os.getenv(api_key_env) or os.getenv("OPENAI_API_KEY")
+    loop = asyncio.get_running_loop()
+    with _lock:
+        # Pooled connections keep a closed loop referenced, so drop those explicitly
+        for closed in [other for other in list(_async_clients) if other.is_closed()]:
+            del _async_clients[closed]
+        loop_clients = _async_clients.setdefault(loop, {})
+        client = loop_clients.get((key, base_url))
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=key, base_url=base_url, max_retries=0)
+            loop_clients[(key, base_url)] = client
+        return client
+
+
+def client_stats() -> dict:
+    with _lock:
+        return {"openai_clients": len(_clients),
+                "async_openai_clients": sum(len(loop_clients) for loop_clients in _async_clients.values())}
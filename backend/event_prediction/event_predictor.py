@@ -2,21 +2,34 @@
 # Description: Event predictor for predicting future events based on past events
 
 from enum import Enum
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from typing import List, Dict, Optional, Union
 from pydantic import BaseModel, Field
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import sys
 import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clients import get_openai_client, get_async_openai_client, load_env
+from llm_gateway import gateway
+try:
+    from .prompt_builder import build_prompt
+except ImportError:
+    from prompt_builder import build_prompt
 
 # Load environment variables from .env file
-load_dotenv()
+load_env()
 OPENAI_API_KEY = os.getenv("EVENT_PREDICTION_OPENAI_API_KEY")
+# Model calls predict_batch() keeps in flight at once
+PREDICTION_BATCH_CONCURRENCY = int(os.getenv("PREDICTION_BATCH_CONCURRENCY", 4))
 
 # Define the models for input and output
 class News(BaseModel):
     title: str
     news_content: str
+    post_time: Optional[Union[str, datetime]] = None # Used to rank news by recency in the prompt
 
 class NewsEvent(BaseModel):
     event_id: int
@@ -67,30 +80,41 @@ class EventPredictor:
         """
         if predictor_type == PredictorType.PUBLIC:
             self.api_key = api_key or OPENAI_API_KEY
-            self.client = OpenAI(api_key=self.api_key)
+            self.base_url = None
         elif predictor_type == PredictorType.PRIVATE:
-            self.api_key = "lm-studio"
-            # Initialize the client
-            self.client = OpenAI(
-                        api_key=self.api_key,  # Doesn't matter if LM Studio doesn't check
-                        base_url="https://28fe-131-215-220-32.ngrok-free.app/v1"  # Note: base_url instead of api_base
-                    )
-            
+            self.api_key = "lm-studio"  # Doesn't matter if LM Studio doesn't check
+            self.base_url = "https://28fe-131-215-220-32.ngrok-free.app/v1"  # Note: base_url instead of api_base
         else: 
             raise ValueError("Invalid predictor type")
         
         self.predictor_type = predictor_type
-    def get_prediction_prompt(self, events: List[Union[NewsEvent, Event]]) -> str:
+
+    @property
+    def client(self):
+        # Shared with every other user of the same key and URL, created on first use
+        return get_openai_client(api_key=self.api_key, base_url=self.base_url)
+
+    @property
+    def async_client(self):
+        return get_async_openai_client(api_key=self.api_key, base_url=self.base_url)
+
+    def get_prediction_prompt(self, events: List[Union[NewsEvent, Event]], stats: Optional[dict] = None,
+                              model: str = "gpt-4o") -> str:
         """
         Generate a prompt for the OpenAI model to predict future events.
         
+        Events and their best-ranked news are fitted into PREDICTION_PROMPT_TOKEN_BUDGET
+        tokens (see prompt_builder.py).
+        
         Args:
             events: List of past events (either NewsEvent or Event objects).
+            stats: Optional dict, filled with the prompt's token count and what was kept.
+            model: Model whose tokenizer counts the tokens.
             
         Returns:
             The generated prompt as a string.
         """
-        prompt = """
+        header = """
         Based on the given past events and their associated news, predict future events that might happen.
         
         Consider the following:
@@ -108,64 +132,162 @@ class EventPredictor:
         <past_events>
         """
         
-        for event in events:
-            prompt += f"\nEvent {event.event_id}: {event.event_content}\n"
-            # Check if the event is a NewsEvent with news_list
-            if hasattr(event, 'news_list') and event.news_list:
-                prompt += "Related News:\n"
-                for news in event.news_list:
-                    prompt += f"- {news.title}: {news.news_content}\n"
-        
-        prompt += "</past_events>"
-        
+        prompt, prompt_stats = build_prompt(header, events, model=model)
+        if stats is not None:
+            stats.update(prompt_stats)
         return prompt
     
-    def predict_events(self, events: List[Union[NewsEvent, Event]], num_predictions: int = 3, private_predict_model: PrivatePredictionModels = PrivatePredictionModels.QWQ_32B.name) -> PredictedEventList:
+    def _prediction_request(self, events: List[Union[NewsEvent, Event]], num_predictions: int,
+                            private_predict_model, metadata: Optional[dict] = None) -> dict:
+        """Arguments for the structured-output completion behind predict_events()."""
+        model = "gpt-4o" if self.predictor_type == PredictorType.PUBLIC else private_predict_model
+        prompt_stats = {}
+        prompt = self.get_prediction_prompt(events, stats=prompt_stats, model=model)
+        if metadata is not None:
+            metadata["prompt"] = prompt_stats
+        print(f"Prompt ({prompt_stats['prompt_tokens']} tokens, budget {prompt_stats['budget']}): {prompt}")
+        
+        # Get structured predictions from OpenAI using JSON response format
+        print(f"user prompt: ---\n Predict {num_predictions} future events based on the provided past events.")
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": f"Predict {num_predictions} future events based on the provided past events."}
+        ]
+        if self.predictor_type == PredictorType.PUBLIC:
+            return {"model": model, "messages": messages, "response_format": PredictedEventList}
+        elif self.predictor_type == PredictorType.PRIVATE:
+            return {
+                "model": model,
+                "messages": messages,
+                "response_format": PredictedEventList,
+                "extra_headers": {
+                    "ngrok-skip-browser-warning": "true"
+                },
+            }
+        else:
+            raise ValueError("Invalid predictor type")
+
+    def predict_events(self, events: List[Union[NewsEvent, Event]], num_predictions: int = 3, private_predict_model: PrivatePredictionModels = PrivatePredictionModels.QWQ_32B.name, metadata: Optional[dict] = None) -> PredictedEventList:
         """
         Predict future events based on past events.
         
         Args:
             events: List of past events (either NewsEvent or Event objects).
             num_predictions: Number of predictions to generate.
+            metadata: Optional dict; its "prompt" entry is set to the prompt's token stats.
             
         Returns:
             List of predicted events.
         """
-        prompt = self.get_prediction_prompt(events)
-        
-        # Get structured predictions from OpenAI using JSON response format
-        print(f"Prompt: {prompt}")
-        print(f"user prompt: ---\n Predict {num_predictions} future events based on the provided past events.")
-        if self.predictor_type == PredictorType.PUBLIC:
-            completion = self.client.beta.chat.completions.parse(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": f"Predict {num_predictions} future events based on the provided past events."}
-                ],
-                response_format=PredictedEventList
-            )
-        elif self.predictor_type == PredictorType.PRIVATE:
-            completion = self.client.beta.chat.completions.parse(
-                            model=private_predict_model,
-                            messages=[
-                                {"role": "system", "content": prompt},
-                                {"role": "user", "content": f"Predict {num_predictions} future events based on the provided past events."}
-                            ],
-                            response_format=PredictedEventList,
-                            extra_headers={
-                                                "ngrok-skip-browser-warning": "true"
-                                            }
-                        )
-        else:
-            raise ValueError("Invalid predictor type")
-        
+        # The same events produce the same prompt, so repeats are served from the LLM response cache
+        response_content = gateway.parse_model(
+            self.client, "event_predictor",
+            **self._prediction_request(events, num_predictions, private_predict_model, metadata)
+        )
         
         # Parse the JSON response
-        response_content = completion.choices[0].message.parsed
         assert isinstance(response_content, PredictedEventList)
         # print(type(response_content)) #<class 'event_predictor.PredictedEventList'>
         return response_content
+
+    async def predict_events_async(self, events: List[Union[NewsEvent, Event]], num_predictions: int = 3, private_predict_model: PrivatePredictionModels = PrivatePredictionModels.QWQ_32B.name, metadata: Optional[dict] = None) -> PredictedEventList:
+        """predict_events() on the async client, for the async server; the prompt is built in a thread."""
+        request = await asyncio.to_thread(self._prediction_request, events, num_predictions,
+                                          private_predict_model, metadata)
+        response_content = await gateway.parse_model_async(self.async_client, "event_predictor", **request)
+        assert isinstance(response_content, PredictedEventList)
+        return response_content
+    
+    @staticmethod
+    def _batch_groups(scenarios: Dict[str, List[Union[NewsEvent, Event]]]) -> List[tuple]:
+        """
+        (events, scenario names) per distinct event set: repeated events inside a
+        scenario are dropped and scenarios left with the same events share one call.
+        """
+        groups = {}
+        for name, events in scenarios.items():
+            unique = {}
+            for event in events:
+                unique.setdefault(event.model_dump_json(), event)
+            key = tuple(unique)
+            groups.setdefault(key, (list(unique.values()), []))[1].append(name)
+        return list(groups.values())
+
+    @staticmethod
+    def _collect_batch(groups: List[tuple], outcomes: list, start: float,
+                       metadata: Optional[dict]) -> Dict[str, PredictedEventList]:
+        results, prompts, errors = {}, {}, {}
+        for (_, names), (outcome, prompt_meta) in zip(groups, outcomes):
+            for name in names:
+                if isinstance(outcome, Exception):
+                    errors[name] = str(outcome)
+                else:
+                    results[name] = outcome
+                    prompts[name] = prompt_meta.get("prompt")
+        if metadata is not None:
+            metadata.update({
+                "scenarios": sum(len(names) for _, names in groups),
+                "model_calls": len(groups),
+                "prompts": prompts,
+                "errors": errors,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            })
+        return results
+
+    def predict_batch(self, scenarios: Dict[str, List[Union[NewsEvent, Event]]], num_predictions: int = 3,
+                      private_predict_model: PrivatePredictionModels = PrivatePredictionModels.QWQ_32B.name,
+                      max_concurrency: int = PREDICTION_BATCH_CONCURRENCY,
+                      metadata: Optional[dict] = None) -> Dict[str, PredictedEventList]:
+        """
+        Predict future events for several alternative event sets at once.
+        
+        Args:
+            scenarios: Scenario name -> its past events.
+            num_predictions: Number of predictions per scenario.
+            max_concurrency: Model calls in flight at once.
+            metadata: Optional dict, filled with the number of model calls, the prompt
+                stats per scenario and the error of every scenario that failed.
+            
+        Returns:
+            Scenario name -> predicted events, for the scenarios that succeeded.
+        """
+        start = time.perf_counter()
+        groups = self._batch_groups(scenarios)
+        
+        def run(events):
+            prompt_meta = {}
+            try:
+                return self.predict_events(events, num_predictions, private_predict_model, metadata=prompt_meta), prompt_meta
+            except Exception as e:
+                print(f"Batch prediction failed: {e}")
+                return e, prompt_meta
+        
+        workers = max(1, min(max_concurrency, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(run, [events for events, _ in groups]))
+        return self._collect_batch(groups, outcomes, start, metadata)
+
+    async def predict_batch_async(self, scenarios: Dict[str, List[Union[NewsEvent, Event]]], num_predictions: int = 3,
+                                  private_predict_model: PrivatePredictionModels = PrivatePredictionModels.QWQ_32B.name,
+                                  max_concurrency: int = PREDICTION_BATCH_CONCURRENCY,
+                                  metadata: Optional[dict] = None) -> Dict[str, PredictedEventList]:
+        """predict_batch() on the async client; calls are bounded by a semaphore instead of threads."""
+        start = time.perf_counter()
+        groups = self._batch_groups(scenarios)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def run(events):
+            prompt_meta = {}
+            try:
+                async with semaphore:
+                    return await self.predict_events_async(events, num_predictions, private_predict_model,
+                                                           metadata=prompt_meta), prompt_meta
+            except Exception as e:
+                print(f"Batch prediction failed: {e}")
+                return e, prompt_meta
+        
+        outcomes = await asyncio.gather(*(run(events) for events, _ in groups))
+        return self._collect_batch(groups, outcomes, start, metadata)
     
     def predict_from_json(self, json_str: str, num_predictions: int = 3) -> PredictedEventList:
         """
@@ -0,0 +1,144 @@
+# Description: token-budgeted construction of the prediction prompt
+
+import os
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+# Tokens the <past_events> prompt may use in total, instructions included
+PREDICTION_PROMPT_TOKEN_BUDGET = int(os.getenv("PREDICTION_PROMPT_TOKEN_BUDGET", 6000))
+# Articles kept per event at most, and tokens per article before it is cut
+PREDICTION_NEWS_PER_EVENT = int(os.getenv("PREDICTION_NEWS_PER_EVENT", 5))
+PREDICTION_NEWS_MAX_TOKENS = int(os.getenv("PREDICTION_NEWS_MAX_TOKENS", 150))
+# "relevance" (word overlap with the event summary, newest first on ties) or "recency"
+PREDICTION_NEWS_RANKING = os.getenv("PREDICTION_NEWS_RANKING", "relevance")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """tiktoken encoding for model, or None when it cannot be loaded (e.g. offline, no BPE cache)."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"[prompt builder] tiktoken unavailable for {model} ({e}); estimating 4 characters per token")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """text cut to at most max_tokens tokens ("..." marks a cut)."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text if len(text) <= max_tokens * 4 else text[:max(0, max_tokens * 4 - 3)] + "..."
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max(0, max_tokens - 1)]) + "..."
+
+
+def _words(text: str) -> set:
+    return set(_WORD.findall((text or "").lower()))
+
+
+def rank_news(event, ranking: str = PREDICTION_NEWS_RANKING) -> list:
+    """The event's news, most useful first."""
+    news_list = list(getattr(event, "news_list", None) or [])
+    # Stable sorts: recency first, so relevance ties keep the newest article in front
+    news_list.sort(key=lambda news: str(getattr(news, "post_time", None) or ""), reverse=True)
+    if ranking == "relevance":
+        event_words = _words(event.event_content)
+        news_list.sort(key=lambda news: -len(event_words & _words(f"{news.title} {news.news_content}")))
+    return news_list
+
+
+def build_prompt(header: str, events: list, budget: int = PREDICTION_PROMPT_TOKEN_BUDGET,
+                 model: str = "gpt-4o", news_per_event: int = PREDICTION_NEWS_PER_EVENT,
+                 news_max_tokens: int = PREDICTION_NEWS_MAX_TOKENS,
+                 ranking: str = PREDICTION_NEWS_RANKING) -> Tuple[str, dict]:
+    """
+    Fit header, events and their news into `budget` tokens.
+
+    Events are kept in the given order, each with its best-ranked article, while
+    they fit; the remaining articles are then added round-robin across the kept
+    events until the budget or news_per_event is reached. Articles are cut to
+    news_max_tokens and the prompt is joined once at the end.
+
+    Returns:
+        (prompt, stats) with prompt_tokens, budget, events, events_included,
+        news_total, news_included and news_truncated.
+    """
+    footer = "</past_events>"
+    used = count_tokens(header, model) + count_tokens(footer, model)
+    label = "Related News:\n"
+    label_cost = count_tokens(label, model)
+
+    def news_line(news):
+        content = truncate_tokens(news.news_content or "", news_max_tokens, model)
+        line = f"- {news.title}: {content}\n"
+        return line, count_tokens(line, model), content != (news.news_content or "")
+
+    event_lines: List[str] = []
+    news_lines: List[List[str]] = []
+    ranked: List[list] = []
+    news_truncated = 0
+    for event in events:
+        line = f"\nEvent {event.event_id}: {event.event_content}\n"
+        cost = count_tokens(line, model)
+        candidates = rank_news(event, ranking)[:news_per_event]
+        first = news_line(candidates[0]) if candidates else None
+        if first is not None:
+            cost += label_cost + first[1]
+        if used + cost > budget:
+            break
+        used += cost
+        event_lines.append(line)
+        news_lines.append([first[0]] if first is not None else [])
+        news_truncated += bool(first and first[2])
+        ranked.append(candidates)
+
+    full = False
+    for position in range(1, news_per_event):
+        for idx, candidates in enumerate(ranked):
+            if position >= len(candidates):
+                continue
+            line, cost, truncated = news_line(candidates[position])
+            if used + cost > budget:
+                full = True
+                break
+            used += cost
+            news_lines[idx].append(line)
+            news_truncated += truncated
+        if full:
+            break
+
+    parts = [header]
+    for line, lines in zip(event_lines, news_lines):
+        parts.append(line)
+        if lines:
+            parts.append(label)
+            parts.extend(lines)
+    parts.append(footer)
+    prompt = "".join(parts)
+
+    stats = {
+        "prompt_tokens": count_tokens(prompt, model),
+        "budget": budget,
+        "events": len(events),
+        "events_included": len(event_lines),
+        "news_total": sum(len(getattr(event, "news_list", None) or []) for event in events),
+        "news_included": sum(len(lines) for lines in news_lines),
+        "news_truncated": news_truncated,
+    }
+    return prompt, stats
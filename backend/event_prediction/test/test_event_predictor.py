@@ -121,6 +121,28 @@ class TestEventPredictor(unittest.TestCase):
         # Check that it includes news titles
         self.assertIn("Fed Signals Rate Hike", prompt)
         self.assertIn("OPEC Agrees to Cut Production", prompt)
+
+    def test_prompt_token_budget(self):
+        """Test that the prompt stays within its token budget, best-ranked news first."""
+        from prompt_builder import build_prompt
+        events = self.sample_events * 50
+        prompt, stats = build_prompt("<past_events>\n", events, budget=300)
+
+        self.assertLessEqual(stats["prompt_tokens"], 300)
+        self.assertLess(stats["events_included"], len(events))
+        # Each kept event brings its most relevant article along
+        self.assertEqual(stats["news_included"], stats["events_included"])
+        self.assertIn("Fed Signals Rate Hike", prompt)
+        self.assertNotIn("Markets React to Potential Rate Increase", prompt)
+
+        stats = {}
+        self.predictor.get_prediction_prompt(self.sample_events, stats=stats)
+        self.assertEqual((stats["events_included"], stats["news_included"]), (2, 3))
+
+        # Alpha Vantage publish times (YYYYMMDDTHHMM) are kept as given
+        news = News(title="Fed Signals Rate Hike", news_content="...", post_time="20250401T1200")
+        self.assertEqual(news.post_time, "20250401T1200")
+
     def test_prediction(self):
         """Test the prediction method."""
         
@@ -143,5 +165,28 @@ class TestEventPredictor(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.predictor.predict_from_json("invalid json")
 
+    def test_predict_batch(self):
+        """Test that identical scenarios share one call and a failing scenario does not sink the batch."""
+        fed, oil = self.sample_events
+        calls = []
+
+        def fake_predict(events, *args, metadata=None):
+            calls.append([event.event_id for event in events])
+            if len(events) == 1:
+                raise RuntimeError("model unavailable")
+            return self.sample_prediction_list
+
+        metadata = {}
+        with patch.object(self.predictor, "predict_events", side_effect=fake_predict):
+            results = self.predictor.predict_batch(
+                {"rates": [fed, oil], "rates_again": [fed, oil, fed], "oil_only": [oil]},
+                max_concurrency=2, metadata=metadata)
+
+        self.assertEqual(sorted(calls), [[1, 2], [2]])
+        self.assertEqual(set(results), {"rates", "rates_again"})
+        self.assertIs(results["rates"], self.sample_prediction_list)
+        self.assertEqual(metadata["model_calls"], 2)
+        self.assertEqual(metadata["errors"], {"oil_only": "model unavailable"})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,259 @@
+# job_runner.py
+# Description: disk-backed job queue for offline workloads and a runner that drains it
+# with bounded parallelism, resuming where a crashed run stopped
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs", "queue.db"))
+# Items processed at once, and results collected before they are written together
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", 4))
+JOB_FLUSH_SIZE = int(os.getenv("JOB_FLUSH_SIZE", 20))
+# Attempts per item before it is left as failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    kind TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner INTEGER,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, item_id)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (kind, status);
+"""
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    Jobs persisted in a SQLite file.
+
+    A job is an item of a kind (e.g. ("summarize", "2024-03-04")) with a JSON payload.
+    Enqueueing a job that already exists is a no-op, so a backfill can be planned
+    again without redoing finished work. claim() records the claiming process, and
+    recover() puts jobs back to pending only when that process is gone, so runners
+    in several processes can share a queue. Results are stored with the job.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        # Queues created before jobs recorded their owner
+        if "owner" not in [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+
+    def _write(self, sql: str, rows: List[tuple]) -> int:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                changed = self._db.executemany(sql, rows).rowcount
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return changed
+
+    def enqueue(self, kind: str, items: Iterable[Tuple[str, dict]]) -> int:
+        """Add (item_id, payload) jobs of a kind; returns how many were new."""
+        now = time.time()
+        rows = [(kind, item_id, json.dumps(payload), PENDING, now) for item_id, payload in items]
+        if not rows:
+            return 0
+        return self._write("INSERT OR IGNORE INTO jobs (kind, item_id, payload, status, updated_at) "
+                           "VALUES (?, ?, ?, ?, ?)", rows)
+
+    def recover(self) -> int:
+        """Put jobs left running by a process that died back to pending; live runners keep theirs."""
+        with self._lock:
+            owners = [row[0] for row in self._db.execute("SELECT DISTINCT owner FROM jobs WHERE status = ?",
+                                                         (RUNNING,))]
+        dead = [owner for owner in owners if owner is None or not _process_alive(owner)]
+        if not dead:
+            return 0
+        now = time.time()
+        return self._write("UPDATE jobs SET status = ?, owner = NULL, updated_at = ? WHERE status = ? AND owner IS ?",
+                           [(PENDING, now, RUNNING, owner) for owner in dead])
+
+    def claim(self, kind: str, limit: int) -> List[Tuple[str, dict]]:
+        """Mark up to limit pending jobs of a kind as running and return them."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT item_id, payload FROM jobs WHERE kind = ? AND status = ? ORDER BY item_id LIMIT ?",
+                    (kind, PENDING, limit)).fetchall()
+                self._db.executemany("UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE kind = ? AND item_id = ?",
+                                     [(RUNNING, os.getpid(), time.time(), kind, item_id) for item_id, _ in rows])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return [(item_id, json.loads(payload)) for item_id, payload in rows]
+
+    def complete(self, kind: str, results: List[Tuple[str, Any]]) -> None:
+        """Store the results of finished jobs, all in one transaction."""
+        now = time.time()
+        self._write("UPDATE jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE kind = ? AND item_id = ?",
+                    [(DONE, json.dumps(result, default=str), now, kind, item_id) for item_id, result in results])
+
+    def fail(self, kind: str, item_id: str, error: str) -> bool:
+        """Record a failed attempt; returns True if the job goes back to pending for another try."""
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM jobs WHERE kind = ? AND item_id = ?", (kind, item_id)).fetchone()
+        attempts = (row[0] if row else 0) + 1
+        retry = attempts < self.max_attempts
+        self._write("UPDATE jobs SET status = ?, attempts = ?, error = ?, updated_at = ? WHERE kind = ? AND item_id = ?",
+                    [(PENDING if retry else FAILED, attempts, error, time.time(), kind, item_id)])
+        return retry
+
+    def retry_failed(self, kind: Optional[str] = None) -> int:
+        """Give failed jobs (of one kind, or all) a fresh set of attempts."""
+        sql = "UPDATE jobs SET status = ?, attempts = 0, updated_at = ? WHERE status = ?"
+        args = (PENDING, time.time(), FAILED)
+        if kind is not None:
+            sql += " AND kind = ?"
+            args += (kind,)
+        return self._write(sql, [args])
+
+    def results(self, kind: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._db.execute("SELECT item_id, result FROM jobs WHERE kind = ? AND status = ?",
+                                    (kind, DONE)).fetchall()
+        return {item_id: json.loads(result) for item_id, result in rows}
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Job counts per kind and status."""
+        with self._lock:
+            rows = self._db.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status").fetchall()
+        counts = {}
+        for kind, status, count in rows:
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class JobRunner:
+    """
+    Drains a JobQueue one kind at a time.
+
+    Up to max_workers jobs run at once on a thread pool, or on a process pool with
+    processes=True for CPU-bound jobs (handlers must then be module-level functions,
+    and initializer runs once in every worker). Results are buffered and
+    handed to the kind's sink (e.g. a bulk database write) flush_size at a time,
+    then marked done in the queue in the same batch, so a crash loses at most the
+    unflushed buffer, which is redone on the next run. Sinks therefore have to be
+    idempotent (upserts). A failing job is retried up to the queue's max_attempts.
+    """
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[dict], Any]],
+                 sinks: Optional[Dict[str, Callable[[List[Tuple[str, dict, Any]]], None]]] = None,
+                 max_workers: int = JOB_MAX_WORKERS, flush_size: int = JOB_FLUSH_SIZE,
+                 processes: bool = False, initializer: Optional[Callable] = None, initargs: tuple = ()):
+        self.queue = queue
+        self.handlers = handlers
+        self.sinks = sinks or {}
+        self.max_workers = max(1, max_workers)
+        self.flush_size = max(1, flush_size)
+        self.processes = processes
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def _pool(self, kind: str):
+        if self.processes:
+            return ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer,
+                                       initargs=self.initargs)
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"jobs-{kind}",
+                                  initializer=self.initializer, initargs=self.initargs)
+
+    @staticmethod
+    def _per_minute(count: int, start: float) -> float:
+        return round(count / max(time.perf_counter() - start, 1e-9) * 60, 1)
+
+    def _flush(self, kind: str, buffer: List[Tuple[str, dict, Any]], counts: dict, total: int, start: float) -> None:
+        if not buffer:
+            return
+        sink = self.sinks.get(kind)
+        try:
+            if sink is not None:
+                sink(list(buffer))
+        except Exception as e:
+            print(f"[jobs] writing {len(buffer)} {kind} results failed: {e}")
+            for item_id, _, _ in buffer:
+                counts["retried" if self.queue.fail(kind, item_id, f"sink: {e}") else "failed"] += 1
+        else:
+            self.queue.complete(kind, [(item_id, result) for item_id, _, result in buffer])
+            counts["done"] += len(buffer)
+        buffer.clear()
+        print(f"[jobs] {kind}: {counts['done']}/{total} done, {counts['failed']} failed "
+              f"({self._per_minute(counts['done'], start)} per minute)")
+
+    def run(self, kind: str) -> Dict[str, Any]:
+        """
+        Process every pending job of a kind, printing progress after each flush.
+
+        Returns:
+            Counts of done, failed and retried jobs, elapsed_s and per_minute (jobs done per minute).
+        """
+        handler = self.handlers[kind]
+        self.queue.recover()
+        total = self.queue.stats().get(kind, {}).get(PENDING, 0)
+        counts = {"done": 0, "failed": 0, "retried": 0}
+        buffer = []
+        start = time.perf_counter()
+        with self._pool(kind) as pool:
+            inflight = {}
+            while True:
+                free = self.max_workers - len(inflight)
+                if free > 0:
+                    for item_id, payload in self.queue.claim(kind, free):
+                        inflight[pool.submit(handler, payload)] = (item_id, payload)
+                if not inflight:
+                    break
+                finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item_id, payload = inflight.pop(future)
+                    try:
+                        buffer.append((item_id, payload, future.result()))
+                    except Exception as e:
+                        print(f"[jobs] {kind} {item_id} failed: {e}")
+                        counts["retried" if self.queue.fail(kind, item_id, str(e)) else "failed"] += 1
+                if len(buffer) >= self.flush_size:
+                    self._flush(kind, buffer, counts, total, start)
+            self._flush(kind, buffer, counts, total, start)
+        counts["elapsed_s"] = round(time.perf_counter() - start, 2)
+        counts["per_minute"] = self._per_minute(counts["done"], start)
+        print(f"[jobs] {kind}: {counts}")
+        return counts
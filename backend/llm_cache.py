@@ -0,0 +1,89 @@
+# llm_cache.py
+# Description: on-disk cache of LLM responses keyed by the exact request
+
+import os
+import json
+import zlib
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+import diskcache as dc
+
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", 24))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", 64))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+
+# Request arguments that do not change the answer
+_TRANSPORT_ARGS = {"extra_headers", "extra_query", "timeout"}
+
+
+def _schema(response_format) -> Any:
+    # Pydantic classes (structured outputs) are keyed by their JSON schema
+    if hasattr(response_format, "model_json_schema"):
+        return response_format.model_json_schema()
+    return response_format
+
+
+def request_key(**request) -> str:
+    """
+    sha256 of the model, messages, response schema and sampling arguments, so the
+    same prompt to the same model always maps to the same entry.
+    """
+    canonical = {name: _schema(value) if name == "response_format" else value
+                 for name, value in request.items() if name not in _TRANSPORT_ARGS}
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent LLM response cache.
+
+    Values are stored as zlib-compressed JSON (the message text, or the parsed
+    structured output) and expire after ttl_seconds; once the cache grows past
+    size_limit bytes the least recently used entries are evicted. Hits and misses
+    are counted per call site.
+    """
+
+    def __init__(self, directory: str = LLM_CACHE_DIR, ttl_seconds: float = LLM_CACHE_TTL_HOURS * 3600,
+                 size_limit: int = int(LLM_CACHE_MAX_MB * 1024 * 1024)):
+        self.ttl_seconds = ttl_seconds
+        self._cache = dc.Cache(directory, size_limit=size_limit, eviction_policy="least-recently-used")
+        self._lock = threading.Lock()
+        self._sites = {}
+
+    def _count(self, site: str, hit: bool) -> None:
+        with self._lock:
+            stats = self._sites.setdefault(site, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def get(self, site: str, key: str) -> Optional[Any]:
+        blob = self._cache.get(key)
+        self._count(site, blob is not None)
+        if blob is None:
+            return None
+        return json.loads(zlib.decompress(blob))
+
+    def put(self, key: str, value: Any) -> None:
+        blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        self._cache.set(key, blob, expire=self.ttl_seconds)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sites = {
+                site: dict(counts, hit_rate=round(counts["hits"] / (counts["hits"] + counts["misses"]), 3))
+                for site, counts in self._sites.items()
+            }
+        return {"entries": len(self._cache), "size_bytes": self._cache.volume(), "sites": sites}
+
+
+llm_cache = LLMResponseCache() if LLM_CACHE_ENABLED else None
+
+
+def llm_cache_stats() -> Dict[str, Any]:
+    return llm_cache.stats() if llm_cache is not None else {"enabled": False}
@@ -0,0 +1,409 @@
+# llm_gateway.py
+# Description: every LLM call goes through here: per-model rate limits, retries with
+# jittered backoff, interactive-before-batch priority, queue metrics and response caching
+
+import os
+import json
+import random
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from news_handler.rate_limiter import TokenBucket, SharedBackoff
+except ImportError:
+    from rate_limiter import TokenBucket, SharedBackoff
+from llm_cache import llm_cache, request_key
+from shared_limits import SharedLimits, get_shared_limits
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+# Requests and tokens per minute for models without an entry in LLM_MODEL_LIMITS
+LLM_DEFAULT_RPM = float(os.getenv("LLM_DEFAULT_RPM", 500))
+LLM_DEFAULT_TPM = float(os.getenv("LLM_DEFAULT_TPM", 200000))
+# Per-model overrides, e.g. "gpt-4o=500:30000,gpt-4.1-nano=500:200000"
+LLM_MODEL_LIMITS = os.getenv("LLM_MODEL_LIMITS", "")
+# Completion tokens assumed for a chat call without max_tokens (corrected from usage afterwards)
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", 500))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30.0))
+# Share of each bucket that batch callers leave for interactive ones
+LLM_BATCH_RESERVE = float(os.getenv("LLM_BATCH_RESERVE", 0.2))
+# Priority of calls that do not pass one; batch scripts set this to "batch"
+LLM_DEFAULT_PRIORITY = os.getenv("LLM_PRIORITY", INTERACTIVE)
+# Admit calls against buckets shared by every process on the host (shared_limits.py);
+# "0" keeps them per process
+LLM_SHARED_LIMITS = os.getenv("LLM_SHARED_LIMITS", "1") != "0"
+
+# Status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+# Sleep granularity while a caller waits for tokens or for interactive callers to go first
+_POLL_SECONDS = 0.05
+
+
+def parse_model_limits(spec: str) -> Dict[str, tuple]:
+    """"model=rpm:tpm,..." -> {model: (rpm, tpm)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (float(rpm or LLM_DEFAULT_RPM), float(tpm or LLM_DEFAULT_TPM))
+    return limits
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    """Rough request size in tokens (about 4 characters each) plus the expected completion."""
+    if "input" in kwargs:
+        texts = kwargs["input"] if isinstance(kwargs["input"], list) else [kwargs["input"]]
+        return max(1, sum(len(str(text)) for text in texts) // 4)
+    prompt = len(json.dumps(kwargs.get("messages", []), default=str)) // 4
+    return prompt + int(kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or LLM_COMPLETION_TOKEN_ESTIMATE)
+
+
+def is_rate_limit(exc) -> bool:
+    return getattr(exc, "status_code", None) == 429 or "rate_limit" in str(exc).lower()
+
+
+def is_retryable(exc) -> bool:
+    return (is_rate_limit(exc) or getattr(exc, "status_code", None) in RETRYABLE_STATUS
+            or type(exc).__name__ in RETRYABLE_ERRORS)
+
+
+class _ModelLimiter:
+    """Request and token buckets of one model, plus the pause after a rate-limit error."""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket.per_minute(rpm, burst=max(1, rpm / 60 * 10))
+        self.tokens = TokenBucket.per_minute(tpm, burst=tpm)
+        self.backoff = SharedBackoff(base_wait=LLM_BACKOFF_BASE, max_wait=LLM_BACKOFF_MAX)
+
+
+class LLMGateway:
+    """
+    Admission control and retries for OpenAI-compatible clients.
+
+    Each model has a requests-per-minute and a tokens-per-minute bucket; a call waits
+    until both can cover it (tokens are estimated up front and corrected from the
+    response's usage). Batch callers wait while any interactive caller is queued for
+    the same model and never take the last LLM_BATCH_RESERVE of a bucket. Rate-limit
+    errors pause the model for everyone (server retry hint when given); other
+    transient errors retry with full-jitter exponential backoff.
+
+    With shared_limits the buckets, the pause and the queued interactive callers live
+    in SQLite (shared_limits.py), so web workers and backfill processes draw from one
+    quota and batch callers anywhere on the host yield to interactive ones. Without it
+    all of this holds within the process only.
+    """
+
+    def __init__(self, model_limits: Optional[Dict[str, tuple]] = None,
+                 max_retries: int = LLM_MAX_RETRIES, batch_reserve: float = LLM_BATCH_RESERVE,
+                 shared_limits: Optional[SharedLimits] = None):
+        self.model_limits = parse_model_limits(LLM_MODEL_LIMITS) if model_limits is None else model_limits
+        self.max_retries = max_retries
+        self.batch_reserve = batch_reserve
+        self.shared_limits = shared_limits
+        self.default_priority = LLM_DEFAULT_PRIORITY
+        # Fraction of the configured limits this process may use (see set_limit_share)
+        self.limit_share = 1.0
+        # Used by complete_text() / parse_model(); None disables response caching
+        self.response_cache = llm_cache
+        self._limiters = {}
+        # Guards the in-memory state only; shared_limits (SQLite) is called after releasing it
+        self._lock = threading.Lock()
+        # Orders the queued-interactive counts this process publishes to shared_limits
+        self._publish_lock = threading.Lock()
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._queued_by_model = {}
+        self._wait = {priority: {"admitted": 0, "total_wait_s": 0.0, "max_wait_s": 0.0, "max_queue_depth": 0}
+                      for priority in PRIORITIES}
+        self._models = {}
+
+    def _limiter(self, model: str) -> _ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            rpm, tpm = self.model_limits.get(model, (LLM_DEFAULT_RPM, LLM_DEFAULT_TPM))
+            # Shared buckets already hold every process to the full limits
+            share = 1.0 if self.shared_limits is not None else self.limit_share
+            limiter = self._limiters[model] = _ModelLimiter(rpm * share, tpm * share)
+        return limiter
+
+    def _model_stats(self, model: str) -> dict:
+        return self._models.setdefault(model, {"requests": 0, "retries": 0, "rate_limited": 0, "errors": 0,
+                                               "estimated_tokens": 0, "used_tokens": 0})
+
+    # Admission
+
+    def _enqueue(self, model, priority):
+        with self._lock:
+            self._queued[priority] += 1
+            self._queued_by_model[(model, priority)] = self._queued_by_model.get((model, priority), 0) + 1
+            stats = self._wait[priority]
+            stats["max_queue_depth"] = max(stats["max_queue_depth"], self._queued[priority])
+        self._publish_waiting(model, priority)
+
+    def _dequeue(self, model, priority, waited):
+        with self._lock:
+            self._queued[priority] -= 1
+            self._queued_by_model[(model, priority)] -= 1
+            stats = self._wait[priority]
+            stats["admitted"] += 1
+            stats["total_wait_s"] += waited
+            stats["max_wait_s"] = max(stats["max_wait_s"], waited)
+        self._publish_waiting(model, priority)
+
+    def _publish_waiting(self, model, priority):
+        """Tell other processes how many interactive callers wait here."""
+        if self.shared_limits is None or priority != INTERACTIVE:
+            return
+        # The count is read when writing, so the last write always carries the current one
+        with self._publish_lock:
+            with self._lock:
+                count = self._queued_by_model.get((model, priority), 0)
+            self.shared_limits.set_waiting(model, count)
+
+    def _try_admit(self, model: str, tokens: int, priority: str) -> float:
+        """Take a request and `tokens` from the model's buckets; returns 0, or seconds to wait."""
+        with self._lock:
+            limiter = self._limiter(model)
+            paused = limiter.backoff.remaining()
+            if paused > 0:
+                return paused
+            if priority == BATCH and self._queued_by_model.get((model, INTERACTIVE), 0) > 0:
+                return _POLL_SECONDS
+            # A request larger than the bucket could never be served, so cap it
+            tokens = min(tokens, limiter.tokens.capacity)
+            reserve = self.batch_reserve if priority == BATCH else 0.0
+            if self.shared_limits is None:
+                wait = max(limiter.requests.wait_time(1, reserve=reserve * limiter.requests.capacity),
+                           limiter.tokens.wait_time(tokens, reserve=reserve * limiter.tokens.capacity))
+                if wait > 0:
+                    return wait
+                limiter.requests.try_acquire(1)
+                limiter.tokens.try_acquire(tokens)
+                return 0.0
+        return self.shared_limits.admit(model, {"requests": (limiter.requests, 1), "tokens": (limiter.tokens, tokens)},
+                                        batch=priority == BATCH, reserve=reserve, poll_seconds=_POLL_SECONDS)
+
+    def acquire(self, model: str, tokens: int, priority: str) -> float:
+        """Block until the call may go; returns the seconds waited."""
+        start = time.monotonic()
+        self._enqueue(model, priority)
+        try:
+            while True:
+                wait = self._try_admit(model, tokens, priority)
+                if wait == 0.0:
+                    break
+                time.sleep(min(wait, 1.0))
+        finally:
+            waited = time.monotonic() - start
+            self._dequeue(model, priority, waited)
+        return waited
+
+    async def acquire_async(self, model: str, tokens: int, priority: str) -> float:
+        """acquire() for coroutines; queueing and admission touch the shared limits (SQLite) in threads."""
+        start = time.monotonic()
+        await asyncio.to_thread(self._enqueue, model, priority)
+        try:
+            while True:
+                wait = await asyncio.to_thread(self._try_admit, model, tokens, priority)
+                if wait == 0.0:
+                    break
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            waited = time.monotonic() - start
+            await asyncio.to_thread(self._dequeue, model, priority, waited)
+        return waited
+
+    # Calls
+
+    def _settle(self, model: str, estimated: int, response) -> None:
+        """Correct the token bucket with the usage the response reports."""
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        with self._lock:
+            stats = self._model_stats(model)
+            stats["requests"] += 1
+            stats["estimated_tokens"] += estimated
+            if not isinstance(used, int):
+                return
+            stats["used_tokens"] += used
+            tokens = self._limiter(model).tokens
+            if self.shared_limits is None:
+                tokens.adjust(used - estimated)
+                return
+        self.shared_limits.adjust(model, "tokens", tokens, used - estimated)
+
+    def _retry_wait(self, model: str, exc, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after exc, or None when the error is final."""
+        with self._lock:
+            stats = self._model_stats(model)
+            if attempt >= self.max_retries or not is_retryable(exc):
+                stats["errors"] += 1
+                return None
+            stats["retries"] += 1
+            if not is_rate_limit(exc):
+                return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+            stats["rate_limited"] += 1
+            # Pauses the model for every caller; jitter spreads out their retries
+            wait = self._limiter(model).backoff.register(exc)
+        if self.shared_limits is not None:
+            wait = self.shared_limits.pause(model, wait)
+        return wait + random.uniform(0, LLM_BACKOFF_BASE / 2)
+
+    def call(self, fn: Callable[..., Any], priority: Optional[str] = None, **kwargs):
+        """Call fn(**kwargs) (a client method taking model=...) under the model's limits."""
+        model = kwargs.get("model", "")
+        priority = priority or self.default_priority
+        tokens = estimate_tokens(kwargs)
+        attempt = 0
+        while True:
+            self.acquire(model, tokens, priority)
+            try:
+                response = fn(**kwargs)
+            except Exception as e:
+                wait = self._retry_wait(model, e, attempt)
+                if wait is None:
+                    raise
+                print(f"[LLM gateway] {model} attempt {attempt + 1} failed ({e}); retrying in {wait:.2f}s")
+                time.sleep(wait)
+                attempt += 1
+                continue
+            self._settle(model, tokens, response)
+            return response
+
+    async def call_async(self, fn: Callable[..., Any], priority: Optional[str] = None, **kwargs):
+        """call() for coroutine client methods."""
+        model = kwargs.get("model", "")
+        priority = priority or self.default_priority
+        tokens = estimate_tokens(kwargs)
+        attempt = 0
+        while True:
+            await self.acquire_async(model, tokens, priority)
+            try:
+                response = await fn(**kwargs)
+            except Exception as e:
+                wait = await asyncio.to_thread(self._retry_wait, model, e, attempt)
+                if wait is None:
+                    raise
+                print(f"[LLM gateway] {model} attempt {attempt + 1} failed ({e}); retrying in {wait:.2f}s")
+                await asyncio.sleep(wait)
+                attempt += 1
+                continue
+            await asyncio.to_thread(self._settle, model, tokens, response)
+            return response
+
+    def complete(self, client, priority: Optional[str] = None, **kwargs):
+        """client.chat.completions.create(**kwargs)"""
+        return self.call(client.chat.completions.create, priority, **kwargs)
+
+    def parse(self, client, priority: Optional[str] = None, **kwargs):
+        """client.beta.chat.completions.parse(**kwargs)"""
+        return self.call(client.beta.chat.completions.parse, priority, **kwargs)
+
+    def embed(self, client, priority: Optional[str] = None, **kwargs):
+        """client.embeddings.create(**kwargs)"""
+        return self.call(client.embeddings.create, priority, **kwargs)
+
+    async def complete_async(self, client, priority: Optional[str] = None, **kwargs):
+        return await self.call_async(client.chat.completions.create, priority, **kwargs)
+
+    async def parse_async(self, client, priority: Optional[str] = None, **kwargs):
+        return await self.call_async(client.beta.chat.completions.parse, priority, **kwargs)
+
+    async def embed_async(self, client, priority: Optional[str] = None, **kwargs):
+        return await self.call_async(client.embeddings.create, priority, **kwargs)
+
+    # Cached calls: the same request is answered from the LLM response cache
+
+    def _cached(self, site: str, kwargs: dict):
+        if self.response_cache is None:
+            return None, None
+        key = request_key(**kwargs)
+        return key, self.response_cache.get(site, key)
+
+    def _store(self, key: Optional[str], value) -> None:
+        if key is not None and value is not None:
+            self.response_cache.put(key, value)
+
+    def complete_text(self, client, site: str, priority: Optional[str] = None, **kwargs) -> str:
+        """Message text of complete(); `site` names the caller in the cache's hit rates."""
+        key, cached = self._cached(site, kwargs)
+        if cached is not None:
+            return cached
+        content = self.complete(client, priority, **kwargs).choices[0].message.content
+        self._store(key, content)
+        return content
+
+    def parse_model(self, client, site: str, priority: Optional[str] = None, **kwargs):
+        """Parsed response_format instance of parse(); cached as its JSON dump."""
+        response_format = kwargs["response_format"]
+        key, cached = self._cached(site, kwargs)
+        if cached is not None:
+            return response_format.model_validate(cached)
+        parsed = self.parse(client, priority, **kwargs).choices[0].message.parsed
+        # A refusal has nothing to parse and is not worth keeping
+        self._store(key, parsed.model_dump(mode="json") if parsed is not None else None)
+        return parsed
+
+    async def complete_text_async(self, client, site: str, priority: Optional[str] = None, **kwargs) -> str:
+        """complete_text() with the disk cache read and written in a thread."""
+        key, cached = await asyncio.to_thread(self._cached, site, kwargs)
+        if cached is not None:
+            return cached
+        content = (await self.complete_async(client, priority, **kwargs)).choices[0].message.content
+        await asyncio.to_thread(self._store, key, content)
+        return content
+
+    async def parse_model_async(self, client, site: str, priority: Optional[str] = None, **kwargs):
+        response_format = kwargs["response_format"]
+        key, cached = await asyncio.to_thread(self._cached, site, kwargs)
+        if cached is not None:
+            return response_format.model_validate(cached)
+        parsed = (await self.parse_async(client, priority, **kwargs)).choices[0].message.parsed
+        await asyncio.to_thread(self._store, key, parsed.model_dump(mode="json") if parsed is not None else None)
+        return parsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            queues = {}
+            for priority in PRIORITIES:
+                wait = self._wait[priority]
+                queues[priority] = {
+                    "queue_depth": self._queued[priority],
+                    "max_queue_depth": wait["max_queue_depth"],
+                    "admitted": wait["admitted"],
+                    "avg_wait_ms": round(1000 * wait["total_wait_s"] / wait["admitted"], 1) if wait["admitted"] else 0.0,
+                    "max_wait_ms": round(1000 * wait["max_wait_s"], 1),
+                }
+            return {"queues": queues, "models": {model: dict(stats) for model, stats in self._models.items()},
+                    "shared_limits": self.shared_limits.path if self.shared_limits is not None else None}
+
+
+gateway = LLMGateway(shared_limits=get_shared_limits() if LLM_SHARED_LIMITS else None)
+
+
+def set_default_priority(priority: str) -> None:
+    """Priority of calls in this process that do not pass one (batch scripts use BATCH)."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}'")
+    gateway.default_priority = priority
+
+
+def set_limit_share(share: float) -> None:
+    """
+    Let this process use only `share` of every model's limits, for worker pools whose
+    processes together must stay within one quota (e.g. 1 / workers). Has no effect
+    when the limits are shared across processes, which covers those pools already.
+    """
+    with gateway._lock:
+        gateway.limit_share = share
+        gateway._limiters.clear()
+
+
+def gateway_stats() -> dict:
+    return gateway.stats()
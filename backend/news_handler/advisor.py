@@ -1,14 +1,8 @@
 # news_handler/advisor.py
 
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
 from typing import List, Dict
-
-load_dotenv()
-OPENAI_API_KEY = os.getenv("EVENT_PREDICTION_OPENAI_API_KEY")
-
-_client = OpenAI(api_key=OPENAI_API_KEY)
+from clients import get_openai_client
+from llm_gateway import gateway
 
 def generate_tactical_signals(clusters: List[Dict]) -> str:
     """
@@ -24,7 +18,8 @@ def generate_tactical_signals(clusters: List[Dict]) -> str:
     )
     user = "\n\n".join(f"Topic: {c['topic']}\nSummary: {c['summary']}" for c in clusters)
 
-    resp = _client.chat.completions.create(
+    text = gateway.complete_text(
+      get_openai_client("EVENT_PREDICTION_OPENAI_API_KEY"), "advisor",
       model="gpt-4o",
       messages=[
         {"role":"system", "content": system},
@@ -33,5 +28,5 @@ def generate_tactical_signals(clusters: List[Dict]) -> str:
       temperature=0.7,
       max_tokens=150
     )
-    return resp.choices[0].message.content.strip()
+    return text.strip()
 
@@ -0,0 +1,114 @@
+# news_handler/alpha_vantage.py
+# Description: pooled, rate-limited and concurrent access to the Alpha Vantage news feed
+
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from clients import load_env
+
+try:
+    from .logger import info
+    from .rate_limiter import TokenBucket
+except ImportError:
+    from news_handler.logger import info
+    from news_handler.rate_limiter import TokenBucket
+
+load_env()
+
+alpha_vantage_api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
+ALPHA_VANTAGE_URL = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+# Premium keys allow 75 requests per minute; lower this for smaller plans
+ALPHA_VANTAGE_REQUESTS_PER_MINUTE = float(os.getenv("ALPHA_VANTAGE_REQUESTS_PER_MINUTE", 75))
+ALPHA_VANTAGE_BURST = int(os.getenv("ALPHA_VANTAGE_BURST", 5))
+ALPHA_VANTAGE_MAX_WORKERS = int(os.getenv("ALPHA_VANTAGE_MAX_WORKERS", 8))
+ALPHA_VANTAGE_TIMEOUT = float(os.getenv("ALPHA_VANTAGE_TIMEOUT", 30))
+
+# One keep-alive session for the whole process, with a connection per worker
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=ALPHA_VANTAGE_MAX_WORKERS))
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=ALPHA_VANTAGE_MAX_WORKERS))
+
+rate_limiter = TokenBucket.per_minute(ALPHA_VANTAGE_REQUESTS_PER_MINUTE, burst=ALPHA_VANTAGE_BURST)
+
+
+def set_rate_share(share: float) -> None:
+    """Use only `share` of the request quota in this process (worker pools pass 1 / workers)."""
+    global rate_limiter
+    rate_limiter = TokenBucket.per_minute(ALPHA_VANTAGE_REQUESTS_PER_MINUTE * share,
+                                          burst=max(1, int(ALPHA_VANTAGE_BURST * share)))
+
+
+def _window_params(time_from: str, time_to: str, limit: int, tickers: List[str] = None) -> dict:
+    params = {
+        "function": "NEWS_SENTIMENT",
+        "time_from": time_from,
+        "time_to": time_to,
+        "limit": limit,
+        "apikey": alpha_vantage_api_key,
+    }
+    if tickers:
+        params["tickers"] = ",".join(tickers)
+    return params
+
+
+def fetch_news_window(time_from: str, time_to: str, limit: int, tickers: List[str] = None) -> dict:
+    """
+    Fetch one NEWS_SENTIMENT window.
+
+    Args:
+        time_from, time_to: Window bounds in Alpha Vantage's YYYYMMDDTHHMM format.
+        limit: Maximum number of articles.
+        tickers: Optional ticker filter.
+
+    Returns:
+        The decoded JSON response.
+    """
+    rate_limiter.acquire()
+    r = session.get(ALPHA_VANTAGE_URL, params=_window_params(time_from, time_to, limit, tickers),
+                    timeout=ALPHA_VANTAGE_TIMEOUT)
+    return r.json()
+
+
+def fetch_news_windows(windows: List[Tuple[str, str]], limit: int, tickers: List[str] = None,
+                       max_workers: int = ALPHA_VANTAGE_MAX_WORKERS) -> List[dict]:
+    """
+    Fetch several windows concurrently on a bounded thread pool.
+
+    Returns:
+        One decoded response per window, in the same order as `windows`.
+    """
+    if not windows:
+        return []
+    workers = max(1, min(max_workers, len(windows)))
+    info(f"Fetching {len(windows)} news windows with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda window: fetch_news_window(window[0], window[1], limit, tickers), windows))
+
+
+async def fetch_news_windows_async(http, windows: List[Tuple[str, str]], limit: int,
+                                   tickers: List[str] = None) -> List[dict]:
+    """
+    Fetch several windows concurrently on an aiohttp ClientSession (the async
+    server's counterpart of fetch_news_windows). Requests are still paced by the
+    shared token bucket.
+
+    Returns:
+        One decoded response per window, in the same order as `windows`.
+    """
+    async def fetch(time_from, time_to):
+        while True:
+            wait = rate_limiter.try_acquire()
+            if wait == 0.0:
+                break
+            await asyncio.sleep(wait)
+        params = {key: str(value) for key, value in _window_params(time_from, time_to, limit, tickers).items()
+                  if value is not None}
+        async with http.get(ALPHA_VANTAGE_URL, params=params) as r:
+            return await r.json(content_type=None)
+
+    info(f"Fetching {len(windows)} news windows concurrently (async)")
+    return list(await asyncio.gather(*(fetch(time_from, time_to) for time_from, time_to in windows)))
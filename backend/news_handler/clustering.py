@@ -0,0 +1,167 @@
+# news_handler/clustering.py
+# Description: pluggable clustering backends for article embeddings, chosen by input size
+
+import os
+import time
+
+import numpy as np
+
+try:
+    from .logger import info
+except ImportError:
+    from news_handler.logger import info
+
+# "auto" picks a backend from the number of articles; or force one of BACKENDS
+CLUSTER_BACKEND = os.getenv("CLUSTER_BACKEND", "auto")
+# Above this many articles "auto" switches from agglomerative (full O(n^2) distance
+# matrix) to mini-batch k-means. knn_graph is opt-in: it bounds memory by the graph
+# size but ward merges over high-dimensional embeddings stay slow
+CLUSTER_AGGLOMERATIVE_MAX_N = int(os.getenv("CLUSTER_AGGLOMERATIVE_MAX_N", 2000))
+CLUSTER_KNN_NEIGHBORS = int(os.getenv("CLUSTER_KNN_NEIGHBORS", 10))
+CLUSTER_KMEANS_BATCH_SIZE = int(os.getenv("CLUSTER_KMEANS_BATCH_SIZE", 4096))
+# "fixed": always min(max_clusters, n) clusters; "silhouette": pick the count in
+# [2, max_clusters] with the best silhouette score on a bounded sample
+CLUSTER_K_SELECTION = os.getenv("CLUSTER_K_SELECTION", "fixed")
+CLUSTER_K_SAMPLE_SIZE = int(os.getenv("CLUSTER_K_SAMPLE_SIZE", 1000))
+
+
+def as_matrix(embeddings) -> np.ndarray:
+    """Embeddings as one C-contiguous float32 matrix (no copy when they already are)."""
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+def _agglomerative(X, n_clusters):
+    from sklearn.cluster import AgglomerativeClustering
+    return AgglomerativeClustering(n_clusters=n_clusters).fit_predict(X)
+
+
+def _knn_graph(X, n_clusters):
+    # Ward linkage restricted to a sparse kNN connectivity graph: memory grows with
+    # n * neighbors instead of n^2, and merges only consider nearby articles
+    from sklearn.cluster import AgglomerativeClustering
+    from sklearn.neighbors import kneighbors_graph
+    connectivity = kneighbors_graph(X, n_neighbors=min(CLUSTER_KNN_NEIGHBORS, len(X) - 1), include_self=False)
+    return AgglomerativeClustering(n_clusters=n_clusters, connectivity=connectivity).fit_predict(X)
+
+
+def _minibatch_kmeans(X, n_clusters):
+    from sklearn.cluster import MiniBatchKMeans
+    # Unit-length rows make euclidean k-means rank like cosine similarity
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters,
+        batch_size=min(CLUSTER_KMEANS_BATCH_SIZE, len(X)),
+        n_init=3,
+        random_state=0,
+    )
+    return kmeans.fit_predict(X / norms)
+
+
+BACKENDS = {
+    "agglomerative": _agglomerative,
+    "knn_graph": _knn_graph,
+    "minibatch_kmeans": _minibatch_kmeans,
+}
+
+
+def choose_backend(n: int, backend: str = CLUSTER_BACKEND) -> str:
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown clustering backend: {backend}")
+        return backend
+    if n <= CLUSTER_AGGLOMERATIVE_MAX_N:
+        return "agglomerative"
+    return "minibatch_kmeans"
+
+
+def silhouette_scores(X: np.ndarray, label_sets) -> list:
+    """
+    Mean cosine silhouette of X under each labelling in label_sets.
+
+    The distance matrix is computed once; per labelling, the mean distance of every
+    point to every cluster is one matrix product with a one-hot membership matrix.
+    """
+    unit = X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+    distances = np.clip(1.0 - unit @ unit.T, 0.0, 2.0)
+    scores = []
+    for labels in label_sets:
+        _, labels = np.unique(labels, return_inverse=True)
+        onehot = np.eye(labels.max() + 1, dtype=distances.dtype)[labels]
+        sizes = onehot.sum(axis=0)
+        totals = distances @ onehot
+        rows = np.arange(len(labels))
+        own_size = sizes[labels]
+        # Mean distance to the rest of the own cluster (self distance is 0)
+        a = totals[rows, labels] / np.maximum(own_size - 1, 1)
+        mean_to_clusters = totals / sizes
+        mean_to_clusters[rows, labels] = np.inf
+        b = mean_to_clusters.min(axis=1)
+        s = np.where(own_size > 1, (b - a) / np.maximum(np.maximum(a, b), 1e-12), 0.0)
+        scores.append(float(s.mean()))
+    return scores
+
+
+def select_n_clusters(embeddings, max_clusters: int, sample_size: int = CLUSTER_K_SAMPLE_SIZE, seed: int = 0):
+    """
+    Pick a cluster count in [2, max_clusters] from the embedding geometry.
+
+    A ward tree is built once on at most sample_size rows and cut at every candidate
+    count; the cut with the highest silhouette wins. Returns (k, details).
+    """
+    from scipy.cluster.hierarchy import fcluster, linkage
+
+    start = time.perf_counter()
+    X = as_matrix(embeddings)
+    n = len(X)
+    if n > sample_size:
+        X = X[np.random.default_rng(seed).choice(n, size=sample_size, replace=False)]
+    candidates = list(range(2, min(max_clusters, len(X) - 1) + 1))
+    if not candidates:
+        return min(max_clusters, n), {"k_selection": "fixed"}
+
+    tree = linkage(X, method="ward")
+    scores = silhouette_scores(X, [fcluster(tree, k, criterion="maxclust") for k in candidates])
+    best = int(np.argmax(scores))
+    details = {
+        "k_selection": "silhouette",
+        "candidates": candidates,
+        "silhouette": round(scores[best], 4),
+        "sample_size": len(X),
+        "selection_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    return candidates[best], details
+
+
+def cluster_embeddings(embeddings, n_clusters: int, backend: str = CLUSTER_BACKEND,
+                       k_selection: str = CLUSTER_K_SELECTION, metadata: dict = None) -> np.ndarray:
+    """
+    Cluster embeddings and return one label per row.
+
+    Args:
+        embeddings: (n, dim) array-like of article embeddings.
+        n_clusters: Number of clusters, or the upper bound with k_selection="silhouette".
+        backend: "auto" or one of BACKENDS.
+        k_selection: "fixed" or "silhouette".
+        metadata: Optional dict filled with the chosen count, backend and timings.
+    """
+    X = as_matrix(embeddings)
+    n = len(X)
+    details = {"k_selection": "fixed"}
+    if k_selection == "silhouette" and n > 2:
+        n_clusters, details = select_n_clusters(X, n_clusters)
+    n_clusters = min(n_clusters, n)
+
+    if n_clusters <= 1:
+        name = "none"
+        labels = np.zeros(n, dtype=int)
+        cluster_ms = 0.0
+    else:
+        name = choose_backend(n, backend)
+        start = time.perf_counter()
+        labels = BACKENDS[name](X, n_clusters)
+        cluster_ms = (time.perf_counter() - start) * 1000
+        info(f"Clustered {n} articles into {n_clusters} clusters with {name} in {cluster_ms:.0f} ms")
+    if metadata is not None:
+        metadata.update(details, n_clusters=n_clusters, backend=name, cluster_ms=round(cluster_ms, 1))
+    return labels
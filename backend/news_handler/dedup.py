@@ -0,0 +1,205 @@
+# news_handler/dedup.py
+# Description: collapse syndicated copies of the same story before embedding and clustering
+
+import os
+import re
+import hashlib
+import threading
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+
+import numpy as np
+
+NEWS_DEDUP_ENABLED = os.getenv("NEWS_DEDUP", "1") != "0"
+# Estimated Jaccard similarity of summary word shingles above which two
+# articles count as the same story; set to 1 to only drop exact duplicates
+NEWS_DEDUP_NEAR_THRESHOLD = float(os.getenv("NEWS_DEDUP_NEAR_THRESHOLD", 0.8))
+# MinHash signature length, split into LSH bands of NEWS_DEDUP_NUM_PERM / NEWS_DEDUP_BANDS rows
+NEWS_DEDUP_NUM_PERM = int(os.getenv("NEWS_DEDUP_NUM_PERM", 64))
+NEWS_DEDUP_BANDS = int(os.getenv("NEWS_DEDUP_BANDS", 16))
+
+_SHINGLE_WORDS = 3
+# Texts with fewer shingles are too short to compare reliably
+_MIN_SHINGLES = 5
+# Titles this short ("Stocks to watch") are too generic to identify a story
+_MIN_TITLE_WORDS = 4
+_TRACKING_PARAMS = re.compile(r"^(utm_|fbclid$|gclid$|ref$|src$|source$|cmp$|mod$)")
+
+
+def normalize_url(url: Optional[str]) -> str:
+    """Lowercased host without www., no fragment, tracking parameters or trailing slash."""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not _TRACKING_PARAMS.match(k.lower())))
+    return urlunsplit(("", host, parts.path.rstrip("/"), query, ""))
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """Lowercase words only; empty for titles too short to tell stories apart."""
+    words = _words(title)
+    return " ".join(words) if len(words) >= _MIN_TITLE_WORDS else ""
+
+
+def article_weight(news) -> int:
+    """How many fetched articles a (deduplicated) article stands for."""
+    return 1 + getattr(news, "duplicates", 0)
+
+
+def weighted_count(news_list) -> int:
+    return sum(article_weight(news) for news in news_list)
+
+
+class Deduplicator:
+    """
+    Finds exact duplicates (same normalized URL or title) and near-duplicates
+    (MinHash over word shingles of the summary, or title + summary when the summary
+    is short; LSH banding for candidates, kept when the estimated Jaccard similarity
+    reaches near_threshold). The first article of each group represents it; the
+    others are counted in its `duplicates` so impact percentages still reflect every
+    fetched article.
+    """
+
+    def __init__(self, near_threshold: float = NEWS_DEDUP_NEAR_THRESHOLD,
+                 num_perm: int = NEWS_DEDUP_NUM_PERM, bands: int = NEWS_DEDUP_BANDS, seed: int = 1):
+        self.near_threshold = near_threshold
+        self.bands = bands
+        self.rows = max(1, num_perm // bands)
+        # Permutations h -> a * h + b (mod 2^64, a odd) of 64-bit shingle hashes
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 1 << 64, size=(self.bands * self.rows, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 64, size=(self.bands * self.rows, 1), dtype=np.uint64)
+        self._lock = threading.Lock()
+        self.articles = 0
+        self.exact = 0
+        self.near = 0
+
+    def _signature(self, text: str) -> Optional[np.ndarray]:
+        words = _words(text)
+        if len(words) < _SHINGLE_WORDS + _MIN_SHINGLES - 1:
+            return None
+        shingles = {" ".join(words[i:i + _SHINGLE_WORDS]) for i in range(len(words) - _SHINGLE_WORDS + 1)}
+        hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                           for s in shingles], dtype=np.uint64)
+        return (self._a * hashes + self._b).min(axis=1)
+
+    def groups(self, news_list) -> Tuple[List[int], int, int]:
+        """
+        Representative index of every article (its own index if it represents itself),
+        and the number of exact and near duplicates found.
+        """
+        parent = list(range(len(news_list)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i, j):
+            i, j = find(i), find(j)
+            if i != j:
+                # The earlier (newest in Alpha Vantage order) article represents the group
+                parent[max(i, j)] = min(i, j)
+                return True
+            return False
+
+        exact = near = 0
+        seen = {}
+        for idx, news in enumerate(news_list):
+            for key in (("url", normalize_url(news.link)), ("title", normalize_title(news.title))):
+                if not key[1]:
+                    continue
+                if key in seen:
+                    exact += union(seen[key], idx)
+                else:
+                    seen[key] = idx
+
+        if self.near_threshold < 1:
+            signatures = {}
+            buckets = {}
+            for idx, news in enumerate(news_list):
+                if find(idx) != idx:
+                    continue
+                # Syndicated copies keep the body but often get a new headline
+                signature = self._signature(news.summary) if news.summary else None
+                if signature is None:
+                    signature = self._signature(f"{news.title or ''} {news.summary or ''}")
+                if signature is None:
+                    continue
+                candidates = set()
+                for band in range(self.bands):
+                    key = (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                    candidates.update(buckets.get(key, ()))
+                    buckets.setdefault(key, []).append(idx)
+                for other in sorted(candidates):
+                    if find(other) != find(idx) and np.mean(signatures[other] == signature) >= self.near_threshold:
+                        near += union(other, idx)
+                        break
+                signatures[idx] = signature
+        return [find(idx) for idx in range(len(news_list))], exact, near
+
+    def dedupe_indices(self, news_list, stats: Optional[dict] = None) -> List[Tuple[int, int]]:
+        """(index, duplicates it stands for) of every representative article, in input order."""
+        roots, exact, near = self.groups(news_list)
+        counts = {}
+        for idx, root in enumerate(roots):
+            counts[root] = counts.get(root, 0) + (article_weight(news_list[idx]) if idx != root else 0)
+        kept = [(idx, counts[idx]) for idx in range(len(news_list)) if roots[idx] == idx]
+        with self._lock:
+            self.articles += len(news_list)
+            self.exact += exact
+            self.near += near
+        if stats is not None:
+            stats.update({
+                "articles": len(news_list),
+                "unique": len(kept),
+                "exact_duplicates": exact,
+                "near_duplicates": near,
+                "reduction": round(1 - len(kept) / len(news_list), 3) if news_list else 0.0,
+            })
+        return kept
+
+    def dedupe(self, news_list, stats: Optional[dict] = None) -> list:
+        """The representatives, with the articles they absorbed added to `duplicates`."""
+        return [news_list[idx] if not extra else
+                replace(news_list[idx], duplicates=getattr(news_list[idx], "duplicates", 0) + extra)
+                for idx, extra in self.dedupe_indices(news_list, stats)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            dropped = self.exact + self.near
+            return {
+                "articles": self.articles,
+                "exact_duplicates": self.exact,
+                "near_duplicates": self.near,
+                "reduction": round(dropped / self.articles, 3) if self.articles else 0.0,
+            }
+
+
+deduplicator = Deduplicator() if NEWS_DEDUP_ENABLED else None
+
+
+def dedupe_news(news_list, stats: Optional[dict] = None) -> list:
+    """Collapse duplicates with the shared Deduplicator; unchanged when NEWS_DEDUP=0."""
+    if deduplicator is None:
+        return list(news_list)
+    return deduplicator.dedupe(news_list, stats)
+
+
+def dedupe_news_indices(news_list, stats: Optional[dict] = None) -> List[Tuple[int, int]]:
+    if deduplicator is None:
+        return [(idx, 0) for idx in range(len(news_list))]
+    return deduplicator.dedupe_indices(news_list, stats)
+
+
+def dedup_stats() -> Dict[str, object]:
+    return deduplicator.stats() if deduplicator is not None else {"enabled": False}
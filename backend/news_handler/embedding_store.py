@@ -0,0 +1,259 @@
+# news_handler/embedding_store.py
+# Description: persistent, content-addressed embedding cache (float32 memmap + JSON index)
+
+import os
+import json
+import hashlib
+import threading
+from typing import List, Optional
+
+import numpy as np
+from filelock import FileLock
+
+try:
+    from .logger import info
+except ImportError:
+    from news_handler.logger import info
+
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embedding_cache")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 50000))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+
+_INITIAL_CAPACITY = 1024
+# Fraction of entries dropped when the store is full, so eviction is not paid on every insert
+_EVICT_FRACTION = 0.1
+
+
+class EmbeddingStore:
+    """
+    On-disk embedding cache keyed by sha256(model + text).
+
+    Vectors live in one float32 matrix (vectors.f32, memory-mapped) and index.json maps
+    each key to its row and last-use tick. When max_entries is reached the least
+    recently used rows are freed and reused. A store directory holds a single vector
+    dimension, so use one directory per embedding model (see get_embedding_store).
+
+    Several processes can share a directory (web workers, backfill pools): every
+    lookup and write holds store.lock, re-reads index.json when another process has
+    replaced it, and new rows are written to disk before the lock is released, so
+    rows are never allocated twice. Hits only update recency in memory; it is merged
+    into the index with the next write.
+    """
+
+    def __init__(self, directory: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.index_path = os.path.join(directory, "index.json")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(directory, "store.lock"))
+        self._index_version = None
+        self._touched = {}   # key -> tick of hits not yet written to the index
+
+        self.dim = None
+        self._rows = {}      # key -> [row, last_used_tick]
+        self._free = []      # reusable rows
+        self._next_row = 0   # first never-used row
+        self._tick = 0
+        self._matrix = None
+
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, self._file_lock:
+            self._refresh()
+        if self._rows:
+            info(f"Loaded embedding store {self.directory} with {len(self._rows)} entries")
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _version(self):
+        try:
+            st = os.stat(self.index_path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _reset(self):
+        self.dim = None
+        self._rows = {}
+        self._free = []
+        self._next_row = 0
+        self._tick = 0
+        self._matrix = None
+
+    def _refresh(self):
+        """Reload index.json (caller holds the file lock) if another process replaced it."""
+        version = self._version()
+        if version == self._index_version:
+            return
+        self._index_version = version
+        if version is None or not os.path.exists(self.vectors_path):
+            self._reset()
+            return
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            self.dim = index["dim"]
+            self._rows = index["rows"]
+            self._tick = max(self._tick, index["tick"])
+            capacity = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        except (ValueError, KeyError, OSError) as e:
+            info(f"Embedding store {self.directory} is unreadable ({e}), starting empty")
+            self._reset()
+            return
+        used = {row for row, _ in self._rows.values()}
+        self._next_row = max(used) + 1 if used else 0
+        self._free = sorted(set(range(self._next_row)) - used)
+        # Keep this process's recent hits on top of the reloaded recency
+        for key, tick in self._touched.items():
+            if key in self._rows:
+                self._rows[key][1] = max(self._rows[key][1], tick)
+
+    def _grow(self, needed_rows: int):
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if needed_rows <= capacity:
+            return
+        new_capacity = max(_INITIAL_CAPACITY, capacity)
+        while new_capacity < needed_rows:
+            new_capacity *= 2
+        new_capacity = min(new_capacity, self.max_entries)
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        # Extending the file keeps existing rows; the new tail is sparse until written
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim))
+
+    def _evict(self):
+        count = max(1, int(self.max_entries * _EVICT_FRACTION))
+        oldest = sorted(self._rows.items(), key=lambda kv: kv[1][1])[:count]
+        for key, (row, _) in oldest:
+            del self._rows[key]
+            self._touched.pop(key, None)
+            self._free.append(row)
+
+    def _allocate_row(self) -> int:
+        if not self._free and self._next_row >= self.max_entries:
+            self._evict()
+        if self._free:
+            return self._free.pop()
+        row = self._next_row
+        self._next_row += 1
+        self._grow(self._next_row)
+        return row
+
+    def _write_index(self):
+        """Persist the matrix and the index (caller holds the file lock)."""
+        self._matrix.flush()
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "tick": self._tick, "rows": self._rows}, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_version = self._version()
+        self._touched = {}
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up texts; returns a float32 vector per hit and None per miss."""
+        results = []
+        with self._lock, self._file_lock:
+            # Rows may have been reassigned by another process since the last lookup
+            self._refresh()
+            for text in texts:
+                key = self.make_key(model, text)
+                entry = self._rows.get(key)
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self.hits += 1
+                self._tick += 1
+                entry[1] = self._touched[key] = self._tick
+                results.append(np.array(self._matrix[entry[0]]))
+        return results
+
+    def put_many(self, model: str, texts: List[str], embeddings) -> None:
+        """Store one embedding per text, evicting least recently used rows when full."""
+        if not texts:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock, self._file_lock:
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding store {self.directory} holds {self.dim}-dim vectors, got {vectors.shape[1]}")
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(model, text)
+                entry = self._rows.get(key)
+                row = entry[0] if entry else self._allocate_row()
+                self._matrix[row] = vector
+                self._tick += 1
+                self._rows[key] = [row, self._tick]
+            # Other processes must see the allocated rows before they allocate their own
+            self._write_index()
+
+    def flush(self) -> None:
+        """Merge recency from hits since the last write into index.json."""
+        with self._lock, self._file_lock:
+            if not self._touched or self._matrix is None:
+                return
+            self._refresh()
+            self._write_index()
+
+    def clear(self) -> None:
+        with self._lock, self._file_lock:
+            self._matrix = None
+            for path in (self.vectors_path, self.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._reset()
+            self._touched = {}
+            self._index_version = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "entries": len(self._rows),
+            "max_entries": self.max_entries,
+        }
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(model: str) -> Optional[EmbeddingStore]:
+    """Return the process-wide store for an embedding model, or None when caching is disabled."""
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _stores_lock:
+        if model not in _stores:
+            safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+            _stores[model] = EmbeddingStore(os.path.join(EMBEDDING_CACHE_DIR, safe_name))
+        return _stores[model]
+
+
+def reset_embedding_stores() -> None:
+    """
+    Forget the stores this process opened. Forked workers call it so that they open
+    their own handles instead of sharing the parent's locks and memory maps.
+    """
+    global _stores_lock
+    _stores_lock = threading.Lock()
+    _stores.clear()
+
+
+def embedding_store_stats() -> dict:
+    """Hit/miss counters of every store opened by this process, keyed by model."""
+    with _stores_lock:
+        return {model: store.stats() for model, store in _stores.items()}
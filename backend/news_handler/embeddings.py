@@ -0,0 +1,204 @@
+# news_handler/embeddings.py
+# Description: batched, concurrent and cached embedding requests for news summaries
+
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from llm_gateway import gateway
+
+try:
+    from .logger import info
+except ImportError:
+    from news_handler.logger import info
+try:
+    from .embedding_store import get_embedding_store
+except ImportError:
+    from news_handler.embedding_store import get_embedding_store
+try:
+    from .local_embeddings import embed_texts_local, local_model_key
+except ImportError:
+    from news_handler.local_embeddings import embed_texts_local, local_model_key
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+# "openai" (default) or "local" (sentence-transformers on the CPU, see local_embeddings.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+# OpenAI accepts up to 2048 inputs per request; keep well below that and also
+# cap the characters per request so a batch never trips the per-request token limit.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))
+EMBEDDING_BATCH_MAX_CHARS = int(os.getenv("EMBEDDING_BATCH_MAX_CHARS", 200000))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))
+
+
+def make_batches(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_chars: int = EMBEDDING_BATCH_MAX_CHARS) -> List[List[int]]:
+    """
+    Split texts into batches of indices, capped by count and by total characters.
+    A single text longer than max_chars still gets a batch of its own.
+    """
+    batches = []
+    current = []
+    current_chars = 0
+    for idx, text in enumerate(texts):
+        if current and (len(current) >= batch_size or current_chars + len(text) > max_chars):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(idx)
+        current_chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_texts(client, texts: List[str], model: str = EMBEDDING_MODEL,
+                batch_size: int = EMBEDDING_BATCH_SIZE,
+                max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+                stats: Optional[list] = None) -> List[List[float]]:
+    """
+    Embed texts with the OpenAI embeddings API in size-capped batches.
+
+    Batches run concurrently (at most max_concurrency requests in flight) and the
+    returned embeddings are in the same order as the input texts.
+
+    Args:
+        client: OpenAI client used for the requests.
+        texts: Texts to embed.
+        model: Embedding model name.
+        batch_size: Maximum number of texts per request.
+        max_concurrency: Maximum number of requests in flight.
+        stats: Optional list; one {"batch", "size", "latency_ms"} dict is appended per batch.
+
+    Returns:
+        List of embedding vectors, one per input text.
+    """
+    if not texts:
+        return []
+
+    batches = make_batches(texts, batch_size=batch_size)
+    embeddings = [None] * len(texts)
+
+    def run_batch(batch_idx, indices):
+        start = time.perf_counter()
+        response = gateway.embed(
+            client,
+            input=[texts[i] for i in indices],
+            model=model
+        )
+        latency_ms = (time.perf_counter() - start) * 1000
+        # The API tags every item with the position of its input inside the request
+        for item in sorted(response.data, key=lambda d: d.index):
+            embeddings[indices[item.index]] = item.embedding
+        return {"batch": batch_idx, "size": len(indices), "latency_ms": latency_ms}
+
+    start = time.perf_counter()
+    workers = max(1, min(max_concurrency, len(batches)))
+    if workers == 1:
+        batch_stats = [run_batch(batch_idx, indices) for batch_idx, indices in enumerate(batches)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            batch_stats = list(pool.map(run_batch, range(len(batches)), batches))
+    total_ms = (time.perf_counter() - start) * 1000
+
+    for s in batch_stats:
+        info(f"Embedding batch {s['batch']}: {s['size']} texts in {s['latency_ms']:.0f} ms")
+    info(f"Embedded {len(texts)} texts in {len(batches)} batches ({workers} concurrent) in {total_ms:.0f} ms")
+
+    if stats is not None:
+        stats.extend(batch_stats)
+    return embeddings
+
+
+async def embed_texts_async(client, texts: List[str], model: str = EMBEDDING_MODEL,
+                            batch_size: int = EMBEDDING_BATCH_SIZE,
+                            max_concurrency: int = EMBEDDING_MAX_CONCURRENCY) -> List[List[float]]:
+    """embed_texts() on an AsyncOpenAI client; batches are bounded by a semaphore instead of threads."""
+    if not texts:
+        return []
+
+    batches = make_batches(texts, batch_size=batch_size)
+    embeddings = [None] * len(texts)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_batch(indices):
+        async with semaphore:
+            response = await gateway.embed_async(client, input=[texts[i] for i in indices], model=model)
+        for item in sorted(response.data, key=lambda d: d.index):
+            embeddings[indices[item.index]] = item.embedding
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_batch(indices) for indices in batches))
+    info(f"Embedded {len(texts)} texts in {len(batches)} batches (async) in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return embeddings
+
+
+def _lookup_store(texts: List[str], model: str):
+    """Returns (store, cached vectors or None per text, distinct texts still missing)."""
+    store = get_embedding_store(model)
+    cached = store.get_many(model, texts) if store is not None else [None] * len(texts)
+    missing_texts = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+    return store, cached, missing_texts
+
+
+def _merge_fresh(store, model: str, texts: List[str], cached: list, missing_texts: List[str], fresh_vectors) -> np.ndarray:
+    """Store freshly embedded texts and return all rows in input order."""
+    served = len(texts) - sum(vector is None for vector in cached)
+    if missing_texts:
+        fresh = dict(zip(missing_texts, fresh_vectors))
+        if store is not None:
+            store.put_many(model, missing_texts, [fresh[text] for text in missing_texts])
+            store.flush()
+        cached = [vector if vector is not None else fresh[text] for text, vector in zip(texts, cached)]
+
+    info(f"Embeddings: {served} of {len(texts)} texts served from the store")
+    return np.asarray(cached, dtype=np.float32)
+
+
+def get_embeddings(client, texts: List[str], model: str = EMBEDDING_MODEL,
+                   backend: str = EMBEDDING_BACKEND) -> np.ndarray:
+    """
+    Embed texts, reading from and writing to the persistent embedding store.
+
+    Only texts missing from the store are embedded, each distinct text once: through
+    the OpenAI API with backend "openai", or by the local CPU model with "local"
+    (model and client are then unused).
+
+    Returns:
+        float32 array of shape (len(texts), dim), rows in input order.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    if backend == "local":
+        model = local_model_key()
+        embed = embed_texts_local
+    else:
+        embed = lambda missing: embed_texts(client, missing, model=model)
+
+    store, cached, missing_texts = _lookup_store(texts, model)
+    fresh = embed(missing_texts) if missing_texts else []
+    return _merge_fresh(store, model, texts, cached, missing_texts, fresh)
+
+
+async def get_embeddings_async(client, texts: List[str], model: str = EMBEDDING_MODEL,
+                               backend: str = EMBEDDING_BACKEND) -> np.ndarray:
+    """
+    get_embeddings() for the async server: client is an AsyncOpenAI client; store
+    reads and writes and local inference run in threads.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    if backend == "local":
+        model = local_model_key()
+    store, cached, missing_texts = await asyncio.to_thread(_lookup_store, texts, model)
+    fresh = []
+    if missing_texts:
+        if backend == "local":
+            fresh = await asyncio.to_thread(embed_texts_local, missing_texts)
+        else:
+            fresh = await embed_texts_async(client, missing_texts, model=model)
+    return await asyncio.to_thread(_merge_fresh, store, model, texts, cached, missing_texts, fresh)
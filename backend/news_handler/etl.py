@@ -0,0 +1,246 @@
+# news_handler/etl.py
+# Description: streaming news ETL. Each day is fetched and embedded once; its articles and
+# embeddings are cached on disk, and the day / week / month rollups are built from them.
+
+import os
+import threading
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import diskcache as dc
+
+try:
+    from .news_query import cluster_embeddings, embed_news, get_summary, data_to_news, hash_event_label, events_by_size
+except ImportError:
+    from news_query import cluster_embeddings, embed_news, get_summary, data_to_news, hash_event_label, events_by_size
+try:
+    from .logger import info
+except ImportError:
+    from news_handler.logger import info
+try:
+    from .alpha_vantage import fetch_news_windows
+except ImportError:
+    from news_handler.alpha_vantage import fetch_news_windows
+try:
+    from .embeddings import EMBEDDING_BACKEND, EMBEDDING_MODEL
+except ImportError:
+    from news_handler.embeddings import EMBEDDING_BACKEND, EMBEDDING_MODEL
+try:
+    from .dedup import dedupe_news, dedupe_news_indices, weighted_count, NEWS_DEDUP_ENABLED
+except ImportError:
+    from news_handler.dedup import dedupe_news, dedupe_news_indices, weighted_count, NEWS_DEDUP_ENABLED
+
+ETL_CACHE_DIR = os.getenv("ETL_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_cache"))
+ETL_CACHE_ENABLED = os.getenv("ETL_DAY_CACHE", "1") != "0"
+# Complete days are kept this long (the month rollup reads the last 30)
+ETL_CACHE_TTL_DAYS = float(os.getenv("ETL_CACHE_TTL_DAYS", 45))
+# Articles fetched per day; each rollup keeps a share of them (ROLLUPS)
+ETL_DAILY_LIMIT = int(os.getenv("ETL_DAILY_LIMIT", 1000))
+
+
+@dataclass(frozen=True)
+class Rollup:
+    days: int           # days covered, ending with the newest
+    per_day: int        # newest articles kept from each day
+    max_clusters: int
+
+
+# Snapshot collection -> how it is built from the per-day intermediates (the sizes the
+# separate day / week / month pipelines used to fetch)
+ROLLUPS = {
+    "day": Rollup(days=1, per_day=1000, max_clusters=5),
+    "week": Rollup(days=7, per_day=1000, max_clusters=10),
+    "month": Rollup(days=30, per_day=50, max_clusters=5),
+}
+
+
+@dataclass
+class DayBatch:
+    day: datetime
+    news: list
+    embeddings: np.ndarray
+
+
+class DayStore:
+    """
+    Per-day (deduplicated) articles and embeddings on disk, keyed by day, article
+    limit, embedding model and whether duplicates were collapsed. Only complete days
+    are stored, since a day still in progress keeps growing.
+    """
+
+    def __init__(self, directory: str = ETL_CACHE_DIR, ttl_days: float = ETL_CACHE_TTL_DAYS):
+        self.ttl_seconds = ttl_days * 86400
+        self._cache = dc.Cache(directory)
+
+    @staticmethod
+    def key(day: datetime, limit: int) -> str:
+        return f"{day:%Y-%m-%d}:{limit}:{EMBEDDING_BACKEND}:{EMBEDDING_MODEL}:{'dedup' if NEWS_DEDUP_ENABLED else 'raw'}"
+
+    def get(self, day: datetime, limit: int) -> Optional[DayBatch]:
+        return self._cache.get(self.key(day, limit))
+
+    def put(self, batch: DayBatch, limit: int) -> None:
+        self._cache.set(self.key(batch.day, limit), batch, expire=self.ttl_seconds)
+
+
+_day_store = None
+_day_store_lock = threading.Lock()
+
+
+def get_day_store() -> Optional[DayStore]:
+    global _day_store
+    if not ETL_CACHE_ENABLED:
+        return None
+    with _day_store_lock:
+        if _day_store is None:
+            _day_store = DayStore()
+        return _day_store
+
+
+def _window(day: datetime) -> Tuple[str, str]:
+    return day.strftime("%Y%m%dT0000"), (day + timedelta(days=1)).strftime("%Y%m%dT0000")
+
+
+def extract(days: List[datetime], limit: int, store: Optional[DayStore], stats: dict) -> Iterator[Tuple[datetime, list, Optional[np.ndarray]]]:
+    """
+    Yield (day, articles, cached embeddings or None) in the order of `days`. Days not
+    in the store are fetched together, concurrently, in one round, and their
+    syndicated copies collapsed (dedup.py) so they are never embedded.
+    """
+    cached = {day: store.get(day, limit) for day in days} if store is not None else {}
+    missing = [day for day in days if cached.get(day) is None]
+    responses = dict(zip(missing, fetch_news_windows([_window(day) for day in missing], limit=limit)))
+    stats["days_fetched"] += len(missing)
+    stats["days_cached"] += len(days) - len(missing)
+    for day in days:
+        if cached.get(day) is not None:
+            yield day, cached[day].news, cached[day].embeddings
+            continue
+        data = responses[day]
+        if "feed" not in data:
+            # Rate-limit and error notices come without a feed
+            raise RuntimeError(f"Alpha Vantage returned no feed for {day:%Y-%m-%d}: {data}")
+        dedup_info = {}
+        news = dedupe_news(data_to_news(data), dedup_info)
+        stats["duplicates"] += dedup_info.get("articles", 0) - dedup_info.get("unique", 0)
+        yield day, news, None
+
+
+def embed(rows: Iterable[Tuple[datetime, list, Optional[np.ndarray]]], limit: int,
+          store: Optional[DayStore], stats: dict, now: datetime) -> Iterator[DayBatch]:
+    """Embed the days that came without embeddings and store every complete day."""
+    for day, news, embeddings in rows:
+        if embeddings is None:
+            embeddings = embed_news(news) if news else np.empty((0, 0), dtype=np.float32)
+            stats["articles_embedded"] += len(news)
+            batch = DayBatch(day, news, np.asarray(embeddings, dtype=np.float32))
+            if store is not None and day + timedelta(days=1) <= now:
+                store.put(batch, limit)
+        else:
+            batch = DayBatch(day, news, embeddings)
+        yield batch
+
+
+def combine(batches: List[DayBatch], per_day: int) -> Tuple[list, np.ndarray]:
+    """
+    The newest per_day articles of each day with their embeddings, each link once and
+    stories syndicated on several days collapsed into their newest copy.
+    """
+    news, rows, seen = [], [], set()
+    for batch in batches:
+        for idx, article in enumerate(batch.news[:per_day]):
+            # Articles published on a day boundary can come back for both days
+            if article.link in seen:
+                continue
+            seen.add(article.link)
+            news.append(article)
+            rows.append(batch.embeddings[idx])
+    kept = dedupe_news_indices(news)
+    # Duplicates only change the copy the rollup holds; the cached day stays as it is
+    news = [news[idx] if not extra else replace(news[idx], duplicates=news[idx].duplicates + extra)
+            for idx, extra in kept]
+    return news, np.asarray([rows[idx] for idx, _ in kept], dtype=np.float32)
+
+
+def rollups(batches: Iterable[DayBatch], periods: Iterable[str]) -> Iterator[Tuple[str, List[DayBatch]]]:
+    """Yield (period, its days) as soon as the newest-first stream has covered the period."""
+    wanted = {period: ROLLUPS[period].days for period in periods}
+    seen = []
+    for batch in batches:
+        seen.append(batch)
+        for period, days in wanted.items():
+            if len(seen) == days:
+                yield period, list(seen)
+
+
+def snapshot_results(news: list, embeddings: np.ndarray, max_clusters: int, max_words: int = 150) -> list:
+    """Cluster and summarize articles into the stored snapshot format."""
+    if not news:
+        return []
+    labels = cluster_embeddings(embeddings, max_clusters=max_clusters)
+    events = get_summary(hash_event_label(labels, news), max_words=max_words)
+    total = weighted_count(news)
+    return [
+        {
+            "Percentage": int(100 * weighted_count(event.news_list) / total),
+            "Event": {
+                "event_id": event.event_id,
+                "summary": event.summary,
+                "topic": getattr(event, 'topic', 'General'),
+                "risk": getattr(event, 'risk', None),
+                "opportunity": getattr(event, 'opportunity', None),
+                "rationale": getattr(event, 'rationale', None),
+                "news_list": [vars(article) for article in event.news_list]
+            }
+        }
+        for event in events_by_size(events)
+    ]
+
+
+def day_batches(days: List[datetime], limit: int = ETL_DAILY_LIMIT, stats: Optional[dict] = None,
+                store: Optional[DayStore] = None, now: Optional[datetime] = None) -> Iterator[DayBatch]:
+    """extract -> embed for the given days, in their order."""
+    stats = stats if stats is not None else new_stats()
+    store = store if store is not None else get_day_store()
+    now = now or datetime.now()
+    return embed(extract(days, limit, store, stats), limit, store, stats, now)
+
+
+def new_stats() -> Dict[str, int]:
+    return {"days_fetched": 0, "days_cached": 0, "articles_embedded": 0, "duplicates": 0}
+
+
+def run_rollups(end_day: Optional[datetime] = None, periods: Iterable[str] = tuple(ROLLUPS),
+                limit: int = ETL_DAILY_LIMIT, stats: Optional[dict] = None,
+                store: Optional[DayStore] = None) -> Iterator[Tuple[str, dict]]:
+    """
+    Build the snapshots of `periods` in one pass over the days up to end_day
+    (default: yesterday, the newest complete day).
+
+    Days stream newest first, so the day snapshot is ready after one day and the week
+    snapshot after seven; every day is fetched and embedded at most once for all of
+    them, and not at all when an earlier run stored it.
+
+    Yields:
+        (period, document) with the period's start and end fields, created_at and results.
+    """
+    periods = list(periods)
+    now = datetime.now()
+    end_day = (end_day or now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    span = max(ROLLUPS[period].days for period in periods)
+    days = [end_day - timedelta(days=offset) for offset in range(span)]
+    stats = stats if stats is not None else new_stats()
+
+    for period, batches in rollups(day_batches(days, limit, stats, store, now), periods):
+        rollup = ROLLUPS[period]
+        news, embeddings = combine(batches, rollup.per_day)
+        info(f"ETL {period}: {len(news)} articles from {len(batches)} days")
+        yield period, {
+            f"{period}_start": batches[-1].day.strftime("%Y-%m-%d"),
+            f"{period}_end": (end_day + timedelta(days=1)).strftime("%Y-%m-%d"),
+            "created_at": datetime.now(),
+            "results": snapshot_results(news, embeddings, rollup.max_clusters)
+        }
+    info(f"ETL run: {stats}")
@@ -0,0 +1,238 @@
+# news_handler/incremental_cluster.py
+# Description: incremental news clustering with persistent event centroids and stable event keys
+
+import os
+import json
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+from filelock import FileLock
+
+try:
+    from .logger import info
+except ImportError:
+    from news_handler.logger import info
+try:
+    from .clustering import cluster_embeddings
+except ImportError:
+    from news_handler.clustering import cluster_embeddings
+
+CLUSTER_STATE_DIR = os.getenv(
+    "CLUSTER_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cluster_state")
+)
+# Cosine similarity a new article needs with an event centroid to join that event
+CLUSTER_ASSIGN_THRESHOLD = float(os.getenv("CLUSTER_ASSIGN_THRESHOLD", 0.6))
+CLUSTER_RECLUSTER_HOURS = float(os.getenv("CLUSTER_RECLUSTER_HOURS", 24))
+# Reused event keys need this much member overlap (Jaccard) with the new cluster
+_KEY_REUSE_OVERLAP = 0.5
+
+
+def _event_cap(max_clusters: int) -> int:
+    """Most events an incremental update may leave before the window is reclustered."""
+    return 2 * max_clusters
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IncrementalClusterer:
+    """
+    Keeps event clusters for one news window across calls.
+
+    State (event centroids and members) is persisted as JSON. Each update() retires
+    articles that left the window, keeps known articles in their event, assigns new
+    articles to the nearest event centroid when it is similar enough and spawns a
+    new event otherwise. A full recluster runs when there is no state yet, every
+    recluster_hours, or when spawned events would leave more than twice max_clusters
+    events (checked within the update, so a batch of unrelated articles cannot
+    multiply the events); it keeps existing event keys for clusters that mostly
+    overlap an old event. Event keys ("evt-<n>") are stable, so hash_event_label()
+    turns them into stable event IDs.
+
+    Several processes can share a state file (web workers, the async server, the
+    pre-warm thread): each update holds <state>.lock, re-reads the file when another
+    process has replaced it and saves before releasing the lock, so updates build
+    on each other and event keys are never handed out twice.
+    """
+
+    def __init__(self, state_path: str, assign_threshold: float = CLUSTER_ASSIGN_THRESHOLD,
+                 recluster_hours: float = CLUSTER_RECLUSTER_HOURS):
+        self.state_path = state_path
+        self.assign_threshold = assign_threshold
+        self.recluster_hours = recluster_hours
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+        self._file_lock = FileLock(state_path + ".lock")
+        self._state_version = None
+        self.state = self._empty_state()
+        with self._lock, self._file_lock:
+            self._refresh()
+
+    def _empty_state(self) -> dict:
+        return {"last_full_recluster": None, "next_id": 0, "events": {}}
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return self._empty_state()
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (ValueError, OSError) as e:
+            info(f"Cluster state {self.state_path} is unreadable ({e}), starting fresh")
+            return self._empty_state()
+
+    def _version(self):
+        try:
+            st = os.stat(self.state_path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _refresh(self):
+        """Reload the state (caller holds the file lock) if another process replaced it."""
+        version = self._version()
+        if version != self._state_version:
+            self.state = self._load()
+            self._state_version = version
+
+    def _save(self):
+        """Write the state (caller holds the file lock) through a temporary file of its own."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.state_path)),
+                                        prefix=os.path.basename(self.state_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.state_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._state_version = self._version()
+
+    def _new_key(self) -> str:
+        key = f"evt-{self.state['next_id']}"
+        self.state["next_id"] += 1
+        return key
+
+    def _recluster_due(self, max_clusters: int) -> bool:
+        last = self.state.get("last_full_recluster")
+        if not last or not self.state["events"]:
+            return True
+        if datetime.now() - datetime.fromisoformat(last) > timedelta(hours=self.recluster_hours):
+            return True
+        # Too many spawned events means the old partition no longer fits the window
+        return len(self.state["events"]) > _event_cap(max_clusters)
+
+    def _full_recluster(self, links, vectors, max_clusters) -> List[str]:
+        n_clusters = min(max_clusters, len(links))
+        raw_labels = cluster_embeddings(vectors, n_clusters)
+
+        old_members = {key: set(event["members"]) for key, event in self.state["events"].items()}
+        labels = [None] * len(links)
+        used_keys = set()
+        for raw in sorted(set(raw_labels)):
+            members = {links[i] for i in np.flatnonzero(raw_labels == raw)}
+            best_key, best_overlap = None, 0.0
+            for key, old in old_members.items():
+                if key in used_keys:
+                    continue
+                overlap = len(members & old) / len(members | old)
+                if overlap > best_overlap:
+                    best_key, best_overlap = key, overlap
+            key = best_key if best_overlap >= _KEY_REUSE_OVERLAP else self._new_key()
+            used_keys.add(key)
+            for i in np.flatnonzero(raw_labels == raw):
+                labels[i] = key
+
+        self.state["last_full_recluster"] = datetime.now().isoformat()
+        info(f"Full recluster: {len(links)} articles into {n_clusters} events")
+        return labels
+
+    def _assign(self, links, vectors) -> List[str]:
+        article_event = {link: key for key, event in self.state["events"].items() for link in event["members"]}
+        keys = list(self.state["events"].keys())
+        centroids = _normalize(np.asarray([self.state["events"][k]["centroid"] for k in keys], dtype=np.float32))
+
+        labels = []
+        new_articles = spawned = 0
+        for link, vector in zip(links, vectors):
+            if link in article_event:
+                labels.append(article_event[link])
+                continue
+            new_articles += 1
+            similarities = centroids @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.assign_threshold:
+                labels.append(keys[best])
+            else:
+                key = self._new_key()
+                keys.append(key)
+                centroids = np.vstack([centroids, vector[None, :]])
+                labels.append(key)
+                spawned += 1
+        info(f"Incremental update: {new_articles} new articles, {spawned} new events")
+        return labels
+
+    def update(self, news_list, embeddings, max_clusters: int = 5) -> List[str]:
+        """
+        Cluster the current window incrementally.
+
+        Args:
+            news_list: Articles currently in the window (identified by link).
+            embeddings: One embedding per article.
+            max_clusters: Target number of events for full reclusters.
+
+        Returns:
+            One stable event key per article.
+        """
+        if not news_list:
+            return []
+        links = [news.link for news in news_list]
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock, self._file_lock:
+            # Another process may have updated the window since this one last did
+            self._refresh()
+            if self._recluster_due(max_clusters):
+                labels = self._full_recluster(links, vectors, max_clusters)
+            else:
+                labels = self._assign(links, vectors)
+                if len(set(labels)) > _event_cap(max_clusters):
+                    info(f"Incremental update left {len(set(labels))} events, reclustering")
+                    labels = self._full_recluster(links, vectors, max_clusters)
+
+            # Rebuild events from the current window only; articles that left it are retired
+            events = {}
+            for idx, key in enumerate(labels):
+                events.setdefault(key, {"rows": [], "members": []})
+                events[key]["rows"].append(idx)
+                events[key]["members"].append(links[idx])
+            self.state["events"] = {
+                key: {
+                    "members": event["members"],
+                    "centroid": vectors[event["rows"]].mean(axis=0).tolist(),
+                }
+                for key, event in events.items()
+            }
+            self._save()
+        return labels
+
+
+_clusterers = {}
+_clusterers_lock = threading.Lock()
+
+
+def get_clusterer(window_key: str) -> IncrementalClusterer:
+    """Process-wide clusterer for one query window (e.g. "week" or "week_AAPL,MSFT")."""
+    with _clusterers_lock:
+        if window_key not in _clusterers:
+            safe_name = "".join(c if c.isalnum() or c in "-_," else "_" for c in window_key)
+            _clusterers[window_key] = IncrementalClusterer(os.path.join(CLUSTER_STATE_DIR, f"{safe_name}.json"))
+        return _clusterers[window_key]
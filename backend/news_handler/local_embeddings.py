@@ -0,0 +1,80 @@
+# news_handler/local_embeddings.py
+# Description: CPU embedding backend using sentence-transformers, loaded once per process
+
+import os
+import time
+import threading
+from typing import List
+
+import numpy as np
+
+try:
+    from .logger import info
+except ImportError:
+    from news_handler.logger import info
+
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", 64))
+# torch intra-op threads for inference; 0 keeps torch's default (one per core)
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", 0))
+# "torch" (default), "quantized" (dynamic int8 Linear layers) or "onnx"
+# (sentence-transformers ONNX backend, needs optimum[onnxruntime])
+LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "torch")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _load_model():
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if LOCAL_EMBEDDING_THREADS > 0:
+        torch.set_num_threads(LOCAL_EMBEDDING_THREADS)
+    start = time.perf_counter()
+    if LOCAL_EMBEDDING_RUNTIME == "onnx":
+        model = SentenceTransformer(LOCAL_EMBEDDING_MODEL, device="cpu", backend="onnx")
+    else:
+        model = SentenceTransformer(LOCAL_EMBEDDING_MODEL, device="cpu")
+        if LOCAL_EMBEDDING_RUNTIME == "quantized":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    info(f"Loaded local embedding model {LOCAL_EMBEDDING_MODEL} ({LOCAL_EMBEDDING_RUNTIME}) "
+         f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return model
+
+
+def get_local_model():
+    """The process-wide sentence-transformers model, loaded on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = _load_model()
+    return _model
+
+
+def local_model_key() -> str:
+    """Name the embedding store files local vectors under, distinct from API models."""
+    return f"local-{LOCAL_EMBEDDING_MODEL}-{LOCAL_EMBEDDING_RUNTIME}"
+
+
+def embed_texts_local(texts: List[str], batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE) -> np.ndarray:
+    """
+    Embed texts on the CPU in batches.
+
+    Returns:
+        float32 array of unit-length embeddings, one row per input text.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    start = time.perf_counter()
+    embeddings = get_local_model().encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    elapsed = time.perf_counter() - start
+    info(f"Embedded {len(texts)} texts locally in {elapsed * 1000:.0f} ms ({len(texts) / max(elapsed, 1e-9):.0f} texts/s)")
+    return np.asarray(embeddings, dtype=np.float32)
@@ -8,6 +8,7 @@ class News:
     title: str
     link: str
     summary: str
+    duplicates: int = 0  # syndicated copies collapsed into this article (dedup.py)
     
     def to_dict(self):
         """Convert News object to dictionary."""
@@ -1,10 +1,10 @@
 # news_query.py
 import os
+import asyncio
 import hashlib
-import requests
 import pytz
-from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 # Try both import styles to work in different contexts
 try:
@@ -14,25 +14,63 @@ except ImportError:
     # Fall back to absolute import (when run as a script or in tests)
     from news import News, Event
 
-from sentence_transformers import SentenceTransformer
-from sklearn.cluster import AgglomerativeClustering
-from openai import OpenAI
 # Fix the import to use the correct path
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from topic_generator.topic_generator import topic_generator
+from topic_generator.topic_generator import topic_generator, analyze_news_clusters, analyze_news_clusters_async, COMBINED_ANALYSIS_MODEL
+from clients import get_openai_client, get_async_openai_client, load_env
+from llm_gateway import gateway
 # Add this import for the logger functions
 # Use the same try/except pattern for other relative imports
 try:
     from .logger import info, error, debug, warning, log_data
 except ImportError:
     from news_handler.logger import info, error, debug, warning, log_data
+try:
+    from .embeddings import get_embeddings, get_embeddings_async
+except ImportError:
+    from news_handler.embeddings import get_embeddings, get_embeddings_async
+try:
+    from .alpha_vantage import fetch_news_windows, fetch_news_windows_async
+except ImportError:
+    from news_handler.alpha_vantage import fetch_news_windows, fetch_news_windows_async
+try:
+    from .incremental_cluster import get_clusterer
+except ImportError:
+    from news_handler.incremental_cluster import get_clusterer
+try:
+    from .clustering import cluster_embeddings as run_clustering
+except ImportError:
+    from news_handler.clustering import cluster_embeddings as run_clustering
+try:
+    from .summary_cache import summary_cache
+except ImportError:
+    from news_handler.summary_cache import summary_cache
+try:
+    from .dedup import dedupe_news, weighted_count
+except ImportError:
+    from news_handler.dedup import dedupe_news, weighted_count
+
+load_env()
 
-load_dotenv()
+def get_client():
+    # Shared OpenAI client, created on first use (see clients.py)
+    return get_openai_client("OPEN_AI_KEY")
 
-alpha_vantage_api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
-openai_api_key = os.getenv("OPEN_AI_KEY")
-client = OpenAI(api_key = openai_api_key)
+def get_async_client():
+    return get_async_openai_client("OPEN_AI_KEY")
+
+# Clusters summarized in parallel by get_summary(); 1 processes them one at a time
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", 5))
+# "combined": one request returns summary, topic, risk and opportunity for every cluster;
+# "per_event": one summary call plus one topic call per cluster
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "combined")
+SUMMARY_MODEL = "gpt-4.1-nano"
+# Event fields produced by summarization (and memoized by the summary cache)
+SUMMARY_FIELDS = ("summary", "topic", "risk", "opportunity", "rationale")
+# "full": recluster every window from scratch; "incremental": keep events across calls
+# and only place new articles (see incremental_cluster.py)
+CLUSTER_MODE = os.getenv("CLUSTER_MODE", "full")
 
 # url = 'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&apikey={api_key}'
 
@@ -73,110 +111,199 @@ def data_to_news(data):
         news_list.append(news)
     return news_list
         
-def cluster(news_list, max_clusters=5):
+def _news_summaries(news_list):
+    return [news.summary if news.summary is not None else "" for news in news_list]
+
+def embed_news(news_list):
+    # Embeddings come from the on-disk store when cached; the rest are fetched from
+    # OpenAI in size-capped batches, several in flight at once
+    return get_embeddings(get_client(), _news_summaries(news_list))
+
+def cluster_embeddings(embeddings, max_clusters=5, metadata=None):
+    # Agglomerative for small windows, mini-batch k-means for backfills with
+    # thousands of articles; CLUSTER_K_SELECTION=silhouette picks the count
+    # (up to max_clusters) from the embeddings (see clustering.py)
+    return run_clustering(embeddings, n_clusters=max_clusters, metadata=metadata)
+
+def cluster(news_list, max_clusters=5, metadata=None):
     # If no news, return empty list of labels
     if not news_list:
         return []
         
-    summaries = [news.summary if news.summary is not None else "" for news in news_list]
-    
-    # Get embeddings from OpenAI API in batch
-    embeddings = []
-    for summary in summaries:
-        response = client.embeddings.create(
-            input=summary,
-            model="text-embedding-3-small"
+    return cluster_embeddings(embed_news(news_list), max_clusters=max_clusters, metadata=metadata)
+
+def _summarize_event(event_idx, event, max_words):
+    summaries = [news.summary for news in event.news_list]
+    combined_summary = "\n".join(summaries)
+
+    print(f"\n[INFO] Generating summary for event {event_idx} with {len(event.news_list)} news articles.")
+
+    # Rate limits and transient errors are retried by the gateway
+    try:
+        response = gateway.complete(
+            get_client(),
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": f"Provide a concise summary of the following news summaries in no more than {max_words} words."},
+                {"role": "user", "content": combined_summary}
+            ],
         )
-        embeddings.append(response.data[0].embedding)
-    
-    # Extract embeddings from response
-    # embeddings = [item.embedding for item in response.data]
-    
-    n_clusters = min(max_clusters, len(news_list)) 
-    clustering = AgglomerativeClustering(n_clusters=n_clusters)
-    labels = clustering.fit_predict(embeddings)
-    
-    return labels
+        event.summary = response.choices[0].message.content.strip()
 
-def get_summary(events, max_words=150):
-    for event_idx, event in enumerate(events.values()):
-        summaries = [news.summary for news in event.news_list]
-        combined_summary = "\n".join(summaries)
+        if not event.summary or event.summary == "Summary not available.":
+            raise ValueError("Generated empty or fallback summary.")
+    except Exception as e:
+        print(f"[ERROR] Failed to generate summary for event {event_idx}: {e}")
+        event.summary = "Summary not available."
+        event.topic = "General"
+        print(f"[FALLBACK] Setting summary and topic to default values for event {event_idx}.")
+        return
 
-        print(f"\n[INFO] Generating summary for event {event_idx} with {len(event.news_list)} news articles.")
+    print(f"[SUCCESS] Summary for event {event_idx}: {event.summary[:100]}...")  # First 100 chars
 
-        # Add retry logic for rate limits
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4.1-nano",
-                    messages=[
-                        {"role": "system", "content": f"Provide a concise summary of the following news summaries in no more than {max_words} words."},
-                        {"role": "user", "content": combined_summary}
-                    ],
-                )
-                event.summary = response.choices[0].message.content.strip()
-                
-                if not event.summary or event.summary == "Summary not available.":
-                    raise ValueError("Generated empty or fallback summary.")
-
-                print(f"[SUCCESS] Summary for event {event_idx}: {event.summary[:100]}...")  # First 100 chars
-                
-                # Now generate topic
-                try:
-                    # inside get_summary()
-                    topic_response = topic_generator(event.summary)
-
-                    # Save the topic
-                    event.topic = topic_response.get('topic', 'General')
-
-                    # (New) Save the risk, opportunity, and rationale into event object
-                    event.risk = topic_response.get('risk', None)
-                    event.opportunity = topic_response.get('opportunity', None)
-                    event.rationale = topic_response.get('rationale', None)
-                    print(f"[SUCCESS] Generated topic for event {event_idx}: {event.topic}")
-                except Exception as topic_error:
-                    print(f"[ERROR] Failed to generate topic for event {event_idx}: {topic_error}")
-                    event.topic = 'General'
-
-                break  # Success, exit retry loop
-
-            except Exception as e:
-                retry_count += 1
-                error_message = str(e)
-
-                print(f"[ERROR] Attempt {retry_count}/{max_retries} to generate summary failed: {error_message}")
-
-                if "rate_limit" in error_message.lower() and retry_count < max_retries:
-                    # Wait based on rate limit error
-                    import re
-                    import time
-                    
-                    wait_time = 30  # Default wait time in seconds
-                    wait_match = re.search(r'try again in (\d+\.\d+)s', error_message)
-                    if wait_match:
-                        wait_time = float(wait_match.group(1)) + 1  # Add small buffer
-                    
-                    print(f"[RATE LIMIT] Waiting {wait_time:.2f} seconds before retrying...")
-                    time.sleep(wait_time)
-                else:
-                    # Non-rate limit error or exhausted retries
-                    event.summary = "Summary not available."
-                    event.topic = "General"
-                    print(f"[FALLBACK] Setting summary and topic to default values for event {event_idx}.")
-                    break
-
-        # If exhausted retries
-        if retry_count == max_retries:
-            print(f"[MAX RETRIES] Could not generate summary after {max_retries} tries. Using fallback for event {event_idx}.")
-            event.summary = "Summary not available."
-            event.topic = "General"
+    # Now generate topic
+    try:
+        # inside get_summary()
+        topic_response = topic_generator(event.summary)
+
+        # Save the topic
+        event.topic = topic_response.get('topic', 'General')
+
+        # (New) Save the risk, opportunity, and rationale into event object
+        event.risk = topic_response.get('risk', None)
+        event.opportunity = topic_response.get('opportunity', None)
+        event.rationale = topic_response.get('rationale', None)
+        print(f"[SUCCESS] Generated topic for event {event_idx}: {event.topic}")
+    except Exception as topic_error:
+        print(f"[ERROR] Failed to generate topic for event {event_idx}: {topic_error}")
+        event.topic = 'General'
+
+def _apply_cluster_analyses(indexed_events, analyses):
+    pending = []
+    for (event_idx, event), analysis in zip(indexed_events, analyses):
+        if analysis is None:
+            pending.append((event_idx, event))
+            continue
+        event.summary = analysis["summary"]
+        event.topic = analysis["topic"]
+        event.risk = analysis["risk"]
+        event.opportunity = analysis["opportunity"]
+        event.rationale = analysis["rationale"]
+    print(f"[SUCCESS] Combined analysis covered {len(indexed_events) - len(pending)}/{len(indexed_events)} events.")
+    return pending
+
+def _cluster_texts(indexed_events):
+    return [[news.summary or "" for news in event.news_list] for _, event in indexed_events]
+
+def _analyze_events_combined(indexed_events, max_words):
+    """
+    Fill summary, topic, risk, opportunity and rationale for all events with one request.
+    Returns the (event_idx, event) pairs the combined answer did not cover.
+    """
+    try:
+        analyses = analyze_news_clusters(_cluster_texts(indexed_events), max_words=max_words)
+    except Exception as e:
+        print(f"[ERROR] Combined cluster analysis failed, falling back per event: {e}")
+        return indexed_events
+    return _apply_cluster_analyses(indexed_events, analyses)
+
+async def _analyze_events_combined_async(indexed_events, max_words):
+    try:
+        analyses = await analyze_news_clusters_async(_cluster_texts(indexed_events), max_words=max_words)
+    except Exception as e:
+        print(f"[ERROR] Combined cluster analysis failed, falling back per event: {e}")
+        return indexed_events
+    return _apply_cluster_analyses(indexed_events, analyses)
+
+def _event_members(event):
+    return [news.link or news.title or "" for news in event.news_list]
+
+def _apply_cached_summaries(indexed_events, max_words, model, cache):
+    """Fill events found in the summary cache; returns the (event_idx, event) pairs still to generate."""
+    if cache is None:
+        return indexed_events
+    uncached = []
+    for event_idx, event in indexed_events:
+        cached = cache.get(_event_members(event), max_words, model)
+        if cached is None:
+            uncached.append((event_idx, event))
+            continue
+        for field in SUMMARY_FIELDS:
+            setattr(event, field, cached.get(field))
+    if len(uncached) < len(indexed_events):
+        info(f"Summary cache covered {len(indexed_events) - len(uncached)}/{len(indexed_events)} events")
+    return uncached
+
+def _cache_summaries(indexed_events, max_words, model, cache):
+    if cache is None:
+        return
+    for _, event in indexed_events:
+        if event.summary and event.summary != "Summary not available.":
+            cache.put(_event_members(event), max_words, model,
+                      {field: getattr(event, field, None) for field in SUMMARY_FIELDS})
+
+def get_summary(events, max_words=150, max_concurrency=SUMMARY_MAX_CONCURRENCY, mode=SUMMARY_MODE, cache=summary_cache):
+    """
+    Generate summary and topic for every event in place.
+
+    Events whose membership matches (or nearly matches) a cached cluster reuse its
+    analysis. In "combined" mode the remaining events are analyzed by one request
+    first; only events it did not cover go through the per-event path. Per-event
+    work runs on up to max_concurrency worker threads (1 runs them one after
+    another). Each event is written only by its own worker, so the returned dict
+    keeps its original cluster order.
+    """
+    model = COMBINED_ANALYSIS_MODEL if mode == "combined" else SUMMARY_MODEL
+    indexed_events = _apply_cached_summaries(list(enumerate(events.values())), max_words, model, cache)
+    to_generate = list(indexed_events)
+
+    if mode == "combined" and indexed_events:
+        indexed_events = _analyze_events_combined(indexed_events, max_words)
+    workers = max(1, min(max_concurrency, len(indexed_events)))
 
+    if workers == 1:
+        for event_idx, event in indexed_events:
+            _summarize_event(event_idx, event, max_words)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_summarize_event, event_idx, event, max_words)
+                       for event_idx, event in indexed_events]
+            for future in futures:
+                future.result()
+
+    _cache_summaries(to_generate, max_words, model, cache)
+    return events
+
+async def get_summary_async(events, max_words=150, mode=SUMMARY_MODE, cache=summary_cache):
+    """
+    get_summary() for the async server: the combined analysis goes through the async
+    client; the rare per-event fallbacks run on worker threads.
+    """
+    model = COMBINED_ANALYSIS_MODEL if mode == "combined" else SUMMARY_MODEL
+    indexed_events = await asyncio.to_thread(
+        _apply_cached_summaries, list(enumerate(events.values())), max_words, model, cache)
+    to_generate = list(indexed_events)
+
+    if mode == "combined" and indexed_events:
+        indexed_events = await _analyze_events_combined_async(indexed_events, max_words)
+    if indexed_events:
+        await asyncio.gather(*(asyncio.to_thread(_summarize_event, event_idx, event, max_words)
+                               for event_idx, event in indexed_events))
+
+    await asyncio.to_thread(_cache_summaries, to_generate, max_words, model, cache)
     return events
 
+def dedupe_by_link(news_list):
+    # Adjacent windows share their boundary, so the same article can come back twice
+    seen = set()
+    unique = []
+    for news in news_list:
+        if news.link in seen:
+            continue
+        seen.add(news.link)
+        unique.append(news)
+    return unique
+
 def hash_event_label(labels, news_list):
     events = {}
     for idx, label in enumerate(labels):
@@ -187,7 +314,8 @@ def hash_event_label(labels, news_list):
     return events
 
 
-def real_time_query(time_range, keywords=[], max_clusters=5, max_words=150):
+def _query_windows(time_range):
+    """One (time_from, time_to) window per day of the range, and the article limit per window."""
     if time_range == "day":
         days_to_query = 1
         daily_limit = 200
@@ -200,42 +328,55 @@ def real_time_query(time_range, keywords=[], max_clusters=5, max_words=150):
     else: 
         raise ValueError("Invalid time range.")   
     
-    all_news_list = []     
-    
+    now = datetime.now()
+    windows = []
     for day_offset in range(days_to_query):
-        end_day = (datetime.now() - timedelta(days = day_offset)).strftime("%Y%m%dT%H%M")
-        start_day = (datetime.now() - timedelta(days= day_offset + 1)).strftime("%Y%m%dT%H%M")
-        if keywords == []:
-            url = f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&time_from={start_day}&time_to={end_day}&limit={daily_limit}&apikey={alpha_vantage_api_key}'
-        else:
-            tickers = ",".join(keywords)
-            url = f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&time_from={start_day}&time_to={end_day}&tickers={tickers}&limit={daily_limit}&apikey={alpha_vantage_api_key}'
-        
-        r = requests.get(url)
-        data = r.json()
-    
+        end_day = (now - timedelta(days = day_offset)).strftime("%Y%m%dT%H%M")
+        start_day = (now - timedelta(days= day_offset + 1)).strftime("%Y%m%dT%H%M")
+        windows.append((start_day, end_day))
+    return windows, daily_limit
+
+def _news_from_responses(responses):
+    all_news_list = []
+    for data in responses:
         news_list = data_to_news(data)
         print(len(news_list))
         all_news_list.extend(news_list)
-        
-    if not all_news_list: 
-        return []
-    
-    labels = cluster(all_news_list, max_clusters= max_clusters)
-        
-    events = get_summary(hash_event_label(labels, all_news_list), max_words=max_words)
-    
-    # for label, event in events.items():
-    #     print(f"\nCluster {label}:")
-    #     for news in event.news_list:
-    #         print(f"  - {news.title}")
-    
-    total_news = len(all_news_list)
+    return dedupe_by_link(all_news_list)
+
+def _dedupe_news(news_list, metadata):
+    """Collapse syndicated copies before embedding; the reduction goes to metadata["dedup"]."""
+    dedup_info = {}
+    news_list = dedupe_news(news_list, dedup_info)
+    if dedup_info:
+        info(f"Deduplicated {dedup_info['articles']} articles to {dedup_info['unique']} "
+             f"(reduction {dedup_info['reduction']:.1%})")
+    if metadata is not None:
+        metadata["dedup"] = dedup_info
+    return news_list
+
+def _label_news(news_list, embeddings, time_range, keywords, max_clusters):
+    """Cluster labels for the window's articles and a description of how they were formed."""
+    if CLUSTER_MODE == "incremental":
+        # Stable event keys across calls, so unchanged events also keep their IDs
+        clusterer = get_clusterer("_".join([time_range] + sorted(keywords)))
+        labels = clusterer.update(news_list, embeddings, max_clusters=max_clusters)
+        return labels, {"mode": "incremental", "n_clusters": len(set(labels))}
+    cluster_info = {"mode": "full"}
+    labels = cluster_embeddings(embeddings, max_clusters=max_clusters, metadata=cluster_info)
+    return labels, cluster_info
+
+def events_by_size(events):
+    # Callers keep the first `limit` events, so small (e.g. newly spawned) events go last
+    return sorted(events.values(), key=lambda event: weighted_count(event.news_list), reverse=True)
+
+def _format_results(events, total_news):
+    # total_news and the shares count collapsed duplicates too (dedup.weighted_count)
     info(f"Processing results: total news count = {total_news}")
     
     result = []
-    for event in events.values():
-        percentage = int(100 * len(event.news_list) / total_news)
+    for event in events_by_size(events):
+        percentage = int(100 * weighted_count(event.news_list) / total_news)
         info(f"Event {event.event_id[:8]}...: {percentage}% of total news ({len(event.news_list)} articles)")
         log_data(f"event_summary_{event.event_id[:8]}", {
             "percentage": percentage,
@@ -249,12 +390,63 @@ def real_time_query(time_range, keywords=[], max_clusters=5, max_words=150):
                 "event_id": event.event_id,
                 "summary": event.summary,
                 "topic": getattr(event, 'topic', 'General'),
+                "risk": getattr(event, 'risk', None),
+                "opportunity": getattr(event, 'opportunity', None),
+                "rationale": getattr(event, 'rationale', None),
                 "news_list": event.news_list
             }
         })
     
     info(f"Query complete, returning {len(result)} events")
     return result
+
+
+def real_time_query(time_range, keywords=[], max_clusters=5, max_words=150, metadata=None):
+    """
+    Fetch, cluster and summarize the news of a time range.
+    If a metadata dict is given, metadata["clustering"] describes how the events were formed
+    (mode, chosen cluster count, backend and timings) and metadata["dedup"] how many
+    articles were duplicates.
+    """
+    # One window per day, fetched concurrently through the pooled, rate-limited session
+    windows, daily_limit = _query_windows(time_range)
+    all_news_list = _news_from_responses(fetch_news_windows(windows, limit=daily_limit, tickers=keywords))
+        
+    if not all_news_list: 
+        return []
+    all_news_list = _dedupe_news(all_news_list, metadata)
+    
+    labels, cluster_info = _label_news(all_news_list, embed_news(all_news_list), time_range, keywords, max_clusters)
+    if metadata is not None:
+        metadata["clustering"] = cluster_info
+
+    # Clusters with (nearly) unchanged membership are served by the summary cache
+    events = get_summary(hash_event_label(labels, all_news_list), max_words=max_words)
+    return _format_results(events, weighted_count(all_news_list))
+
+
+async def real_time_query_async(http, time_range, keywords=[], max_clusters=5, max_words=150, metadata=None):
+    """
+    real_time_query() for the async server: fetches go through the aiohttp session
+    `http`, embeddings and the combined analysis through the async OpenAI client, and
+    deduplication and clustering (CPU bound) run on worker threads.
+    """
+    windows, daily_limit = _query_windows(time_range)
+    all_news_list = _news_from_responses(
+        await fetch_news_windows_async(http, windows, limit=daily_limit, tickers=keywords))
+
+    if not all_news_list:
+        return []
+    all_news_list = await asyncio.to_thread(_dedupe_news, all_news_list, metadata)
+
+    embeddings = await get_embeddings_async(get_async_client(), _news_summaries(all_news_list))
+    labels, cluster_info = await asyncio.to_thread(
+        _label_news, all_news_list, embeddings, time_range, keywords, max_clusters)
+    if metadata is not None:
+        metadata["clustering"] = cluster_info
+
+    events = await get_summary_async(hash_event_label(labels, all_news_list), max_words=max_words)
+    return await asyncio.to_thread(_format_results, events, weighted_count(all_news_list))
         
     
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+# news_handler/rate_limiter.py
+# Description: client-side rate limiting shared by the API callers
+
+import re
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; acquire() blocks
+    until enough tokens are available, so bursts are capped at `capacity` requests and
+    the sustained rate never exceeds `rate`.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: float = 1):
+        return cls(rate=requests_per_minute / 60.0, capacity=max(1, burst))
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available; returns 0 on success, otherwise the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def wait_time(self, tokens: float = 1, reserve: float = 0) -> float:
+        """Seconds until `tokens` could be taken while leaving `reserve` behind; takes nothing."""
+        with self._lock:
+            self._refill(time.monotonic())
+            missing = tokens + min(reserve, self.capacity - tokens) - self._tokens
+            return max(0.0, missing / self.rate)
+
+    def adjust(self, tokens: float) -> None:
+        """Take (positive) or give back (negative) tokens after the fact; the level may go below zero."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - tokens)
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Block until tokens are taken; returns the total time waited in seconds."""
+        # A request larger than the bucket could never be served, so cap it
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+def retry_after_seconds(exc) -> float:
+    """
+    Read the retry hint from a rate-limit error: the retry-after(-ms) response header
+    when the client exposes it, otherwise the "try again in 1.2s / 350ms" message text.
+    Returns None when there is no hint.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    match = re.search(r'try again in (\d+(?:\.\d+)?)(ms|s)', str(exc))
+    if match:
+        value = float(match.group(1))
+        return value / 1000 if match.group(2) == "ms" else value
+    return None
+
+
+class SharedBackoff:
+    """
+    Rate-limit pause shared by concurrent workers.
+
+    The first worker to hit a rate limit reads the retry hint and opens a pause
+    window; workers that hit the limit while the window is open join it instead of
+    stacking their own sleeps. Workers that are not rate limited keep running.
+    Without a hint the window starts at `base_wait` and doubles for every
+    back-to-back window, up to `max_wait`.
+    """
+
+    def __init__(self, base_wait: float = 2.0, max_wait: float = 30.0):
+        self.base_wait = base_wait
+        self.max_wait = max_wait
+        self._resume_at = 0.0
+        self._streak = 0
+        self._lock = threading.Lock()
+
+    def register(self, exc) -> float:
+        """Record a rate-limit error; returns how long the caller should pause."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._resume_at:
+                return self._resume_at - now
+            hint = retry_after_seconds(exc)
+            if hint is not None:
+                wait = hint + 1  # small buffer over the server's hint
+                self._streak = 0
+            else:
+                wait = min(self.max_wait, self.base_wait * (2 ** self._streak))
+                self._streak += 1
+            self._resume_at = now + wait
+            return wait
+
+    def remaining(self) -> float:
+        """Seconds left in the current pause window (0 when not paused)."""
+        with self._lock:
+            return max(0.0, self._resume_at - time.monotonic())
@@ -1,7 +1,6 @@
-import os, json
-from openai import OpenAI
-
-client = OpenAI(api_key=os.getenv("OPEN_AI_KEY"))
+import json
+from clients import get_openai_client
+from llm_gateway import gateway
 
 def generate_risk_opportunity_signals(clusters: list[dict]) -> list[dict]:
     messages = [
@@ -18,12 +17,12 @@ def generate_risk_opportunity_signals(clusters: list[dict]) -> list[dict]:
         {"role": "user", "content": json.dumps(clusters)}
     ]
 
-    resp = client.chat.completions.create(
+    text = gateway.complete_text(
+        get_openai_client("OPEN_AI_KEY"), "risk_opportunity",
         model="gpt-4.1-nano",
         messages=messages,
         temperature=0.7,
-    )
-    text = resp.choices[0].message.content.strip()
+    ).strip()
 
     # DEBUG: see raw LLM output
     print("[RO advisor] GPT raw output:", text)
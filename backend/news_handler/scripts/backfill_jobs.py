@@ -0,0 +1,206 @@
+# news_handler/scripts/backfill_jobs.py
+# Description: historical backfills (summaries, topics, predictions per week) as queued,
+# resumable jobs drained by job_runner.JobRunner
+#
+# usage: python news_handler/scripts/backfill_jobs.py plan 2024-01-01 2024-06-30 [kinds]
+#        python news_handler/scripts/backfill_jobs.py run [kinds] [workers]
+#        python news_handler/scripts/backfill_jobs.py status
+#        python news_handler/scripts/backfill_jobs.py retry [kind]
+# kinds is a comma-separated subset of summarize,topics,predict (default: all, in that order)
+
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from etl import day_batches, combine, snapshot_results
+from topic_generator.topic_generator import topic_generator
+from job_runner import JobQueue, JobRunner, JOB_MAX_WORKERS
+from llm_gateway import set_default_priority, BATCH
+from clients import load_env
+
+load_env()
+
+# Articles requested per day of a backfilled week
+BACKFILL_DAILY_LIMIT = int(os.getenv("BACKFILL_DAILY_LIMIT", 100))
+BACKFILL_MAX_CLUSTERS = int(os.getenv("BACKFILL_MAX_CLUSTERS", 5))
+# Each kind reads what the one before it wrote, so they run in this order
+KINDS = ("summarize", "topics", "predict")
+
+
+def plan_weeks(start: datetime, end: datetime) -> List[Tuple[str, dict]]:
+    """(item_id, payload) per full week from start to end."""
+    items = []
+    week_start = start
+    while week_start + timedelta(days=6) <= end:
+        item_id = week_start.strftime("%Y-%m-%d")
+        items.append((item_id, {"week_start": item_id}))
+        week_start += timedelta(days=7)
+    return items
+
+
+def summarize_week(payload: dict) -> dict:
+    """Fetch, cluster and summarize one week; module level so process pools can run it."""
+    week_start = datetime.strptime(payload["week_start"], "%Y-%m-%d")
+    days = [week_start + timedelta(days=d) for d in range(7)]
+    # A day missing its feed (rate limit, error notice) raises, so the week is retried
+    batches = list(day_batches(days, limit=BACKFILL_DAILY_LIMIT))
+    news_list, embeddings = combine(batches, per_day=BACKFILL_DAILY_LIMIT)
+    result = snapshot_results(news_list, embeddings, max_clusters=BACKFILL_MAX_CLUSTERS)
+    return {
+        "week_start": payload["week_start"],
+        "week_end": (week_start + timedelta(days=6)).strftime("%Y-%m-%d"),
+        "results": result
+    }
+
+
+def ensure_backfill_indexes(db) -> None:
+    """
+    Unique week_start indexes on the backfill collections, so a week is stored once
+    however often it is written. Duplicates left by earlier insert_one backfills are
+    dropped first, keeping the newest.
+    """
+    from pymongo.errors import OperationFailure
+    for name in ("news", "predictions"):
+        collection = db[name]
+        try:
+            collection.create_index("week_start", unique=True)
+        except OperationFailure:
+            duplicates = collection.aggregate([
+                {"$sort": {"_id": 1}},
+                {"$group": {"_id": "$week_start", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+                {"$match": {"count": {"$gt": 1}}},
+            ])
+            for group in duplicates:
+                collection.delete_many({"_id": {"$in": group["ids"][:-1]}})
+            collection.create_index("week_start", unique=True)
+
+
+class BackfillJobs:
+    """
+    Job handlers and bulk sinks for the weekly backfill.
+
+    summarize writes one document per week to the `news` collection, topics fills in
+    missing topics of those documents, predict stores the predicted events of each
+    week in `predictions`. Sinks upsert, so a job redone after a crash overwrites
+    its earlier result instead of duplicating it.
+    """
+
+    def __init__(self, db, predictor=None):
+        self.db = db
+        self._predictor = predictor
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            from event_prediction.event_predictor import EventPredictor
+            self._predictor = EventPredictor()
+        return self._predictor
+
+    def handlers(self):
+        return {"summarize": summarize_week, "topics": self.topics, "predict": self.predict}
+
+    def sinks(self):
+        return {"summarize": self.write_weeks, "topics": self.write_topics, "predict": self.write_predictions}
+
+    def _week(self, week_start: str) -> dict:
+        doc = self.db["news"].find_one({"week_start": week_start}, projection={"_id": 0})
+        if doc is None:
+            raise LookupError(f"Week {week_start} has not been summarized")
+        return doc
+
+    # Handlers: payload -> result, run concurrently on the runner's pool
+
+    def topics(self, payload: dict) -> dict:
+        doc = self._week(payload["week_start"])
+        topics = {}
+        for result in doc["results"]:
+            event = result["Event"]
+            if event.get("summary") and event.get("topic") in (None, "", "General"):
+                topics[event["event_id"]] = topic_generator(event["summary"])["topic"]
+        return {"week_start": payload["week_start"], "topics": topics}
+
+    def predict(self, payload: dict) -> dict:
+        from event_prediction.event_predictor import NewsEvent, News
+        doc = self._week(payload["week_start"])
+        events = [
+            NewsEvent(
+                event_id=idx + 1,
+                event_content=result["Event"]["summary"],
+                news_list=[News(title=news["title"], news_content=news.get("summary") or "",
+                                post_time=news.get("post_time"))
+                           for news in result["Event"].get("news_list", [])]
+            )
+            for idx, result in enumerate(doc["results"]) if result["Event"].get("summary")
+        ]
+        if not events:
+            return {"week_start": payload["week_start"], "predictions": [], "prompt": None}
+        metadata = {}
+        predictions = self.predictor.predict_events(events, num_predictions=3, metadata=metadata)
+        return {
+            "week_start": payload["week_start"],
+            "predictions": [prediction.model_dump() for prediction in predictions.predictions],
+            "prompt": metadata.get("prompt")
+        }
+
+    # Sinks: one bulk write per flushed batch of (item_id, payload, result)
+
+    def write_weeks(self, batch: List[Tuple[str, dict, Any]]) -> None:
+        from pymongo import ReplaceOne
+        now = datetime.now()
+        self.db["news"].bulk_write([
+            ReplaceOne({"week_start": result["week_start"]}, dict(result, created_at=now), upsert=True)
+            for _, _, result in batch
+        ], ordered=False)
+
+    def write_topics(self, batch: List[Tuple[str, dict, Any]]) -> None:
+        from pymongo import UpdateOne
+        updates = [
+            UpdateOne({"week_start": result["week_start"], "results.Event.event_id": event_id},
+                      {"$set": {"results.$.Event.topic": topic}})
+            for _, _, result in batch for event_id, topic in result["topics"].items()
+        ]
+        if updates:
+            self.db["news"].bulk_write(updates, ordered=False)
+
+    def write_predictions(self, batch: List[Tuple[str, dict, Any]]) -> None:
+        from pymongo import ReplaceOne
+        now = datetime.now()
+        self.db["predictions"].bulk_write([
+            ReplaceOne({"week_start": result["week_start"]}, dict(result, created_at=now), upsert=True)
+            for _, _, result in batch
+        ], ordered=False)
+
+
+def _kinds(arg: str = None) -> List[str]:
+    kinds = arg.split(",") if arg else list(KINDS)
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise SystemExit(f"Unknown job kinds: {', '.join(sorted(unknown))}")
+    return [kind for kind in KINDS if kind in kinds]
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    queue = JobQueue()
+    if command == "plan":
+        start, end = (datetime.strptime(arg, "%Y-%m-%d") for arg in sys.argv[2:4])
+        weeks = plan_weeks(start, end)
+        for kind in _kinds(sys.argv[4] if len(sys.argv) > 4 else None):
+            print(f"{kind}: {queue.enqueue(kind, weeks)} new of {len(weeks)} weeks")
+    elif command == "run":
+        from pymongo import MongoClient
+        # Backfill LLM calls yield to interactive requests in the same process
+        set_default_priority(BATCH)
+        db = MongoClient(os.getenv("MONGO_URI"))[os.getenv("MONGO_DB_NAME", "stock-news")]
+        ensure_backfill_indexes(db)
+        jobs = BackfillJobs(db)
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else JOB_MAX_WORKERS
+        runner = JobRunner(queue, jobs.handlers(), jobs.sinks(), max_workers=workers)
+        for kind in _kinds(sys.argv[2] if len(sys.argv) > 2 else None):
+            runner.run(kind)
+    elif command == "retry":
+        print(f"{queue.retry_failed(sys.argv[2] if len(sys.argv) > 2 else None)} failed jobs queued again")
+    print(queue.stats())
@@ -1,8 +1,13 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import requests
-from news_query import cluster, get_summary, data_to_news, hash_event_label
+from etl import run_rollups, new_stats
+from snapshot_store import ensure_snapshot_indexes
+from news_handler.alpha_vantage import set_rate_share
+from news_handler.embedding_store import reset_embedding_stores
+from llm_gateway import set_default_priority, set_limit_share, BATCH
+from job_runner import JobQueue, JobRunner
+from backfill_jobs import BackfillJobs, plan_weeks, summarize_week, ensure_backfill_indexes
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
@@ -17,197 +22,78 @@ day_collection = db["day"]
 week_collection = db["week"]
 month_collection = db["month"]
 
-alpha_vantage_api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
+# Weeks backfilled at once, each in its own process (clustering is CPU bound)
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", 4))
 
-def inject_to_db():
-    start_date = datetime(2023, 1, 1)
-    end_date = datetime.now()
-    current_start = start_date
-    
-    while current_start < end_date -timedelta(days=6):
-        day = current_start
-        end_day = (day + timedelta(days = 1)).strftime("%Y%m%dT%H%M")
-        start_day = day.strftime("%Y%m%dT%H%M")
-        url = f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&time_from={start_day}&time_to={end_day}&limit=1000&apikey={alpha_vantage_api_key}'
-        r = requests.get(url)
-        data = r.json()
-        news_list = data_to_news(data)
-        if not news_list:
-            current_start += timedelta(days=7)
-            continue
-        labels = cluster(news_list)
-        events = get_summary(hash_event_label(labels, news_list), max_words=150)
-        total_news = len(news_list)
-        result = []
-        for event in events.values():
-            percentage = int(100 * len(event.news_list) / total_news)
-            result.append({
-                "Percentage": percentage,
-                "Event": {
-                    "event_id": event.event_id,
-                    "summary": event.summary,
-                    "news_list": [vars(news) for news in event.news_list]
-                }
-            })
-        news_collection.insert_one({
-            "week_start": current_start.strftime("%Y-%m-%d"),
-            "week_end": (current_start + timedelta(days=6)).strftime("%Y-%m-%d"),
-            "results": result
-        })
-        current_start += timedelta(days=7)
+def _init_backfill_worker(workers):
+    # Open the embedding store afresh; the file lock keeps the shared directory consistent
+    reset_embedding_stores()
+    # The worker processes share one Alpha Vantage quota (LLM limits are shared already
+    # unless LLM_SHARED_LIMITS=0)
+    set_default_priority(BATCH)
+    set_rate_share(1 / workers)
+    set_limit_share(1 / workers)
+
+def inject_to_db(start_date=datetime(2023, 1, 1), end_date=None, workers=BACKFILL_WORKERS):
+    """
+    Backfill one `news` document per week from start_date to end_date (default: now).
+
+    Weeks are checkpointed in the job queue (job_runner.py): a rerun after a crash only
+    processes the weeks not yet written. Weeks run in parallel worker processes and
+    are written with bulk upserts onto a unique week_start index, so repeating a
+    week replaces it. Progress and weeks per minute are printed as batches land.
+    """
+    end_date = end_date or datetime.now()
+    ensure_backfill_indexes(db)
+    queue = JobQueue()
+    queue.enqueue("summarize", plan_weeks(start_date, end_date))
+    runner = JobRunner(queue, {"summarize": summarize_week}, {"summarize": BackfillJobs(db).write_weeks},
+                       max_workers=workers, processes=True,
+                       initializer=_init_backfill_worker, initargs=(workers,))
+    counts = runner.run("summarize")
+    print(f"Backfilled {counts['done']} weeks in {counts['elapsed_s']}s "
+          f"({counts['per_minute']} weeks per minute), {counts['failed']} failed")
+    return counts
         
 def test_inject_to_db_small_range():
     # Test with just one week (last 7 days)
-    start_date = datetime.now() - timedelta(days=7)
-    end_date = datetime.now()
-    current_start = start_date
-
-    while current_start < end_date- timedelta(days=6):
-        day = current_start
-        end_day = (day + timedelta(days = 1)).strftime("%Y%m%dT%H%M")
-        start_day = day.strftime("%Y%m%dT%H%M")
-        url = f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&time_from={start_day}&time_to={end_day}&limit=1000&apikey={alpha_vantage_api_key}'
-        r = requests.get(url)
-        data = r.json()
-        news_list = data_to_news(data)
-        if not news_list:
-            current_start += timedelta(days=7)
-            continue
-        labels = cluster(news_list)
-        events = get_summary(hash_event_label(labels, news_list), max_words=150)
-        total_news = len(news_list)
-        result = []
-        for event in events.values():
-            percentage = int(100 * len(event.news_list) / total_news)
-            result.append({
-                "Percentage": percentage,
-                "Event": {
-                    "event_id": event.event_id,
-                    "summary": event.summary,
-                    "news_list": [vars(news) for news in event.news_list]
-                }
-            })
-        news_collection.insert_one({
-            "week_start": current_start.strftime("%Y-%m-%d"),
-            "week_end": (current_start + timedelta(days=6)).strftime("%Y-%m-%d"),
-            "results": result
-        })
-        current_start += timedelta(days=7)
+    return inject_to_db(start_date=datetime.now() - timedelta(days=7), workers=1)
         
+def inject_snapshots(periods=("day", "week", "month"), end_day=None):
+    """
+    Write the latest day / week / month snapshots in one ETL run (etl.py).
+
+    Each day is fetched and embedded once for all three rollups, and days an earlier
+    run already stored are read from the ETL cache, so a nightly run only fetches the
+    day that just ended. A snapshot replaces an earlier one for the same range.
+    """
+    stats = new_stats()
+    for period, document in run_rollups(end_day=end_day, periods=periods, stats=stats):
+        start_field, end_field = f"{period}_start", f"{period}_end"
+        db[period].replace_one({start_field: document[start_field], end_field: document[end_field]},
+                               document, upsert=True)
+        print(f"Wrote {period} snapshot {document[start_field]} - {document[end_field]} "
+              f"({len(document['results'])} events)")
+    print(f"ETL: {stats['days_fetched']} days fetched, {stats['days_cached']} from cache, "
+          f"{stats['articles_embedded']} articles embedded, {stats['duplicates']} duplicates collapsed")
+    return stats
+
 def inject_to_db_day():
-    day = datetime.now()
-    start_day = (day - timedelta(days = 1)).strftime("%Y%m%dT%H%M")
-    end_day = day.strftime("%Y%m%dT%H%M")
-    url = f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&time_from={start_day}&time_to={end_day}&limit=1000&apikey={alpha_vantage_api_key}'
-    r = requests.get(url)
-    data = r.json()
-    news_list = data_to_news(data)
-    if not news_list:
-        return 
-    labels = cluster(news_list)
-    events = get_summary(hash_event_label(labels, news_list), max_words=150)
-    total_news = len(news_list)
-    result = []
-    for event in events.values():
-        percentage = int(100 * len(event.news_list) / total_news)
-        result.append({
-            "Percentage": percentage,
-            "Event": {
-                "event_id": event.event_id,
-                "summary": event.summary,
-                "news_list": [vars(news) for news in event.news_list]
-            }
-        })
-    day_collection.insert_one({
-        "day_start": (day - timedelta(days=1)).strftime("%Y-%m-%d"),
-        "day_end": day.strftime("%Y-%m-%d"),
-        "results": result
-    })
-    
+    return inject_snapshots(periods=("day",))
+
 def inject_to_db_week():
-    day = datetime.now()
-    end_day = day.strftime("%Y%m%dT%H%M")
-    week_news = []
-    
-    for day_offset in range(7):
-        current_day = day - timedelta(days = day_offset)
-        start_day = current_day.strftime("%Y%m%dT%H%M")
-        end_current = (current_day + timedelta(days = 1)).strftime("%Y%m%dT%H%M")
-        url = f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&time_from={start_day}&time_to={end_day}&limit=1000&apikey={alpha_vantage_api_key}'
-        r = requests.get(url)
-        data = r.json()
-        news_list = data_to_news(data)
-        if news_list:
-            week_news.extend(news_list)
-    
-    if not week_news:
-        return
-    
-    labels = cluster(week_news, max_clusters=10)
-    events = get_summary(hash_event_label(labels, week_news), max_words=150)
-    total_news = len(week_news)
-    result = []
-    for event in events.values():
-        percentage = int(100 * len(event.news_list) / total_news)
-        result.append({
-            "Percentage": percentage,
-            "Event": {
-                "event_id": event.event_id,
-                "summary": event.summary,
-                "news_list": [vars(news) for news in event.news_list]
-            }
-        })
-    week_collection.insert_one({
-        "week_start": (day - timedelta(days=6)).strftime("%Y-%m-%d"),
-        "week_end": day.strftime("%Y-%m-%d"),
-        "results": result
-    })
-    
+    return inject_snapshots(periods=("week",))
+
 def inject_to_db_month():
-    day = datetime.now()
-    end_day = day.strftime("%Y%m%dT%H%M")
-    month_news = []
-    
-    for day_offset in range(30):
-        current_day = day - timedelta(days = day_offset)
-        start_day = current_day.strftime("%Y%m%dT%H%M")
-        end_current = (current_day + timedelta(days = 1)).strftime("%Y%m%dT%H%M")
-        url = f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&time_from={start_day}&time_to={end_day}&limit=50&apikey={alpha_vantage_api_key}'
-        r = requests.get(url)
-        data = r.json()
-        news_list = data_to_news(data)
-        if news_list:
-           month_news.extend(news_list)
-    
-    if not month_news:
-        return
-    
-    labels = cluster(month_news)
-    events = get_summary(hash_event_label(labels, month_news), max_words=150)
-    total_news = len(month_news)
-    result = []
-    for event in events.values():
-        percentage = int(100 * len(event.news_list) / total_news)
-        result.append({
-            "Percentage": percentage,
-            "Event": {
-                "event_id": event.event_id,
-                "summary": event.summary,
-                "news_list": [vars(news) for news in event.news_list]
-            }
-        })
-    month_collection.insert_one({
-        "month_start": (day - timedelta(days=30)).strftime("%Y-%m-%d"),
-        "month_end": day.strftime("%Y-%m-%d"),
-        "results": result
-    })
+    return inject_snapshots(periods=("month",))
     
     
 if __name__ == "__main__":
     # inject_to_db()
     # test_inject_to_db_small_range()
-    inject_to_db_day()
-    inject_to_db_week()
-    inject_to_db_month()
+    # Backfill LLM calls yield to interactive requests in the same process
+    set_default_priority(BATCH)
+    ensure_snapshot_indexes(db)
+    inject_snapshots()
     
     
\ No newline at end of file
@@ -0,0 +1,142 @@
+# news_handler/snapshot_store.py
+# Description: read path for the precomputed day/week/month snapshots written by scripts/inject_to_db.py
+
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Optional
+
+from clients import load_env
+
+try:
+    from .logger import info, warning
+except ImportError:
+    from news_handler.logger import info, warning
+
+load_env()
+
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "stock-news")
+# pymongo.DESCENDING; pymongo itself is only imported when a connection is made
+DESCENDING = -1
+# The inject jobs run nightly, so a snapshot a little over a day old is still current
+SNAPSHOT_MAX_AGE_HOURS = float(os.getenv("SNAPSHOT_MAX_AGE_HOURS", 26))
+SNAPSHOTS_ENABLED = os.getenv("NEWS_SNAPSHOTS", "1") != "0"
+# After a failed lookup Mongo is skipped for this long, instead of every request
+# waiting out the server selection timeout again
+SNAPSHOT_RETRY_SECONDS = float(os.getenv("SNAPSHOT_RETRY_SECONDS", 60))
+
+# time period -> field holding the start of the snapshot's window
+PERIOD_START_FIELDS = {
+    "day": "day_start",
+    "week": "week_start",
+    "month": "month_start",
+}
+
+_db = None
+_db_lock = threading.Lock()
+_retry_at = 0.0
+_indexed = set()
+
+
+def _get_db():
+    """
+    Lazily connect to Mongo; returns None when no MONGO_URI is configured or while
+    Mongo is skipped after a failure (see _connection_failed).
+    """
+    global _db
+    if not MONGO_URI:
+        return None
+    with _db_lock:
+        if time.monotonic() < _retry_at:
+            return None
+        if _db is None:
+            from pymongo import MongoClient
+            _db = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)[MONGO_DB_NAME]
+        return _db
+
+
+def _connection_failed(db) -> None:
+    """Skip Mongo for SNAPSHOT_RETRY_SECONDS; the next attempt opens a new connection."""
+    global _db, _retry_at
+    with _db_lock:
+        _retry_at = time.monotonic() + SNAPSHOT_RETRY_SECONDS
+        if db is not None and _db is db:
+            _db.client.close()
+            _db = None
+        _indexed.discard(id(db))
+
+
+def ensure_snapshot_indexes(db) -> None:
+    """Index every snapshot collection on (period start, created_at), newest first; once per connection."""
+    if id(db) in _indexed:
+        return
+    for period, start_field in PERIOD_START_FIELDS.items():
+        db[period].create_index([(start_field, DESCENDING), ("created_at", DESCENDING)])
+    _indexed.add(id(db))
+
+
+def _snapshot_time(doc: dict, period: str) -> Optional[datetime]:
+    """When the snapshot was produced: created_at, or the end of its window for older documents."""
+    if isinstance(doc.get("created_at"), datetime):
+        return doc["created_at"]
+    end = doc.get(f"{period}_end")
+    try:
+        return datetime.strptime(end, "%Y-%m-%d") if end else None
+    except ValueError:
+        return None
+
+
+def _normalize_result(result: dict) -> dict:
+    """Give a stored result the same shape real_time_query() returns."""
+    event = dict(result.get("Event", {}))
+    event.setdefault("topic", "General")
+    event.setdefault("risk", None)
+    event.setdefault("opportunity", None)
+    event.setdefault("rationale", None)
+    event.setdefault("news_list", [])
+    return {"Percentage": result.get("Percentage", 0), "Event": event}
+
+
+def get_latest_snapshot(time_period: str, max_age_hours: float = SNAPSHOT_MAX_AGE_HOURS, db=None) -> Optional[list]:
+    """
+    Latest snapshot results for a time period, in real_time_query() format.
+
+    Returns None when snapshots are disabled or unreachable, when none exists for the
+    period, or when the newest one is older than max_age_hours. A failed lookup on
+    the shared connection skips Mongo for SNAPSHOT_RETRY_SECONDS.
+    """
+    if not SNAPSHOTS_ENABLED or time_period not in PERIOD_START_FIELDS:
+        return None
+    shared = db is None
+    try:
+        db = _get_db() if shared else db
+        if db is None:
+            return None
+        ensure_snapshot_indexes(db)
+        start_field = PERIOD_START_FIELDS[time_period]
+        doc = db[time_period].find_one(
+            {},
+            sort=[(start_field, DESCENDING), ("created_at", DESCENDING)],
+            projection={"_id": 0}
+        )
+    except Exception as e:
+        if shared:
+            _connection_failed(db)
+            warning(f"Snapshot lookup for {time_period} failed: {e}; skipping Mongo for {SNAPSHOT_RETRY_SECONDS:.0f}s")
+        else:
+            warning(f"Snapshot lookup for {time_period} failed: {e}")
+        return None
+
+    if not doc or not doc.get("results"):
+        info(f"No {time_period} snapshot available")
+        return None
+    produced_at = _snapshot_time(doc, time_period)
+    age_hours = (datetime.now() - produced_at).total_seconds() / 3600 if produced_at else None
+    if age_hours is None or age_hours > max_age_hours:
+        info(f"Latest {time_period} snapshot is too old ({age_hours} h), ignoring it")
+        return None
+
+    info(f"Serving {time_period} news from snapshot {doc.get(start_field)} ({age_hours:.1f} h old)")
+    return [_normalize_result(result) for result in doc["results"]]
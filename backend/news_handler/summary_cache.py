@@ -0,0 +1,104 @@
+# news_handler/summary_cache.py
+# Description: memoized cluster summaries keyed by cluster membership
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 512))
+SUMMARY_CACHE_TTL_HOURS = float(os.getenv("SUMMARY_CACHE_TTL_HOURS", 6))
+# Jaccard similarity of memberships above which a cached summary is reused as is;
+# set to 1 to only reuse exact matches
+SUMMARY_CACHE_NEAR_MATCH = float(os.getenv("SUMMARY_CACHE_NEAR_MATCH", 0.8))
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE", "1") != "0"
+
+
+def membership_key(members: Iterable[str], max_words: int, model: str) -> str:
+    """Stable digest of a cluster's sorted members, the word limit and the model."""
+    payload = "\n".join(sorted(set(members))) + f"\0{max_words}\0{model}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    LRU + TTL cache of cluster analyses (summary, topic, risk, ...).
+
+    Entries are keyed by membership_key(); a lookup that misses the exact key falls
+    back to the cached cluster (same max_words and model) whose membership overlaps
+    the requested one the most, if the Jaccard similarity reaches near_match.
+    """
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = SUMMARY_CACHE_TTL_HOURS * 3600,
+                 near_match: float = SUMMARY_CACHE_NEAR_MATCH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.near_match = near_match
+        self._entries = OrderedDict()  # key -> (members, max_words, model, fields, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def get(self, members: Iterable[str], max_words: int, model: str) -> Optional[Dict]:
+        members = frozenset(members)
+        key = membership_key(members, max_words, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[4]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[3])
+
+            best_key, best_similarity = None, 0.0
+            if self.near_match < 1:
+                for other_key, (other, other_words, other_model, _, stored_at) in self._entries.items():
+                    if other_words != max_words or other_model != model or self._expired(stored_at):
+                        continue
+                    similarity = len(members & other) / len(members | other)
+                    if similarity > best_similarity:
+                        best_key, best_similarity = other_key, similarity
+            if best_key is not None and best_similarity >= self.near_match:
+                self._entries.move_to_end(best_key)
+                self.near_hits += 1
+                return dict(self._entries[best_key][3])
+
+            self.misses += 1
+            return None
+
+    def put(self, members: Iterable[str], max_words: int, model: str, fields: Dict) -> None:
+        members = frozenset(members)
+        key = membership_key(members, max_words, model)
+        with self._lock:
+            self._entries[key] = (members, max_words, model, dict(fields), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+summary_cache = SummaryCache() if SUMMARY_CACHE_ENABLED else None
+
+
+def summary_cache_stats() -> dict:
+    return summary_cache.stats() if summary_cache is not None else {"enabled": False}
@@ -0,0 +1,202 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add the backend directory to the Python path so app and news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import app
+from single_flight import SingleFlight
+from background_refresh import BackgroundRefresher
+
+EVENTS = [{"event_id": 1, "event_content": "Chipmakers rally", "impact": 100}]
+PREDICTIONS = [{"content": "Semis extend gains", "confidence_score": 0.7}]
+RESPONSE = {"events": EVENTS, "predictions": PREDICTIONS, "advice": "Trim", "riskOpportunitySignals": [],
+            "metadata": {"stage_timings_ms": {"total": 1.0}}}
+
+
+class TestApp(unittest.TestCase):
+    """Flask routes with the prediction pipeline and the disk cache replaced by stubs."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # key -> (data, age in minutes); tests age entries by rewriting them
+        self.cache = {}
+        self.refresher = BackgroundRefresher(max_workers=1)
+        self.addCleanup(self.refresher._pool.shutdown)
+        for target, replacement in (
+            ("single_flight", SingleFlight(directory.name)),
+            ("refresher", self.refresher),
+            ("get_cache_entry", lambda data_source, cache_key: self.cache.get(f"{data_source}_{cache_key}", (None, None))),
+            ("get_cached_data", self.get_cached_data),
+            ("set_cached_data", lambda data_source, cache_key, data: self.cache.__setitem__(f"{data_source}_{cache_key}", (data, 0.0))),
+        ):
+            patcher = patch.object(app, target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = app.app.test_client()
+
+    def get_cached_data(self, data_source, cache_key, max_age_minutes=app.CACHE_SOFT_TTL_MINUTES):
+        data, age = self.cache.get(f"{data_source}_{cache_key}", (None, None))
+        return data if data and age < max_age_minutes else None
+
+    def test_fresh_entry_is_served_without_computing(self):
+        self.cache["market_week_5"] = ("cached", app.CACHE_SOFT_TTL_MINUTES / 2)
+
+        self.assertEqual(app.get_or_compute_cached("market", "week_5", lambda: self.fail("recomputed")), "cached")
+        self.assertEqual(self.refresher.stats()["scheduled"], 0)
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        stale_age = (app.CACHE_SOFT_TTL_MINUTES + app.CACHE_HARD_TTL_MINUTES) / 2
+        self.cache["market_week_5"] = ("stale", stale_age)
+        release, computations = threading.Event(), []
+
+        def compute():
+            computations.append("fresh")
+            release.wait(timeout=10)
+            return "fresh"
+
+        # A burst of requests all get the stale entry and queue a single refresh
+        served = [app.get_or_compute_cached("market", "week_5", compute) for _ in range(5)]
+        release.set()
+        self.refresher._pool.shutdown(wait=True)
+
+        self.assertEqual(served, ["stale"] * 5)
+        self.assertEqual(computations, ["fresh"])
+        self.assertEqual(self.refresher.stats()["scheduled"], 1)
+        self.assertEqual(self.cache["market_week_5"], ("fresh", 0.0))
+
+    def test_expired_entry_is_computed_synchronously(self):
+        self.cache["market_week_5"] = ("expired", app.CACHE_HARD_TTL_MINUTES + 1)
+
+        self.assertEqual(app.get_or_compute_cached("market", "week_5", lambda: "fresh"), "fresh")
+        self.assertEqual(self.cache["market_week_5"], ("fresh", 0.0))
+        self.assertEqual(self.refresher.stats()["scheduled"], 0)
+
+    def stub_pipeline_stages(self, news=("article",)):
+        """Replace news fetching, the predictor and the advisors behind run_prediction_pipeline."""
+        predictor = SimpleNamespace(predict_events=lambda events, num_predictions, metadata: SimpleNamespace(
+            predictions=PREDICTIONS))
+        for target, replacement in (
+            ("real_time_query", lambda time_range, metadata: list(news)),
+            ("format_news_results", lambda news_results: EVENTS),
+            ("build_news_events", lambda news_results: []),
+            ("get_predictor", lambda data_source: predictor),
+            ("format_prediction_for_response", lambda prediction: prediction),
+            ("advice_clusters", lambda news_results: []),
+            ("tactical_advice", lambda clusters: {"advice": "Trim"}),
+            ("risk_opportunity_advice", lambda clusters, events: {"riskOpportunitySignals": []}),
+        ):
+            patcher = patch.object(app, target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_personal_pipeline_reports_every_stage_timing(self):
+        self.stub_pipeline_stages()
+
+        stages = list(app.run_prediction_pipeline("personal", "week", 5))
+
+        self.assertEqual([stage for stage, _ in stages][0], "events")
+        self.assertEqual([stage for stage, _ in stages][-1], "result")
+        self.assertEqual(sorted(stage for stage, _ in stages[1:-1]), ["advice", "predictions"])
+        result = stages[-1][1]
+        self.assertEqual((result["predictions"], result["advice"]), (PREDICTIONS, "Trim"))
+        self.assertEqual(set(result["metadata"]["stage_timings_ms"]),
+                         {"news", "predictions", "advice", "risk_opportunity", "total"})
+
+    def stream(self, data_source, query=""):
+        response = self.client.get(f"/api/{data_source}/predict-from-news/stream?time_period=week&limit=5{query}")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_stream_sends_ndjson_stages_and_caches_the_result(self):
+        self.stub_pipeline_stages()
+
+        response = self.stream("market")
+
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data(as_text=True).split("\n")
+        self.assertEqual(lines[-1], "")
+        messages = [json.loads(line) for line in lines[:-1]]
+        self.assertEqual([message["type"] for message in messages], ["events", "predictions", "done"])
+        self.assertEqual((messages[0]["data"], messages[1]["data"]), (EVENTS, PREDICTIONS))
+        self.assertIn("stage_timings_ms", messages[2]["data"])
+        self.assertEqual(self.cache["market_week_5"][0]["predictions"], PREDICTIONS)
+
+    def test_stream_sends_server_sent_events(self):
+        self.stub_pipeline_stages()
+
+        response = self.stream("personal", "&format=sse")
+
+        self.assertEqual(response.mimetype, "text/event-stream")
+        blocks = response.get_data(as_text=True).split("\n\n")
+        self.assertEqual(blocks[-1], "")
+        stages = []
+        for block in blocks[:-1]:
+            event, data = block.split("\n")
+            self.assertTrue(event.startswith("event: ") and data.startswith("data: "))
+            stages.append(event[len("event: "):])
+            self.assertEqual(json.loads(data[len("data: "):])["type"], stages[-1])
+        self.assertEqual((stages[0], stages[-1]), ("events", "done"))
+        self.assertEqual(sorted(stages[1:-1]), ["advice", "predictions"])
+
+    def test_cached_stream_replays_every_stage_in_order(self):
+        self.cache["personal_week_5"] = (RESPONSE, 0.0)
+
+        with patch.object(app, "run_prediction_pipeline", lambda *args: self.fail("recomputed")):
+            messages = [json.loads(line) for line in self.stream("personal").get_data(as_text=True).splitlines()]
+
+        self.assertEqual([(message["type"], message["data"]) for message in messages], [
+            ("events", EVENTS),
+            ("predictions", PREDICTIONS),
+            ("advice", {"advice": "Trim", "riskOpportunitySignals": []}),
+            ("done", RESPONSE["metadata"]),
+        ])
+
+    def test_stream_reports_missing_news(self):
+        self.stub_pipeline_stages(news=())
+
+        messages = [json.loads(line) for line in self.stream("market").get_data(as_text=True).splitlines()]
+
+        self.assertEqual(messages, [{"type": "error", "data": {"error": "No news events found"}}])
+        self.assertNotIn("market_week_5", self.cache)
+
+    def test_stream_leader_disconnect_still_serves_waiting_requests(self):
+        def pipeline(data_source, time_period, limit):
+            yield "events", EVENTS
+            yield "predictions", PREDICTIONS
+            yield "result", RESPONSE
+
+        followers = {}
+
+        def follow():
+            followers["value"] = app.compute_cached("market", "week_5", lambda: self.fail("recomputed"))
+
+        with patch.object(app, "run_prediction_pipeline", pipeline):
+            response = self.client.get("/api/market/predict-from-news/stream?time_period=week&limit=5",
+                                       buffered=False)
+            chunks = iter(response.response)
+            self.assertIn(b'"type": "events"', next(chunks))
+            follower = threading.Thread(target=follow)
+            follower.start()
+            for _ in range(1000):
+                if app.single_flight.stats()["saved_requests"]:
+                    break
+                time.sleep(0.01)
+            # The client goes away after the first message
+            response.close()
+            follower.join(timeout=10)
+
+        self.assertEqual(followers["value"], RESPONSE)
+        self.assertEqual(self.cache["market_week_5"][0], RESPONSE)
+        self.assertEqual(app.single_flight.stats()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
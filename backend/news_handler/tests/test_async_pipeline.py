@@ -0,0 +1,91 @@
+import asyncio
+import subprocess
+import threading
+import unittest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BACKEND_DIR)
+import news_query
+from embeddings import embed_texts_async
+from summary_cache import SummaryCache
+from news import News, Event
+
+
+class FakeAsyncEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, input, model):
+        self.calls += 1
+        await asyncio.sleep(0)
+        # Answer out of order; the caller must place vectors by index
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+class TestAsyncPipeline(unittest.TestCase):
+    def test_embed_texts_async_keeps_input_order(self):
+        client = SimpleNamespace(embeddings=FakeAsyncEmbeddings())
+        texts = ["a" * n for n in range(1, 8)]
+
+        vectors = asyncio.run(embed_texts_async(client, texts, batch_size=3, max_concurrency=2))
+
+        self.assertEqual(vectors, [[float(n)] for n in range(1, 8)])
+        self.assertEqual(client.embeddings.calls, 3)
+
+    def test_get_summary_async_combined(self):
+        events = {
+            label: Event(event_id=str(label), summary="",
+                         news_list=[News("20240101T1200", f"t{label}", f"http://example.com/{label}", "s")])
+            for label in range(2)
+        }
+        analyses = [{"summary": f"Summary {i}", "topic": f"Topic {i}", "risk": 3, "opportunity": 7,
+                     "rationale": "r"} for i in range(2)]
+        cache = SummaryCache()
+
+        with patch.object(news_query, "analyze_news_clusters_async", AsyncMock(return_value=analyses)) as analyze:
+            asyncio.run(news_query.get_summary_async(events, mode="combined", cache=cache))
+            # A second pass over the same clusters is answered from the summary cache
+            asyncio.run(news_query.get_summary_async(events, mode="combined", cache=cache))
+
+        self.assertEqual(analyze.await_count, 1)
+        self.assertEqual([e.topic for e in events.values()], ["Topic 0", "Topic 1"])
+        self.assertEqual(events[1].summary, "Summary 1")
+
+    def test_async_server_does_not_import_the_flask_app(self):
+        # app.py starts the pre-warm thread and builds the Flask app on import
+        result = subprocess.run([sys.executable, "-c", "import sys, async_app; print('app' in sys.modules)"],
+                                cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "False")
+
+    def test_async_cache_reads_and_writes_off_the_event_loop(self):
+        import async_app
+        threads = []
+
+        def get_cache_entry(data_source, cache_key):
+            threads.append(threading.current_thread())
+            return None, None
+
+        def set_cached_data(data_source, cache_key, data):
+            threads.append(threading.current_thread())
+
+        async def compute():
+            return {"events": []}
+
+        with patch.object(async_app, "get_cache_entry", get_cache_entry), \
+                patch.object(async_app, "set_cached_data", set_cached_data):
+            data = asyncio.run(async_app.AsyncCache().get_or_compute("general", "news_day_5", compute))
+
+        self.assertEqual(data, {"events": []})
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import threading
+import unittest
+import sys
+import os
+
+# Add the backend directory to the Python path so background_refresh resolves
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from background_refresh import BackgroundRefresher
+
+
+class TestBackgroundRefresher(unittest.TestCase):
+    def setUp(self):
+        self.refresher = BackgroundRefresher(max_workers=2)
+        self.addCleanup(self.refresher._pool.shutdown)
+
+    def test_one_pending_refresh_per_key(self):
+        release, calls = threading.Event(), []
+
+        def refresh():
+            calls.append("k")
+            release.wait(timeout=10)
+
+        queued = [self.refresher.schedule("k", refresh) for _ in range(5)]
+        self.assertEqual(queued, [True, False, False, False, False])
+        # Other keys are not held back
+        self.assertTrue(self.refresher.schedule("other", lambda: None))
+        release.set()
+        self.refresher._pool.shutdown(wait=True)
+
+        self.assertEqual(calls, ["k"])
+        self.assertEqual(self.refresher.stats(), {"scheduled": 2, "completed": 2, "failed": 0, "pending": 0})
+
+    def test_key_can_be_refreshed_again_after_a_failure(self):
+        done = threading.Event()
+
+        def fail():
+            raise RuntimeError("upstream down")
+
+        self.assertTrue(self.refresher.schedule("k", fail))
+        for _ in range(1000):
+            if not self.refresher.stats()["pending"]:
+                break
+            done.wait(0.01)
+        self.assertTrue(self.refresher.schedule("k", done.set))
+        self.assertTrue(done.wait(timeout=10))
+
+        self.assertEqual(self.refresher.stats()["failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
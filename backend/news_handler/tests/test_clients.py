@@ -0,0 +1,33 @@
+import asyncio
+import gc
+import unittest
+import sys
+import os
+
+# Add the backend directory to the Python path so clients resolves
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import clients
+
+
+class TestAsyncClients(unittest.TestCase):
+    async def get_twice(self):
+        first = clients.get_async_openai_client(api_key="test-key")
+        second = clients.get_async_openai_client(api_key="test-key")
+        return first, second, clients.client_stats()["async_openai_clients"]
+
+    def test_one_client_per_loop_and_closed_loops_are_dropped(self):
+        seen = []
+        for _ in range(5):
+            first, second, count = asyncio.run(self.get_twice())
+            self.assertIs(first, second)
+            # Only the running loop's client is cached; earlier loops are closed
+            self.assertEqual(count, 1)
+            seen.append(first)
+
+        self.assertEqual(len({id(client) for client in seen}), 5)
+        gc.collect()
+        self.assertEqual(clients.client_stats()["async_openai_clients"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
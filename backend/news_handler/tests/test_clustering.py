@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from clustering import BACKENDS, choose_backend, cluster_embeddings, as_matrix, silhouette_scores, select_n_clusters
+
+
+def make_blobs(per_cluster=60, n_clusters=3, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)) * 5
+    X = np.vstack([center + rng.normal(size=(per_cluster, dim)) for center in centers])
+    truth = np.repeat(np.arange(n_clusters), per_cluster)
+    return X.tolist(), truth
+
+
+class TestClustering(unittest.TestCase):
+    def test_every_backend_recovers_separated_topics(self):
+        X, truth = make_blobs()
+        for backend in BACKENDS:
+            labels = cluster_embeddings(X, n_clusters=3, backend=backend)
+            # Same partition up to renaming: each true cluster maps to exactly one label
+            pairs = set(zip(truth.tolist(), labels.tolist()))
+            self.assertEqual(len(pairs), 3, backend)
+
+    def test_backend_chosen_by_size(self):
+        self.assertEqual(choose_backend(200), "agglomerative")
+        self.assertEqual(choose_backend(10_000), "minibatch_kmeans")
+        self.assertEqual(choose_backend(200_000), "minibatch_kmeans")
+        self.assertEqual(choose_backend(200, backend="knn_graph"), "knn_graph")
+        with self.assertRaises(ValueError):
+            choose_backend(200, backend="dbscan")
+
+    def test_small_inputs_and_contiguous_float32(self):
+        self.assertEqual(len(cluster_embeddings([], n_clusters=5)), 0)
+        self.assertEqual(cluster_embeddings([[1.0, 0.0]], n_clusters=5).tolist(), [0])
+        X = np.ones((4, 3), dtype=np.float32)
+        self.assertIs(as_matrix(X), X)
+        self.assertTrue(as_matrix(np.ones((3, 4))[:, ::2]).flags["C_CONTIGUOUS"])
+
+    def test_silhouette_matches_sklearn(self):
+        from sklearn.metrics import silhouette_score
+        X, truth = make_blobs(per_cluster=20)
+        X = np.asarray(X)
+        noisy = truth.copy()
+        noisy[::7] = (noisy[::7] + 1) % 3
+        ours = silhouette_scores(X, [truth, noisy])
+        for labels, score in zip([truth, noisy], ours):
+            self.assertAlmostEqual(score, silhouette_score(X, labels, metric="cosine"), places=4)
+
+    def test_silhouette_selection_finds_topic_count(self):
+        X, _ = make_blobs(per_cluster=40, n_clusters=4)
+        k, details = select_n_clusters(X, max_clusters=8, sample_size=100)
+        self.assertEqual(k, 4)
+        self.assertEqual(details["sample_size"], 100)
+        self.assertEqual(details["candidates"], list(range(2, 9)))
+
+        metadata = {}
+        labels = cluster_embeddings(X, n_clusters=8, k_selection="silhouette", metadata=metadata)
+        self.assertEqual(len(set(labels.tolist())), 4)
+        self.assertEqual(metadata["n_clusters"], 4)
+        self.assertEqual(metadata["k_selection"], "silhouette")
+        self.assertIn("selection_ms", metadata)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from dedup import Deduplicator, normalize_url, weighted_count
+from news import News, Event
+from news_query import _format_results
+import etl
+
+STORY = ("Chipmakers rallied on Tuesday after Nvidia raised its revenue forecast for the "
+         "quarter, sending the semiconductor index to a record close as investors bet on AI demand.")
+
+
+def article(link, title, summary=STORY):
+    return News("20240101T1200", title, link, summary)
+
+
+class TestDedup(unittest.TestCase):
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url("https://WWW.Example.com/markets/chips/?utm_source=x&id=3#top"),
+                         normalize_url("http://example.com/markets/chips?id=3"))
+        self.assertNotEqual(normalize_url("https://example.com/a?id=3"), normalize_url("https://example.com/a?id=4"))
+
+    def test_exact_and_near_duplicates_are_collapsed_and_counted(self):
+        news_list = [
+            article("https://reuters.com/chips", "Chip stocks rally as Nvidia lifts forecast"),
+            article("https://www.reuters.com/chips/?utm_medium=rss", "Chip stocks rally (update)"),
+            article("https://yahoo.com/chips-rally", "Chip Stocks Rally as Nvidia Lifts Forecast!"),
+            # Syndicated under another headline, with a byline prefix on the summary
+            article("https://marketwatch.com/story/1", "Nvidia outlook powers semiconductor record",
+                    "(Reuters) - " + STORY),
+            article("https://example.com/oil", "Oil slides on weaker Chinese demand outlook",
+                    "Crude futures fell for a third day as refinery data from China pointed to softer demand."),
+            article("https://example.com/hot", "Stocks to watch", "Short"),
+            article("https://example.com/cold", "Stocks to watch", "Short"),
+        ]
+        stats = {}
+        unique = Deduplicator().dedupe(news_list, stats)
+
+        self.assertEqual([news.link for news in unique], [news_list[i].link for i in (0, 4, 5, 6)])
+        self.assertEqual(unique[0].duplicates, 3)
+        self.assertEqual(weighted_count(unique), len(news_list))
+        self.assertEqual(stats, {"articles": 7, "unique": 4, "exact_duplicates": 2, "near_duplicates": 1,
+                                 "reduction": 0.429})
+        # The input is left as it was
+        self.assertEqual(news_list[0].duplicates, 0)
+
+    def test_percentages_count_collapsed_articles(self):
+        chips = article("https://reuters.com/chips", "Chip stocks rally as Nvidia lifts forecast")
+        chips.duplicates = 2
+        oil = article("https://example.com/oil", "Oil slides on weaker Chinese demand outlook")
+        events = {0: Event("b", "oil", [oil]), 1: Event("a", "chips", [chips])}
+
+        results = _format_results(events, weighted_count([chips, oil]))
+
+        # Largest event first, since callers keep only the first `limit`
+        self.assertEqual([result["Percentage"] for result in results], [75, 25])
+
+    def test_etl_rollup_collapses_stories_repeated_across_days(self):
+        monday = etl.DayBatch(None, [article("https://a.com/1", "Chip stocks rally as Nvidia lifts forecast")],
+                              np.ones((1, 4)))
+        tuesday = etl.DayBatch(None, [article("https://b.com/1", "Chip stocks rally as Nvidia lifts forecast"),
+                                      article("https://b.com/2", "Oil slides on weaker Chinese demand outlook",
+                                              "Crude futures fell for a third day.")],
+                               np.arange(8).reshape(2, 4))
+
+        news, embeddings = etl.combine([monday, tuesday], per_day=10)
+
+        self.assertEqual([item.link for item in news], ["https://a.com/1", "https://b.com/2"])
+        self.assertEqual(news[0].duplicates, 1)
+        np.testing.assert_array_equal(embeddings[1], [4, 5, 6, 7])
+        self.assertEqual(monday.news[0].duplicates, 0)
+
+    @patch("news_query.get_summary", side_effect=lambda events, max_words=150: events)
+    @patch("news_query._label_news", side_effect=lambda news, emb, *args: ([0] * len(news), {"mode": "full"}))
+    @patch("news_query.embed_news", side_effect=lambda news: np.ones((len(news), 4)))
+    @patch("news_query.fetch_news_windows")
+    def test_real_time_query_reports_the_reduction(self, fetch, embed, label, summary):
+        from news_query import real_time_query
+        feed = [{"title": "Chip stocks rally as Nvidia lifts forecast", "url": f"https://site{i}.com/chips",
+                 "time_published": "20240101T120000", "summary": STORY} for i in range(4)]
+        fetch.return_value = [{"feed": feed}]
+        metadata = {}
+
+        results = real_time_query("day", metadata=metadata)
+
+        self.assertEqual(len(embed.call_args.args[0]), 1)
+        self.assertEqual(metadata["dedup"]["reduction"], 0.75)
+        self.assertEqual(results[0]["Percentage"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import tempfile
+import multiprocessing
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import embeddings
+from embedding_store import EmbeddingStore
+
+
+def write_rows(directory, prefix, value):
+    # Runs in a worker process: interleaved single-row writes to a shared store
+    store = EmbeddingStore(directory, max_entries=1000)
+    for i in range(20):
+        store.put_many("m", [f"{prefix}{i}"], [[value, float(i)]])
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_and_persistence(self):
+        store = EmbeddingStore(self.directory, max_entries=10)
+        store.put_many("m", ["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+        store.flush()
+
+        reopened = EmbeddingStore(self.directory, max_entries=10)
+        a, missing, b = reopened.get_many("m", ["a", "c", "b"])
+        np.testing.assert_array_equal(a, np.array([1.0, 2.0], dtype=np.float32))
+        np.testing.assert_array_equal(b, np.array([3.0, 4.0], dtype=np.float32))
+        self.assertIsNone(missing)
+        self.assertEqual(reopened.stats()["hits"], 2)
+        self.assertEqual(reopened.stats()["misses"], 1)
+
+        # Same text under another model is a different key
+        self.assertEqual(reopened.get_many("other-model", ["a"]), [None])
+
+    def test_lru_eviction(self):
+        store = EmbeddingStore(self.directory, max_entries=10)
+        texts = [f"t{i}" for i in range(10)]
+        store.put_many("m", texts, np.arange(20, dtype=np.float32).reshape(10, 2))
+        store.get_many("m", ["t0"])  # t0 is now the most recently used
+        store.put_many("m", ["new"], [[99.0, 99.0]])
+
+        self.assertEqual(store.stats()["entries"], 10)
+        self.assertIsNone(store.get_many("m", ["t1"])[0])
+        self.assertIsNotNone(store.get_many("m", ["t0"])[0])
+        np.testing.assert_array_equal(store.get_many("m", ["new"])[0], [99.0, 99.0])
+
+    def test_get_embeddings_only_embeds_misses(self):
+        store = EmbeddingStore(self.directory, max_entries=100)
+        store.put_many("m", ["cached"], [[5.0, 5.0]])
+        client = MagicMock()
+        client.embeddings.create.return_value = MagicMock(data=[MagicMock(index=0, embedding=[7.0, 7.0])])
+
+        with patch.object(embeddings, "get_embedding_store", return_value=store):
+            result = embeddings.get_embeddings(client, ["cached", "fresh", "fresh"], model="m")
+
+        np.testing.assert_array_equal(result, [[5.0, 5.0], [7.0, 7.0], [7.0, 7.0]])
+        client.embeddings.create.assert_called_once_with(input=["fresh"], model="m")
+        np.testing.assert_array_equal(store.get_many("m", ["fresh"])[0], [7.0, 7.0])
+
+
+    def test_stores_sharing_a_directory_keep_their_rows(self):
+        first = EmbeddingStore(self.directory, max_entries=10)
+        second = EmbeddingStore(self.directory, max_entries=10)
+        first.put_many("m", ["a1", "a2"], [[1.0, 1.0], [1.0, 1.0]])
+        second.put_many("m", ["b1", "b2"], [[2.0, 2.0], [2.0, 2.0]])
+        first.flush()
+        second.flush()
+
+        reopened = EmbeddingStore(self.directory, max_entries=10)
+        np.testing.assert_array_equal(reopened.get_many("m", ["a1", "a2", "b1", "b2"]),
+                                      [[1.0, 1.0], [1.0, 1.0], [2.0, 2.0], [2.0, 2.0]])
+        # Each store also sees what the other wrote
+        np.testing.assert_array_equal(first.get_many("m", ["b1"])[0], [2.0, 2.0])
+
+    def test_concurrent_writer_processes(self):
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=write_rows, args=(self.directory, prefix, value))
+                   for prefix, value in (("a", 1.0), ("b", 2.0), ("c", 3.0))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        store = EmbeddingStore(self.directory, max_entries=1000)
+        self.assertEqual(store.stats()["entries"], 60)
+        for prefix, value in (("a", 1.0), ("b", 2.0), ("c", 3.0)):
+            vectors = store.get_many("m", [f"{prefix}{i}" for i in range(20)])
+            np.testing.assert_array_equal(vectors, [[value, float(i)] for i in range(20)])
+
+    def test_hits_do_not_rewrite_the_index(self):
+        store = EmbeddingStore(self.directory, max_entries=10)
+        store.put_many("m", ["a"], [[1.0, 1.0]])
+        before = os.stat(store.index_path).st_mtime_ns
+
+        client = MagicMock()
+        with patch.object(embeddings, "get_embedding_store", return_value=store):
+            embeddings.get_embeddings(client, ["a"], model="m")
+
+        client.embeddings.create.assert_not_called()
+        self.assertEqual(os.stat(store.index_path).st_mtime_ns, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
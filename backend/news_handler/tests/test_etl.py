@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import numpy as np
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import etl
+from etl import DayStore, run_rollups, new_stats
+
+
+def fake_feed(windows, limit):
+    # Three articles per day; the last one also comes back for the next day
+    feeds = []
+    for time_from, time_to in windows:
+        feeds.append({"feed": [
+            {"title": f"{time_from} story {i}", "url": f"https://example.com/{time_from}/{i}",
+             "time_published": time_from + "00", "summary": f"Story {i}"}
+            for i in range(2)
+        ] + [{"title": "boundary", "url": f"https://example.com/{time_to}/0",
+              "time_published": time_to + "00", "summary": "Boundary story"}]})
+    return feeds
+
+
+def fake_summary(events, max_words=150):
+    for event in events.values():
+        event.summary = f"{len(event.news_list)} articles"
+    return events
+
+
+@patch("etl.get_summary", side_effect=fake_summary)
+@patch("etl.cluster_embeddings", side_effect=lambda embeddings, max_clusters: [0] * len(embeddings))
+@patch("etl.embed_news", side_effect=lambda news: np.ones((len(news), 4)))
+@patch("etl.fetch_news_windows", side_effect=fake_feed)
+class TestEtl(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = DayStore(self.directory)
+        self.end_day = datetime(2024, 3, 31)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_rollups_share_one_fetch_per_day(self, fetch, embed, cluster, summary):
+        stats = new_stats()
+        documents = dict(run_rollups(end_day=self.end_day, stats=stats, store=self.store))
+
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(len(fetch.call_args.args[0]), 30)
+        self.assertEqual(stats, {"days_fetched": 30, "days_cached": 0, "articles_embedded": 90, "duplicates": 0})
+        self.assertEqual((documents["day"]["day_start"], documents["day"]["day_end"]), ("2024-03-31", "2024-04-01"))
+        self.assertEqual(documents["week"]["week_start"], "2024-03-25")
+        self.assertEqual(documents["month"]["month_start"], "2024-03-02")
+        # Boundary articles are counted once, so the percentages still add up
+        week_news = documents["week"]["results"][0]["Event"]["news_list"]
+        self.assertEqual(len(week_news), 15)
+        self.assertEqual(documents["week"]["results"][0]["Percentage"], 100)
+
+    def test_nightly_run_only_fetches_the_new_day(self, fetch, embed, cluster, summary):
+        list(run_rollups(end_day=self.end_day - timedelta(days=1), store=self.store))
+        stats = new_stats()
+        list(run_rollups(end_day=self.end_day, stats=stats, store=self.store))
+
+        self.assertEqual(fetch.call_args.args[0], [("20240331T0000", "20240401T0000")])
+        self.assertEqual(stats, {"days_fetched": 1, "days_cached": 29, "articles_embedded": 3, "duplicates": 0})
+
+    def test_missing_feed_raises_and_is_not_stored(self, fetch, embed, cluster, summary):
+        fetch.side_effect = lambda windows, limit: [{"Information": "rate limit"} for _ in windows]
+        with self.assertRaises(RuntimeError):
+            list(run_rollups(end_day=self.end_day, periods=("day",), store=self.store))
+        self.assertIsNone(self.store.get(self.end_day, etl.ETL_DAILY_LIMIT))
+
+
+if __name__ == "__main__":
+    unittest.main()
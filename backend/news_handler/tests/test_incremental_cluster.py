@@ -0,0 +1,134 @@
+import multiprocessing
+import json
+import unittest
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from incremental_cluster import IncrementalClusterer
+from news_query import hash_event_label
+from news import News
+
+
+def make_news(link):
+    return News(post_time="20240101T1200", title=link, link=link, summary=link)
+
+
+def update_in_process(state_path, worker, start, done):
+    # Every article points in its own direction, so each update spawns events
+    clusterer = IncrementalClusterer(state_path, assign_threshold=0.99)
+    start.wait()
+    for step in range(10):
+        link = f"w{worker}-{step}"
+        vector = np.zeros(64)
+        vector[worker * 10 + step] = 1.0
+        clusterer.update([make_news(link)], [vector], max_clusters=100)
+    done.put(worker)
+
+
+class TestIncrementalClusterer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp.name, "week.json")
+        # Two well separated topics: a* articles point along x, b* along y
+        self.vectors = {
+            "a1": [1.0, 0.05, 0.0], "a2": [0.95, 0.1, 0.0], "a3": [1.0, 0.0, 0.1],
+            "b1": [0.0, 1.0, 0.05], "b2": [0.1, 0.95, 0.0],
+            "c1": [0.0, 0.0, 1.0],
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def update(self, clusterer, links, max_clusters=2):
+        news_list = [make_news(link) for link in links]
+        labels = clusterer.update(news_list, [self.vectors[link] for link in links], max_clusters=max_clusters)
+        return news_list, labels
+
+    def test_new_articles_join_existing_events_with_stable_ids(self):
+        clusterer = IncrementalClusterer(self.state_path, assign_threshold=0.8)
+        news_list, labels = self.update(clusterer, ["a1", "a2", "b1"])
+        first_ids = {news.link: event.event_id
+                     for event in hash_event_label(labels, news_list).values() for news in event.news_list}
+
+        # a1 left the window, a3/b2 are new and c1 matches neither event;
+        # reload from disk to check the state survives a restart
+        clusterer = IncrementalClusterer(self.state_path, assign_threshold=0.8)
+        news_list, labels = self.update(clusterer, ["a2", "a3", "b1", "b2", "c1"])
+        label_of = dict(zip(["a2", "a3", "b1", "b2", "c1"], labels))
+        ids = {news.link: event.event_id
+               for event in hash_event_label(labels, news_list).values() for news in event.news_list}
+
+        self.assertEqual(label_of["a2"], label_of["a3"])
+        self.assertEqual(label_of["b1"], label_of["b2"])
+        self.assertNotIn(label_of["c1"], (label_of["a2"], label_of["b1"]))
+        self.assertEqual(ids["a2"], first_ids["a2"])
+        self.assertEqual(ids["b1"], first_ids["b1"])
+        self.assertNotIn("a1", clusterer.state["events"][label_of["a2"]]["members"])
+
+    def test_scheduled_full_recluster_keeps_overlapping_keys(self):
+        clusterer = IncrementalClusterer(self.state_path, assign_threshold=0.8, recluster_hours=1)
+        _, labels = self.update(clusterer, ["a1", "a2", "b1", "b2"])
+        clusterer.state["last_full_recluster"] = (datetime.now() - timedelta(hours=2)).isoformat()
+
+        _, new_labels = self.update(clusterer, ["a1", "a2", "a3", "b1", "b2"])
+
+        self.assertEqual(new_labels[0], labels[0])
+        self.assertEqual(new_labels[3], labels[2])
+        self.assertEqual(new_labels[2], new_labels[0])
+        self.assertGreater(datetime.fromisoformat(clusterer.state["last_full_recluster"]),
+                           datetime.now() - timedelta(minutes=1))
+
+    def test_unrelated_batch_is_reclustered_within_the_update(self):
+        clusterer = IncrementalClusterer(self.state_path, assign_threshold=0.8)
+        self.update(clusterer, ["a1", "a2", "b1"])
+        # 40 articles that match neither event nor each other
+        rng = np.random.RandomState(0)
+        for i in range(40):
+            self.vectors[f"x{i}"] = rng.normal(size=3).tolist()
+        links = ["a1", "a2", "b1"] + [f"x{i}" for i in range(40)]
+
+        _, labels = self.update(clusterer, links)
+
+        self.assertLessEqual(len(set(labels)), 2)
+        self.assertEqual(len(clusterer.state["events"]), len(set(labels)))
+
+    def test_clusterers_sharing_a_state_file_build_on_each_other(self):
+        first = IncrementalClusterer(self.state_path, assign_threshold=0.8)
+        second = IncrementalClusterer(self.state_path, assign_threshold=0.8)
+        _, labels = self.update(first, ["a1", "b1"])
+
+        # The second handle sees the first one's events and does not reuse its keys
+        _, second_labels = self.update(second, ["a1", "a2", "b1", "c1"], max_clusters=5)
+
+        self.assertEqual(second_labels[:3], [labels[0], labels[0], labels[1]])
+        self.assertNotIn(second_labels[3], labels)
+        self.assertEqual(second.state["next_id"], 3)
+
+    def test_concurrent_processes_keep_the_state_valid(self):
+        context = multiprocessing.get_context("fork")
+        start, done = context.Event(), context.Queue()
+        workers = [context.Process(target=update_in_process, args=(self.state_path, worker, start, done))
+                   for worker in range(3)]
+        for worker in workers:
+            worker.start()
+        start.set()
+        self.assertEqual(sorted(done.get(timeout=60) for _ in workers), [0, 1, 2])
+        for worker in workers:
+            worker.join()
+
+        with open(self.state_path) as f:
+            state = json.load(f)
+        # Each update replaced the window with its own single article, and no key was handed out twice
+        self.assertEqual(len(state["events"]), 1)
+        self.assertEqual(state["next_id"], 30)
+        self.assertEqual([name for name in os.listdir(self.tmp.name) if name.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import unittest
+import sys
+import os
+from unittest.mock import patch, PropertyMock
+
+# Add the backend directory (job_runner, event_prediction.*) and the benchmark stubs to the Python path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "benchmarks"))
+from job_runner import JobQueue, JobRunner, DONE, FAILED, RUNNING
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+def without_sort(method):
+    # mongomock 4.3 predates the `sort` argument pymongo 4.11+ passes for bulk updates
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def embed_week(payload):
+    # Runs in a backfill worker process: writes then reads its rows in the shared store
+    from news_handler.embedding_store import get_embedding_store
+    store = get_embedding_store("m")
+    texts = [f"{payload['week']}-{i}" for i in range(10)]
+    store.put_many("m", texts, [[float(payload["week"]), float(i)] for i in range(10)])
+    return [vector.tolist() for vector in store.get_many("m", texts)]
+
+
+def claim_and_crash(path, kind, limit):
+    # A runner process that dies with its claimed jobs still running
+    JobQueue(path).claim(kind, limit)
+    os._exit(1)
+
+
+class TestJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "queue.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_resumes_after_a_crash(self):
+        queue = JobQueue(self.path)
+        self.assertEqual(queue.enqueue("square", [(str(n), {"n": n}) for n in range(5)]), 5)
+        # A crashed run leaves its claimed jobs running; planning again adds nothing
+        crashed = multiprocessing.get_context("fork").Process(target=claim_and_crash, args=(self.path, "square", 2))
+        crashed.start()
+        crashed.join()
+        queue.close()
+        queue = JobQueue(self.path)
+        self.assertEqual(queue.enqueue("square", [(str(n), {"n": n}) for n in range(5)]), 0)
+
+        batches = []
+        counts = JobRunner(queue, {"square": lambda payload: payload["n"] ** 2},
+                           {"square": batches.append}, max_workers=2, flush_size=2).run("square")
+
+        self.assertEqual(counts["done"], 5)
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(queue.results("square"), {str(n): n ** 2 for n in range(5)})
+        self.assertEqual(queue.stats(), {"square": {DONE: 5}})
+
+    def test_second_runner_leaves_jobs_of_a_live_runner_alone(self):
+        queue = JobQueue(self.path)
+        queue.enqueue("square", [(str(n), {"n": n}) for n in range(4)])
+        # Another runner (this process stands in for it) is still working on two jobs
+        claimed = [item_id for item_id, _ in queue.claim("square", 2)]
+
+        counts = JobRunner(JobQueue(self.path), {"square": lambda payload: payload["n"] ** 2}).run("square")
+
+        self.assertEqual(counts["done"], 2)
+        self.assertEqual(queue.stats()["square"], {DONE: 2, RUNNING: 2})
+        self.assertEqual(queue.recover(), 0)
+        queue.complete("square", [(item_id, int(item_id) ** 2) for item_id in claimed])
+        self.assertEqual(queue.results("square"), {str(n): n ** 2 for n in range(4)})
+
+    def test_failing_jobs_are_retried_then_left_failed(self):
+        queue = JobQueue(self.path, max_attempts=2)
+        queue.enqueue("divide", [("ok", {"d": 2}), ("bad", {"d": 0})])
+        lock = threading.Lock()
+        calls = []
+
+        def divide(payload):
+            with lock:
+                calls.append(payload["d"])
+            return 10 / payload["d"]
+
+        counts = JobRunner(queue, {"divide": divide}).run("divide")
+
+        self.assertEqual((counts["done"], counts["retried"], counts["failed"]), (1, 1, 1))
+        self.assertEqual(sorted(calls), [0, 0, 2])
+        self.assertEqual(queue.stats()["divide"], {DONE: 1, FAILED: 1})
+        self.assertEqual(queue.retry_failed("divide"), 1)
+
+    def test_backfill_workers_share_the_embedding_store(self):
+        sys.path.append(os.path.join(BACKEND_DIR, "news_handler", "scripts"))
+        from inject_to_db import _init_backfill_worker
+        from news_handler import embedding_store
+        queue = JobQueue(self.path)
+        queue.enqueue("embed", [(str(week), {"week": week}) for week in range(8)])
+
+        with patch.object(embedding_store, "EMBEDDING_CACHE_DIR", os.path.join(self.directory, "embeddings")), \
+                patch.object(embedding_store, "EMBEDDING_CACHE_ENABLED", True):
+            counts = JobRunner(queue, {"embed": embed_week}, max_workers=4, processes=True,
+                               initializer=_init_backfill_worker, initargs=(4,)).run("embed")
+            store = embedding_store.EmbeddingStore(os.path.join(self.directory, "embeddings", "m"))
+
+        self.assertEqual(counts["done"], 8)
+        for week, vectors in queue.results("embed").items():
+            self.assertEqual(vectors, [[float(week), float(i)] for i in range(10)])
+        self.assertEqual(store.stats()["entries"], 80)
+        self.assertEqual(store.get_many("m", ["3-7"])[0].tolist(), [3.0, 7.0])
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestBackfillJobsEndToEnd(unittest.TestCase):
+    """topics and predict jobs against a local stub LLM server and an in-memory Mongo."""
+
+    def setUp(self):
+        from openai import OpenAI
+        from stub_servers import start_stub_server, chat_completions_route
+        self.server, base_url = start_stub_server(chat_completions_route(), latency=0.01)
+        self.stub_client = OpenAI(api_key="stub", base_url=f"{base_url}/v1", max_retries=0)
+        self.directory = tempfile.mkdtemp()
+        self.db = mongomock.MongoClient()["stock-news"]
+        self.db["news"].insert_many([
+            {"week_start": week, "week_end": week, "results": [{"Percentage": 100, "Event": {
+                "event_id": "abc", "summary": f"Chipmakers rally in the week of {week}.", "topic": "General",
+                "news_list": [{"post_time": "20240101T1200", "title": "T", "link": "http://example.com", "summary": "S"}]
+            }}]}
+            for week in ("2024-01-01", "2024-01-08", "2024-01-15")
+        ])
+
+    def tearDown(self):
+        self.server.shutdown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_topics_and_predictions_are_written_in_bulk(self):
+        sys.path.append(os.path.join(BACKEND_DIR, "news_handler", "scripts"))
+        import backfill_jobs
+        from event_prediction.event_predictor import EventPredictor
+        from llm_gateway import gateway
+        topic_module = sys.modules["topic_generator.topic_generator"]
+
+        queue = JobQueue(os.path.join(self.directory, "queue.db"))
+        weeks = [(week, {"week_start": week}) for week in ("2024-01-01", "2024-01-08", "2024-01-15")]
+        queue.enqueue("topics", weeks)
+        queue.enqueue("predict", weeks)
+        jobs = backfill_jobs.BackfillJobs(self.db, predictor=EventPredictor(api_key="stub"))
+        runner = JobRunner(queue, jobs.handlers(), jobs.sinks(), max_workers=3, flush_size=2)
+
+        builder = mongomock.collection.BulkOperationBuilder
+        with patch.object(builder, "add_update", without_sort(builder.add_update)), \
+                patch.object(builder, "add_replace", without_sort(builder.add_replace)), \
+                patch.object(gateway, "response_cache", None), \
+                patch.object(topic_module, "get_client", return_value=self.stub_client), \
+                patch.object(EventPredictor, "client", new_callable=PropertyMock, return_value=self.stub_client):
+            self.assertEqual(runner.run("topics")["done"], 3)
+            self.assertEqual(runner.run("predict")["done"], 3)
+
+        self.assertEqual({doc["results"][0]["Event"]["topic"] for doc in self.db["news"].find()}, {"Stub topic"})
+        predictions = list(self.db["predictions"].find())
+        self.assertEqual(len(predictions), 3)
+        self.assertEqual(len(predictions[0]["predictions"]), 3)
+        self.assertGreater(predictions[0]["prompt"]["prompt_tokens"], 0)
+
+    def test_unique_week_index_drops_older_duplicates(self):
+        sys.path.append(os.path.join(BACKEND_DIR, "news_handler", "scripts"))
+        import backfill_jobs
+        # Two earlier insert_one backfills stored the same week twice
+        self.db["news"].insert_one({"week_start": "2024-01-01", "week_end": "2024-01-07", "results": []})
+
+        backfill_jobs.ensure_backfill_indexes(self.db)
+
+        weeks = [doc["week_start"] for doc in self.db["news"].find()]
+        self.assertEqual(sorted(weeks), ["2024-01-01", "2024-01-08", "2024-01-15"])
+        self.assertEqual(self.db["news"].find_one({"week_start": "2024-01-01"})["results"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+import unittest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from pydantic import BaseModel
+
+# Add the backend directory to the Python path so llm_gateway and news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from llm_cache import LLMResponseCache, request_key
+from llm_gateway import LLMGateway
+
+
+class Forecast(BaseModel):
+    content: str
+    confidency_score: int
+
+
+def completion(content=None, parsed=None):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content, parsed=parsed))],
+                           usage=None)
+
+
+class TestLLMCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.gateway = LLMGateway(model_limits={})
+        self.gateway.response_cache = LLMResponseCache(self.directory, ttl_seconds=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_request_key(self):
+        messages = [{"role": "user", "content": "hi"}]
+        key = request_key(model="m", messages=messages, response_format=Forecast)
+        self.assertEqual(key, request_key(messages=messages, model="m", response_format=Forecast,
+                                          extra_headers={"x": "y"}))
+        self.assertNotEqual(key, request_key(model="other", messages=messages, response_format=Forecast))
+        self.assertNotEqual(key, request_key(model="m", messages=messages, response_format={"type": "json_object"}))
+
+    def test_parsed_outputs_are_served_from_the_cache(self):
+        client = MagicMock()
+        client.beta.chat.completions.parse.return_value = completion(parsed=Forecast(content="Rally", confidency_score=70))
+        request = {"model": "m", "messages": [{"role": "user", "content": "events"}], "response_format": Forecast}
+
+        first = self.gateway.parse_model(client, "predict", **request)
+        second = self.gateway.parse_model(client, "predict", **request)
+
+        self.assertEqual(first, second)
+        self.assertIsInstance(second, Forecast)
+        client.beta.chat.completions.parse.assert_called_once()
+
+    def test_hit_rates_per_call_site(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value = completion(content="Buy more MSFT")
+        for _ in range(3):
+            self.assertEqual(self.gateway.complete_text(client, "advisor", model="m", messages=[]), "Buy more MSFT")
+        self.gateway.complete_text(client, "risk", model="m", messages=[{"role": "user", "content": "x"}])
+
+        sites = self.gateway.response_cache.stats()["sites"]
+        self.assertEqual(sites["advisor"], {"hits": 2, "misses": 1, "hit_rate": 0.667})
+        self.assertEqual(sites["risk"]["hit_rate"], 0.0)
+        self.assertEqual(client.chat.completions.create.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing
+import tempfile
+import threading
+import time
+import unittest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+# Add the backend directory to the Python path so llm_gateway and news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import llm_gateway
+from llm_gateway import LLMGateway, INTERACTIVE, BATCH
+from shared_limits import SharedLimits
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def admit_burst(path, start, admitted):
+    # 60 requests per minute: a burst of 10, then one a second, for all processes together
+    gateway = LLMGateway(model_limits={"m": (60, 1e9)}, shared_limits=SharedLimits(path))
+    start.wait()
+    admitted.put(sum(gateway._try_admit("m", 1, INTERACTIVE) == 0.0 for _ in range(10)))
+
+
+def queue_interactive(path, queued, release):
+    gateway = LLMGateway(model_limits={"m": (600, 1e9)}, shared_limits=SharedLimits(path))
+    gateway._enqueue("m", INTERACTIVE)
+    queued.set()
+    release.wait()
+    gateway._dequeue("m", INTERACTIVE, 0.0)
+
+
+class TestLLMGateway(unittest.TestCase):
+    @patch.object(llm_gateway, "LLM_BACKOFF_BASE", 0.01)
+    def test_retries_transient_errors_only(self):
+        gateway = LLMGateway(model_limits={}, max_retries=3)
+        flaky = MagicMock(side_effect=[StatusError(503), StatusError(502), "ok"])
+        self.assertEqual(gateway.call(flaky, model="m", messages=[]), "ok")
+        self.assertEqual(flaky.call_count, 3)
+
+        bad_request = MagicMock(side_effect=StatusError(400))
+        with self.assertRaises(StatusError):
+            gateway.call(bad_request, model="m", messages=[])
+        self.assertEqual(bad_request.call_count, 1)
+
+        stats = gateway.stats()["models"]["m"]
+        self.assertEqual((stats["requests"], stats["retries"], stats["errors"]), (1, 2, 1))
+
+    def test_batch_waits_for_queued_interactive_calls(self):
+        # 600 requests per minute: a burst of 100, then one every 0.1s
+        gateway = LLMGateway(model_limits={"m": (600, 1e9)}, batch_reserve=0)
+        while gateway._try_admit("m", 1, INTERACTIVE) == 0.0:
+            pass
+        order = []
+
+        def call(priority):
+            gateway.call(lambda **kwargs: order.append(priority), priority=priority, model="m", messages=[])
+
+        batch = threading.Thread(target=call, args=(BATCH,))
+        batch.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=call, args=(INTERACTIVE,))
+        interactive.start()
+        batch.join()
+        interactive.join()
+
+        self.assertEqual(order, [INTERACTIVE, BATCH])
+        queues = gateway.stats()["queues"]
+        self.assertEqual(queues[BATCH]["queue_depth"], 0)
+        self.assertGreater(queues[BATCH]["max_wait_ms"], queues[INTERACTIVE]["max_wait_ms"])
+
+    def test_token_bucket_is_corrected_from_usage(self):
+        gateway = LLMGateway(model_limits={"m": (600, 1000)})
+        response = SimpleNamespace(usage=SimpleNamespace(total_tokens=900))
+        gateway.call(lambda **kwargs: response, model="m", messages=[], max_tokens=100)
+
+        stats = gateway.stats()["models"]["m"]
+        self.assertEqual(stats["used_tokens"], 900)
+        # The call reserved ~100 tokens but used 900, so little of the minute's 1000 is left
+        self.assertGreater(gateway._limiter("m").tokens.wait_time(500), 0)
+
+
+    def test_processes_draw_from_one_shared_bucket(self):
+        context = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "limits.db")
+            start, admitted = context.Event(), context.Queue()
+            workers = [context.Process(target=admit_burst, args=(path, start, admitted)) for _ in range(3)]
+            for worker in workers:
+                worker.start()
+            start.set()
+            total = sum(admitted.get(timeout=30) for _ in workers)
+            for worker in workers:
+                worker.join()
+
+        # One burst of 10 between the three of them (plus what refills meanwhile), not 30
+        self.assertGreaterEqual(total, 10)
+        self.assertLessEqual(total, 12)
+
+    def test_batch_waits_for_interactive_calls_in_another_process(self):
+        context = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "limits.db")
+            gateway = LLMGateway(model_limits={"m": (600, 1e9)}, batch_reserve=0, shared_limits=SharedLimits(path))
+            queued, release = context.Event(), context.Event()
+            other = context.Process(target=queue_interactive, args=(path, queued, release))
+            other.start()
+            self.assertTrue(queued.wait(timeout=30))
+
+            self.assertGreater(gateway._try_admit("m", 1, BATCH), 0)
+            # Interactive callers here are not held back by those elsewhere
+            self.assertEqual(gateway._try_admit("m", 1, INTERACTIVE), 0.0)
+
+            release.set()
+            other.join()
+            self.assertEqual(gateway._try_admit("m", 1, BATCH), 0.0)
+
+
+    def test_slow_shared_limits_do_not_hold_the_gateway_lock(self):
+        entered, release = threading.Event(), threading.Event()
+
+        class SlowSharedLimits:
+            path = "slow"
+
+            def admit(self, *args, **kwargs):
+                entered.set()
+                release.wait(timeout=10)
+                return 0.0
+
+            def set_waiting(self, model, count):
+                pass
+
+        gateway = LLMGateway(model_limits={"m": (600, 1e9)}, shared_limits=SlowSharedLimits())
+        caller = threading.Thread(target=gateway.acquire, args=("m", 1, INTERACTIVE))
+        caller.start()
+        self.assertTrue(entered.wait(timeout=10))
+
+        # While one caller waits on the database, the rest of the process carries on
+        self.assertTrue(gateway._lock.acquire(timeout=1))
+        gateway._lock.release()
+        self.assertEqual(gateway.stats()["queues"][INTERACTIVE]["queue_depth"], 1)
+        release.set()
+        caller.join()
+        self.assertEqual(gateway.stats()["queues"][INTERACTIVE]["admitted"], 1)
+
+
+    def test_acquire_async_touches_shared_limits_off_the_event_loop(self):
+        threads = []
+
+        class RecordingSharedLimits:
+            path = "recording"
+
+            def admit(self, *args, **kwargs):
+                threads.append(threading.current_thread())
+                return 0.0
+
+            def set_waiting(self, model, count):
+                threads.append(threading.current_thread())
+
+        gateway = LLMGateway(model_limits={"m": (600, 1e9)}, shared_limits=RecordingSharedLimits())
+        asyncio.run(gateway.acquire_async("m", 1, INTERACTIVE))
+
+        # Enqueue, admission and dequeue
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import tempfile
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import embeddings
+import local_embeddings
+from embedding_store import EmbeddingStore
+
+
+class TestLocalEmbeddings(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        local_embeddings._model = None
+        self.model = MagicMock()
+        self.model.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[float(len(text)), 1.0] for text in texts])
+
+    def tearDown(self):
+        local_embeddings._model = None
+        self.tmp.cleanup()
+
+    def test_model_loaded_once_and_shared(self):
+        with patch("local_embeddings._load_model", return_value=self.model) as load:
+            first = local_embeddings.embed_texts_local(["a", "bb"])
+            local_embeddings.embed_texts_local(["ccc"])
+
+        load.assert_called_once()
+        self.assertEqual(first.dtype, np.float32)
+        np.testing.assert_array_equal(first, [[1.0, 1.0], [2.0, 1.0]])
+        self.assertTrue(self.model.encode.call_args.kwargs["normalize_embeddings"])
+
+    def test_local_backend_skips_the_api_and_uses_its_own_store(self):
+        store = EmbeddingStore(self.tmp.name)
+        client = MagicMock()
+        # embeddings.py may hold the news_handler.local_embeddings copy of the module
+        with patch("local_embeddings._load_model", return_value=self.model), \
+                patch.object(embeddings, "embed_texts_local", local_embeddings.embed_texts_local), \
+                patch.object(embeddings, "get_embedding_store", return_value=store) as get_store:
+            vectors = embeddings.get_embeddings(client, ["x", "yy", "x"], backend="local")
+            again = embeddings.get_embeddings(client, ["yy"], backend="local")
+
+        client.embeddings.create.assert_not_called()
+        self.assertEqual(get_store.call_args[0][0], local_embeddings.local_model_key())
+        self.assertEqual(self.model.encode.call_count, 1)
+        self.assertEqual(self.model.encode.call_args[0][0], ["x", "yy"])
+        np.testing.assert_array_equal(vectors[0], vectors[2])
+        np.testing.assert_array_equal(again[0], vectors[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import rate_limiter
+from rate_limiter import TokenBucket, SharedBackoff
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() only moves monotonic() forward."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch.object(rate_limiter, "time", SimpleNamespace(monotonic=self.clock.monotonic,
+                                                                     sleep=self.clock.sleep))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bucket_allows_a_burst_then_the_sustained_rate(self):
+        bucket = TokenBucket.per_minute(60, burst=3)
+
+        self.assertEqual([bucket.try_acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.try_acquire(), 1.0)
+        self.clock.now += 0.5
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(bucket.try_acquire(), 0.0)
+        # Refilling stops at the capacity
+        self.clock.now += 60
+        self.assertEqual([bucket.try_acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.try_acquire(), 1.0)
+
+    def test_wait_time_reserve_and_adjust(self):
+        bucket = TokenBucket(rate=10, capacity=100)
+
+        bucket.adjust(20)
+        self.assertEqual(bucket.wait_time(30, reserve=50), 0.0)
+        self.assertAlmostEqual(bucket.wait_time(40, reserve=50), 1.0)
+        bucket.adjust(-20)
+        # A call that used more than it reserved drives the level below zero
+        bucket.adjust(120)
+        self.assertAlmostEqual(bucket.wait_time(10), 3.0)
+        # Giving back more than was taken stops at the capacity
+        bucket.adjust(-500)
+        self.assertEqual(bucket.try_acquire(100), 0.0)
+        self.assertAlmostEqual(bucket.try_acquire(1), 0.1)
+
+    def test_acquire_sleeps_until_tokens_are_available(self):
+        bucket = TokenBucket(rate=2, capacity=4)
+        bucket.adjust(4)
+
+        self.assertAlmostEqual(bucket.acquire(3), 1.5)
+        # More than the capacity is capped so it can still be served
+        self.assertAlmostEqual(bucket.acquire(10), 2.0)
+        self.assertEqual(len(self.clock.slept), 2)
+
+    def test_backoff_callers_join_the_open_window(self):
+        backoff = SharedBackoff(base_wait=2, max_wait=30)
+
+        self.assertEqual(backoff.register(RateLimitError("429")), 2)
+        self.clock.now += 0.5
+        self.assertAlmostEqual(backoff.register(RateLimitError("429")), 1.5)
+        self.assertAlmostEqual(backoff.remaining(), 1.5)
+        self.clock.now += 1.5
+        self.assertEqual(backoff.remaining(), 0.0)
+
+    def test_backoff_doubles_without_a_hint_up_to_the_maximum(self):
+        backoff = SharedBackoff(base_wait=2, max_wait=10)
+        waits = []
+        for _ in range(5):
+            waits.append(backoff.register(RateLimitError("429")))
+            self.clock.now += waits[-1]
+
+        self.assertEqual(waits, [2, 4, 8, 10, 10])
+
+    def test_backoff_follows_the_retry_hint_and_resets_the_doubling(self):
+        backoff = SharedBackoff(base_wait=2, max_wait=30)
+        for _ in range(3):
+            self.clock.now += backoff.register(RateLimitError("429"))
+
+        self.assertAlmostEqual(backoff.register(RateLimitError("Rate limit reached. Please try again in 350ms.")), 1.35)
+        self.clock.now += 1.35
+        response = SimpleNamespace(headers={"retry-after": "3"})
+        self.assertEqual(backoff.register(SimpleNamespace(response=response)), 4)
+        self.clock.now += 4
+        self.assertEqual(backoff.register(RateLimitError("429")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
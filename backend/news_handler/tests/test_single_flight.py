@@ -0,0 +1,141 @@
+import multiprocessing
+import tempfile
+import threading
+import time
+import unittest
+import sys
+import os
+
+# Add the backend directory to the Python path so single_flight resolves
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from single_flight import SingleFlight, ComputationInterrupted
+
+
+def compute_once_across_processes(lock_dir, cache_dir, start, results):
+    # Each process has its own SingleFlight; only the file lock is shared
+    flight = SingleFlight(lock_dir)
+    value_path = os.path.join(cache_dir, "value")
+
+    def lookup():
+        if os.path.exists(value_path):
+            with open(value_path) as f:
+                return f.read()
+        return None
+
+    def compute():
+        with open(os.path.join(cache_dir, "computations"), "a") as f:
+            f.write(f"{os.getpid()}\n")
+        with open(value_path, "w") as f:
+            f.write("value")
+        return "value"
+
+    start.wait()
+    results.put(flight.do("key", compute, lookup))
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.lock_dir = directory.name
+        self.flight = SingleFlight(self.lock_dir)
+
+    def run_follower(self, key, outcome):
+        def follow():
+            try:
+                outcome["value"] = self.flight.do(key, lambda: "follower computed", lambda: None)
+            except BaseException as e:
+                outcome["error"] = e
+        follower = threading.Thread(target=follow)
+        follower.start()
+        return follower
+
+    def lead(self, key, compute):
+        """Start a leader blocked in compute until released; returns (thread, release event, outcome)."""
+        computing, release, outcome = threading.Event(), threading.Event(), {}
+
+        def blocked():
+            computing.set()
+            release.wait(timeout=10)
+            return compute()
+
+        def run():
+            try:
+                outcome["value"] = self.flight.do(key, blocked, lambda: None)
+            except BaseException as e:
+                outcome["error"] = e
+        leader = threading.Thread(target=run)
+        leader.start()
+        self.assertTrue(computing.wait(timeout=10))
+        return leader, release, outcome
+
+    def wait_for_followers(self, count):
+        for _ in range(1000):
+            if self.flight.stats()["saved_requests"] >= count:
+                return
+            time.sleep(0.01)
+        self.fail("followers did not join")
+
+    def test_followers_share_the_leaders_result(self):
+        leader, release, leader_outcome = self.lead("k", lambda: "leader computed")
+        outcomes = [{} for _ in range(3)]
+        followers = [self.run_follower("k", outcome) for outcome in outcomes]
+        self.wait_for_followers(3)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        self.assertEqual(leader_outcome["value"], "leader computed")
+        self.assertEqual([outcome["value"] for outcome in outcomes], ["leader computed"] * 3)
+        self.assertEqual(self.flight.stats(), {"saved_requests": 3, "computations": 1, "in_flight": 0})
+
+    def test_leader_failure_reaches_followers_and_the_next_call_recomputes(self):
+        def fail():
+            raise ValueError("upstream down")
+        leader, release, leader_outcome = self.lead("k", fail)
+        outcome = {}
+        follower = self.run_follower("k", outcome)
+        self.wait_for_followers(1)
+        release.set()
+        leader.join()
+        follower.join()
+
+        self.assertIsInstance(leader_outcome["error"], ValueError)
+        self.assertIsInstance(outcome["error"], ValueError)
+        self.assertEqual(self.flight.do("k", lambda: "retried", lambda: None), "retried")
+
+    def test_disconnected_leader_gives_followers_a_retryable_error(self):
+        # A streaming leader whose client went away is closed with GeneratorExit
+        future, is_leader = self.flight.join("k")
+        self.assertTrue(is_leader)
+        outcome = {}
+        follower = self.run_follower("k", outcome)
+        self.wait_for_followers(1)
+        self.flight.finish("k", future, error=GeneratorExit())
+        follower.join()
+
+        self.assertIsInstance(outcome["error"], ComputationInterrupted)
+        self.assertIsInstance(outcome["error"], Exception)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+    def test_processes_reuse_a_value_stored_while_they_waited_for_the_lock(self):
+        context = multiprocessing.get_context("fork")
+        cache_dir = os.path.join(self.lock_dir, "cache")
+        os.makedirs(cache_dir)
+        start, results = context.Event(), context.Queue()
+        workers = [context.Process(target=compute_once_across_processes,
+                                   args=(self.lock_dir, cache_dir, start, results)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        start.set()
+        values = [results.get(timeout=30) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(values, ["value"] * 3)
+        with open(os.path.join(cache_dir, "computations")) as f:
+            self.assertEqual(len(f.read().split()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import snapshot_store
+from snapshot_store import get_latest_snapshot
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.db = mongomock.MongoClient()["stock-news"]
+        self.result = {
+            "Percentage": 40,
+            "Event": {
+                "event_id": "abc",
+                "summary": "Chipmakers rally on AI demand.",
+                "news_list": [{"post_time": "20240101T1200", "title": "T", "link": "http://example.com", "summary": "S"}]
+            }
+        }
+
+    def tearDown(self):
+        snapshot_store._db = None
+        snapshot_store._retry_at = 0.0
+        snapshot_store._indexed.clear()
+
+    def test_latest_snapshot_wins(self):
+        now = datetime.now()
+        self.db["week"].insert_many([
+            {"week_start": "2024-01-01", "week_end": "2024-01-07", "created_at": now - timedelta(hours=30), "results": [{"Percentage": 1, "Event": {}}]},
+            {"week_start": "2024-01-08", "week_end": "2024-01-14", "created_at": now - timedelta(hours=2), "results": [self.result]},
+        ])
+
+        results = get_latest_snapshot("week", db=self.db)
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["Percentage"], 40)
+        self.assertEqual(results[0]["Event"]["summary"], "Chipmakers rally on AI demand.")
+        # Older snapshots have no topic; readers get the same default as the live path
+        self.assertEqual(results[0]["Event"]["topic"], "General")
+        index_keys = [index["key"] for index in self.db["week"].index_information().values()]
+        self.assertIn([("week_start", -1), ("created_at", -1)], index_keys)
+
+    def test_missing_or_stale_snapshot_falls_back(self):
+        self.assertIsNone(get_latest_snapshot("day", db=self.db))
+
+        self.db["day"].insert_one({
+            "day_start": "2024-01-01", "day_end": "2024-01-02",
+            "created_at": datetime.now() - timedelta(hours=50), "results": [self.result]
+        })
+        self.assertIsNone(get_latest_snapshot("day", db=self.db))
+        self.assertIsNotNone(get_latest_snapshot("day", max_age_hours=72, db=self.db))
+
+
+    @patch.object(snapshot_store, "MONGO_URI", "mongodb://snapshots")
+    def test_indexes_are_created_once_per_connection(self):
+        client = mongomock.MongoClient()
+        client["stock-news"]["week"].insert_one({"week_start": "2024-01-08", "created_at": datetime.now(),
+                                                  "results": [self.result]})
+        create_index = mongomock.collection.Collection.create_index
+        with patch("pymongo.MongoClient", return_value=client), \
+                patch.object(mongomock.collection.Collection, "create_index", autospec=True,
+                             side_effect=create_index) as created:
+            self.assertIsNotNone(get_latest_snapshot("week"))
+            self.assertIsNotNone(get_latest_snapshot("week"))
+            self.assertIsNone(get_latest_snapshot("day"))
+
+        self.assertEqual(created.call_count, len(snapshot_store.PERIOD_START_FIELDS))
+
+    @patch.object(snapshot_store, "MONGO_URI", "mongodb://unreachable")
+    def test_unreachable_mongo_is_skipped_for_a_while(self):
+        client = MagicMock()
+        client.__getitem__.return_value.__getitem__.return_value.create_index.side_effect = \
+            TimeoutError("No servers found yet")
+        with patch("pymongo.MongoClient", return_value=client) as connect:
+            self.assertIsNone(get_latest_snapshot("week"))
+            self.assertIsNone(get_latest_snapshot("week"))
+            self.assertIsNone(get_latest_snapshot("day"))
+            # One attempt, not one server selection timeout per request
+            self.assertEqual(connect.call_count, 1)
+
+            # Once the window has passed, a new connection is tried
+            snapshot_store._retry_at = 0.0
+            self.assertIsNone(get_latest_snapshot("week"))
+            self.assertEqual(connect.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
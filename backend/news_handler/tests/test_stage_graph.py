@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+import sys
+import os
+
+# Add the backend directory to the Python path so stage_graph resolves
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from stage_graph import StageGraph
+
+
+class TestStageGraph(unittest.TestCase):
+    def test_stages_run_after_their_dependencies_with_results_in_listed_order(self):
+        graph = (StageGraph()
+                 .add("a", lambda: "a")
+                 .add("b", lambda: "b")
+                 .add("joined", lambda b, a: b + a, after=["b", "a"])
+                 .add("last", lambda joined: joined + "!", after=["joined"]))
+
+        finished = list(graph.run())
+
+        self.assertEqual([name for name, _ in finished][2:], ["joined", "last"])
+        self.assertEqual(dict(finished), {"a": "a", "b": "b", "joined": "ba", "last": "ba!"})
+
+    def test_unknown_dependency_is_rejected(self):
+        with self.assertRaises(ValueError):
+            StageGraph().add("b", lambda a: a, after=["a"])
+
+    def test_independent_stages_start_together(self):
+        # Each stage only returns once the other one has started
+        barrier = threading.Barrier(2, timeout=10)
+        graph = StageGraph().add("left", barrier.wait).add("right", barrier.wait)
+
+        self.assertEqual(sorted(name for name, _ in graph.run()), ["left", "right"])
+
+    def test_error_propagates_and_dependent_stages_never_start(self):
+        started, running = [], threading.Event()
+
+        def slow(_):
+            started.append("after_fast")
+            running.set()
+            time.sleep(0.1)
+
+        def fail():
+            running.wait(timeout=10)
+            raise RuntimeError("stage failed")
+
+        graph = (StageGraph()
+                 .add("fast", lambda: started.append("fast"))
+                 .add("fail", fail)
+                 .add("after_fail", lambda _: started.append("after_fail"), after=["fail"])
+                 .add("after_fast", slow, after=["fast"]))
+
+        with self.assertRaisesRegex(RuntimeError, "stage failed"):
+            list(graph.run())
+
+        # after_fast was already running and finishes; after_fail is dropped
+        self.assertEqual(started, ["fast", "after_fast"])
+        self.assertEqual(set(graph.timings_ms), {"fast", "fail", "after_fast"})
+
+    def test_timings_are_per_stage_wall_times(self):
+        graph = (StageGraph()
+                 .add("slow", lambda: time.sleep(0.1))
+                 .add("quick", lambda _: None, after=["slow"]))
+
+        list(graph.run())
+
+        self.assertGreaterEqual(graph.timings_ms["slow"], 100)
+        self.assertLess(graph.timings_ms["quick"], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+# Add the backend directory to the Python path so news_handler.* imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from summary_cache import SummaryCache
+from news_query import get_summary
+from news import News, Event
+
+
+def make_event(label, links):
+    return Event(event_id=str(label), summary="",
+                 news_list=[News("20240101T1200", link, link, f"summary of {link}") for link in links])
+
+
+class TestSummaryCache(unittest.TestCase):
+    def test_exact_and_near_matches(self):
+        cache = SummaryCache(near_match=0.75)
+        links = [f"http://example.com/{i}" for i in range(8)]
+        cache.put(links, 150, "gpt-4o", {"summary": "Chip rally"})
+
+        self.assertEqual(cache.get(reversed(links), 150, "gpt-4o")["summary"], "Chip rally")
+        # One article swapped out of eight: Jaccard 7/9 still reuses the summary
+        self.assertEqual(cache.get(links[:7] + ["http://example.com/new"], 150, "gpt-4o")["summary"], "Chip rally")
+        self.assertIsNone(cache.get(links[:4], 150, "gpt-4o"))
+        self.assertIsNone(cache.get(links, 100, "gpt-4o"))
+        self.assertIsNone(cache.get(links, 150, "gpt-4.1-nano"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["near_hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 3)
+
+    def test_lru_and_ttl_eviction(self):
+        cache = SummaryCache(max_entries=2, near_match=1)
+        cache.put(["a"], 150, "m", {"summary": "A"})
+        cache.put(["b"], 150, "m", {"summary": "B"})
+        cache.get(["a"], 150, "m")
+        cache.put(["c"], 150, "m", {"summary": "C"})
+        self.assertIsNone(cache.get(["b"], 150, "m"))
+        self.assertIsNotNone(cache.get(["a"], 150, "m"))
+
+        with patch("summary_cache.time.time", return_value=10 ** 12):
+            self.assertIsNone(cache.get(["a"], 150, "m"))
+
+    @patch("news_query.analyze_news_clusters")
+    def test_repeated_windows_skip_summary_calls(self, mock_analyze):
+        mock_analyze.side_effect = lambda clusters, max_words: [
+            {"summary": f"{len(texts)} articles", "topic": "Markets", "risk": 3, "opportunity": 7, "rationale": "r"}
+            for texts in clusters
+        ]
+        cache = SummaryCache(near_match=0.8)
+        first = {0: make_event(0, [f"a{i}" for i in range(10)]), 1: make_event(1, ["b0", "b1"])}
+        get_summary(first, mode="combined", cache=cache)
+        self.assertEqual(mock_analyze.call_count, 1)
+
+        # Cluster 0 gained one article, cluster 1 is unchanged: no new LLM request
+        second = {0: make_event(0, [f"a{i}" for i in range(11)]), 1: make_event(1, ["b1", "b0"])}
+        get_summary(second, mode="combined", cache=cache)
+        self.assertEqual(mock_analyze.call_count, 1)
+        self.assertEqual(second[0].summary, "10 articles")
+        self.assertEqual((second[1].risk, second[1].opportunity), (3, 7))
+
+        # A new cluster is the only one sent to the model
+        third = {0: make_event(0, [f"a{i}" for i in range(10)]), 2: make_event(2, ["c0"])}
+        get_summary(third, mode="combined", cache=cache)
+        self.assertEqual(mock_analyze.call_args[0][0], [["summary of c0"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
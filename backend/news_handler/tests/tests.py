@@ -1,9 +1,12 @@
 import unittest
 import random
 import hashlib
+import threading
 from unittest.mock import patch, MagicMock
 from news_query import data_to_news, cluster, get_summary, real_time_query, hash_event_label
 from news import News, Event
+from embeddings import embed_texts, make_batches
+from summary_cache import SummaryCache
 from datetime import datetime, timedelta
 
 
@@ -176,6 +179,82 @@ class TestNewsQuery(unittest.TestCase):
                 print(f"    Link: {news.link}")
                 print(f"    Post Time: {news.post_time}")
                 
+    @patch('news_query.topic_generator', return_value={"topic": "Markets"})
+    @patch('news_query.get_client')
+    def test_get_summary_concurrent(self, mock_get_client, mock_topic):
+        print("\nRunning test_get_summary_concurrent...")
+        # Every cluster's first request must be in flight at the same time to pass
+        in_flight = threading.Barrier(5, timeout=10)
+        others_done = threading.Event()
+        lock = threading.Lock()
+        requested, finished, retry_waited_for_others = set(), [], []
+
+        def fake_create(model, messages):
+            text = messages[1]["content"]
+            with lock:
+                first_request = text not in requested
+                requested.add(text)
+            if first_request:
+                in_flight.wait()
+            if text == "summary 3":
+                # The first call for cluster 3 hits a rate limit with a short retry hint
+                if first_request:
+                    raise Exception("Error code: 429 - rate_limit_exceeded. Please try again in 0.1s.")
+                retry_waited_for_others.append(others_done.wait(timeout=10))
+            with lock:
+                finished.append(text)
+                if len(finished) == 4:
+                    others_done.set()
+            return MagicMock(choices=[MagicMock(message=MagicMock(content=f"digest of {text}"))])
+
+        mock_client = mock_get_client.return_value
+        mock_client.chat.completions.create.side_effect = fake_create
+        events = {
+            label: Event(event_id=str(label), summary="",
+                         news_list=[News("20240101T1200", f"Title {label}", f"http://example.com/{label}", f"summary {label}")])
+            for label in [4, 2, 0, 3, 1]
+        }
+
+        updated = get_summary(events, max_concurrency=5, mode="per_event", cache=SummaryCache())
+
+        self.assertEqual(list(updated.keys()), [4, 2, 0, 3, 1])
+        for label, event in updated.items():
+            self.assertEqual(event.summary, f"digest of summary {label}")
+            self.assertEqual(event.topic, "Markets")
+        self.assertFalse(in_flight.broken)
+        # The rate-limited cluster waits for its retry; the others are not held up by it
+        self.assertEqual(sorted(finished[:4]), [f"summary {label}" for label in [0, 1, 2, 4]])
+        self.assertEqual(finished[4], "summary 3")
+        self.assertEqual(retry_waited_for_others, [True])
+
+    @patch('news_query.topic_generator', return_value={"topic": "Religion"})
+    @patch('news_query.get_client')
+    @patch('news_query.analyze_news_clusters')
+    def test_get_summary_combined_falls_back_per_cluster(self, mock_analyze, mock_get_client, mock_topic):
+        print("\nRunning test_get_summary_combined_falls_back_per_cluster...")
+        # The combined answer covers cluster 0 but its item for cluster 1 failed validation
+        mock_analyze.return_value = [
+            {"summary": "Fed holds rates", "topic": "Monetary Policy", "risk": 4, "opportunity": 6, "rationale": "Stable."},
+            None
+        ]
+        mock_client = mock_get_client.return_value
+        mock_client.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content="The Pope led a mass."))])
+        events = {
+            0: Event(event_id="0", summary="", news_list=[News("20240101T1200", "Fed", "http://example.com/0", "The Fed held rates.")]),
+            1: Event(event_id="1", summary="", news_list=[News("20240101T1200", "Pope", "http://example.com/1", "The Pope led a mass.")]),
+        }
+
+        updated = get_summary(events, mode="combined", cache=SummaryCache())
+
+        mock_analyze.assert_called_once_with([["The Fed held rates."], ["The Pope led a mass."]], max_words=150)
+        self.assertEqual(updated[0].summary, "Fed holds rates")
+        self.assertEqual((updated[0].risk, updated[0].opportunity), (4, 6))
+        # Only the uncovered cluster pays for the per-event summary + topic calls
+        self.assertEqual(mock_client.chat.completions.create.call_count, 1)
+        self.assertEqual(updated[1].summary, "The Pope led a mass.")
+        self.assertEqual(updated[1].topic, "Religion")
+
     def test_hash_event_label(self):
         print("\nRunning test_hash_event_label...")
         labels = [0, 1, 0, 2]
@@ -204,7 +283,7 @@ class TestNewsQuery(unittest.TestCase):
             self.assertEqual(events[label].summary, event.summary)
             self.assertEqual(events[label].news_list, event.news_list)
     
-    @patch('news_query.requests.get')
+    @patch('news_handler.alpha_vantage.session.get')
     def test_real_time_query(self, mock_get):
         print("\nRunning test_real_time_query...")
         # Mock the API response
@@ -238,6 +317,27 @@ class TestNewsQuery(unittest.TestCase):
         self.assertIn("Percentage", result[0])
         self.assertIn("Event", result[0])
 
+
+    def test_embed_texts_keeps_order(self):
+        print("\nRunning test_embed_texts_keeps_order...")
+        texts = [f"summary {i}" for i in range(23)]
+
+        def fake_create(input, model):
+            # Answer in reverse order; embed_texts must put items back by index
+            data = [MagicMock(index=i, embedding=[float(texts.index(t))]) for i, t in enumerate(input)]
+            return MagicMock(data=list(reversed(data)))
+
+        client = MagicMock()
+        client.embeddings.create.side_effect = fake_create
+        stats = []
+        embeddings = embed_texts(client, texts, batch_size=5, max_concurrency=3, stats=stats)
+
+        self.assertEqual(embeddings, [[float(i)] for i in range(23)])
+        self.assertEqual(client.embeddings.create.call_count, 5)
+        self.assertEqual(sorted(s["batch"] for s in stats), [0, 1, 2, 3, 4])
+        self.assertEqual([len(b) for b in make_batches(texts, batch_size=10, max_chars=30)],
+                         [3, 3, 3, 3, 3, 3, 3, 2])
+
             
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
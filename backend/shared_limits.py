@@ -0,0 +1,167 @@
+# shared_limits.py
+# Description: LLM admission state shared by every process on the host (web workers,
+# backfill pools): per-model token buckets, rate-limit pauses and queued interactive
+# callers, kept in one SQLite file next to the job queue
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+LLM_LIMITS_PATH = os.getenv("LLM_LIMITS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs", "llm_limits.db"))
+# A process that stopped polling (e.g. crashed) no longer holds batch callers back after this long
+WAITER_TTL_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    model TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    level REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (model, kind)
+);
+CREATE TABLE IF NOT EXISTS pauses (
+    model TEXT PRIMARY KEY,
+    until REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    pid INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (pid, model)
+);
+"""
+
+
+class SharedLimits:
+    """
+    Token buckets and pauses in SQLite, so every process admitting LLM calls draws
+    from the same quota. Bucket rates and capacities come from the caller (anything
+    with `rate` per second and `capacity`, e.g. a TokenBucket); only levels are stored.
+
+    Each check runs in one IMMEDIATE transaction: the buckets are refilled from their
+    last update (wall clock, since processes do not share a monotonic clock) and the
+    request is taken only if every bucket can cover it. Processes record how many
+    interactive callers they have queued per model; batch callers in any process wait
+    while another process has one queued. Counts not refreshed within
+    WAITER_TTL_SECONDS are ignored.
+    """
+
+    def __init__(self, path: str = LLM_LIMITS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # A forked worker must not reuse its parent's connection
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            self._pid = os.getpid()
+        return self._db
+
+    def _transaction(self, work):
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(db, time.time())
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return result
+
+    @staticmethod
+    def _level(db, model: str, kind: str, bucket, now: float) -> float:
+        row = db.execute("SELECT level, updated FROM buckets WHERE model = ? AND kind = ?", (model, kind)).fetchone()
+        if row is None:
+            return bucket.capacity
+        level, updated = row
+        return min(bucket.capacity, level + max(0.0, now - updated) * bucket.rate)
+
+    @staticmethod
+    def _set_level(db, model: str, kind: str, level: float, now: float) -> None:
+        db.execute("INSERT OR REPLACE INTO buckets (model, kind, level, updated) VALUES (?, ?, ?, ?)",
+                   (model, kind, level, now))
+
+    def admit(self, model: str, demands: dict, batch: bool, reserve: float, poll_seconds: float) -> float:
+        """
+        Take demands ({kind: (bucket, amount)}) from the model's buckets.
+
+        Batch callers leave `reserve` (a fraction of each bucket) behind and wait while
+        another process has interactive callers queued for the model.
+
+        Returns:
+            0 when admitted, otherwise the seconds to wait before trying again.
+        """
+        def work(db, now):
+            if not batch:
+                # Keeps this process's queued interactive callers visible to the others
+                db.execute("UPDATE waiters SET updated = ? WHERE pid = ? AND model = ?", (now, os.getpid(), model))
+            row = db.execute("SELECT until FROM pauses WHERE model = ?", (model,)).fetchone()
+            if row and row[0] > now:
+                return row[0] - now
+            if batch and db.execute(
+                    "SELECT 1 FROM waiters WHERE model = ? AND pid != ? AND count > 0 AND updated > ?",
+                    (model, os.getpid(), now - WAITER_TTL_SECONDS)).fetchone():
+                return poll_seconds
+            levels, wait = {}, 0.0
+            for kind, (bucket, amount) in demands.items():
+                levels[kind] = self._level(db, model, kind, bucket, now)
+                kept = reserve * bucket.capacity if batch else 0.0
+                missing = amount + min(kept, bucket.capacity - amount) - levels[kind]
+                wait = max(wait, missing / bucket.rate)
+            if wait > 0:
+                return wait
+            for kind, (bucket, amount) in demands.items():
+                self._set_level(db, model, kind, levels[kind] - amount, now)
+            return 0.0
+        return self._transaction(work)
+
+    def adjust(self, model: str, kind: str, bucket, amount: float) -> None:
+        """Take (positive) or give back (negative) after the fact; the level may go below zero."""
+        def work(db, now):
+            self._set_level(db, model, kind, min(bucket.capacity, self._level(db, model, kind, bucket, now) - amount), now)
+        self._transaction(work)
+
+    def pause(self, model: str, seconds: float) -> float:
+        """Pause the model for every process; returns how long the caller should wait."""
+        def work(db, now):
+            row = db.execute("SELECT until FROM pauses WHERE model = ?", (model,)).fetchone()
+            if row and row[0] > now:
+                # Join the window another caller already opened
+                return row[0] - now
+            db.execute("INSERT OR REPLACE INTO pauses (model, until) VALUES (?, ?)", (model, now + seconds))
+            return seconds
+        return self._transaction(work)
+
+    def set_waiting(self, model: str, count: int) -> None:
+        """Record how many interactive callers this process has queued for the model."""
+        def work(db, now):
+            db.execute("INSERT OR REPLACE INTO waiters (pid, model, count, updated) VALUES (?, ?, ?, ?)",
+                       (os.getpid(), model, count, now))
+        self._transaction(work)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None and self._pid == os.getpid():
+                self._db.close()
+            self._db = None
+
+
+_shared = None
+
+
+def get_shared_limits(path: Optional[str] = None) -> SharedLimits:
+    global _shared
+    if path is not None:
+        return SharedLimits(path)
+    if _shared is None:
+        _shared = SharedLimits()
+    return _shared
@@ -0,0 +1,105 @@
+# single_flight.py
+# Description: coalesce concurrent computations of the same cache key
+
+import os
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Tuple
+
+from filelock import FileLock
+
+
+class ComputationInterrupted(RuntimeError):
+    """Given to followers when the leader stopped without a result (e.g. its client went away)."""
+
+
+class SingleFlight:
+    """
+    Request coalescing for cache misses.
+
+    Within a process, the first caller for a key (the leader) computes the value and
+    every concurrent caller for the same key waits on the leader's Future. Across
+    worker processes, leaders serialize on a per-key file lock and re-check the cache
+    once they hold it, so a process that waited reuses the value another process
+    just stored instead of recomputing it.
+    """
+
+    def __init__(self, lock_dir: str, lock_timeout: float = 600):
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self.coalesced = 0  # requests served by someone else's computation
+        self.computed = 0   # computations actually run
+        self._inflight = {}
+        self._lock = threading.Lock()
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def _lock_path(self, key: str) -> str:
+        return os.path.join(self.lock_dir, hashlib.sha256(key.encode()).hexdigest()[:32] + ".lock")
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """
+        Register interest in key. Returns (future, is_leader); a leader must call
+        finish() exactly once, followers just wait on the future.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def finish(self, key: str, future: Future, value: Any = None, error: Optional[BaseException] = None):
+        """
+        Publish the leader's result (or error) to its followers. Followers only catch
+        Exception, so a GeneratorExit or KeyboardInterrupt of the leader reaches them
+        as ComputationInterrupted.
+        """
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None and not isinstance(error, Exception):
+            error = ComputationInterrupted(f"Computation of {key} was interrupted ({type(error).__name__}); retry")
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def do(self, key: str, compute: Callable[[], Any], lookup: Callable[[], Any]) -> Any:
+        """
+        Return the value for key, running compute() at most once at a time per key.
+
+        Args:
+            key: Cache key being computed.
+            compute: Computes the value and stores it in the shared cache.
+            lookup: Reads the shared cache; returns None on a miss.
+        """
+        future, is_leader = self.join(key)
+        if not is_leader:
+            return future.result()
+
+        try:
+            with FileLock(self._lock_path(key), timeout=self.lock_timeout):
+                # Another worker process may have filled the cache while we waited for the lock
+                value = lookup()
+                if value is not None:
+                    with self._lock:
+                        self.coalesced += 1
+                else:
+                    value = compute()
+                    with self._lock:
+                        self.computed += 1
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, value=value)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "saved_requests": self.coalesced,
+                "computations": self.computed,
+                "in_flight": len(self._inflight),
+            }
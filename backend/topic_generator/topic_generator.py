@@ -2,19 +2,24 @@
 # Author: ray
 # Description: generate topic + risk/opportunity based on the given summary
 
-from typing import List
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
 import os
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clients import get_openai_client, get_async_openai_client, load_env
+from llm_gateway import gateway
 
 # Load environment variables
-load_dotenv()
-OPENAI_API_KEY = os.getenv("EVENT_PREDICTION_OPENAI_API_KEY")
+load_env()
 
-# Setup OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+def get_client():
+    # Shared OpenAI client, created on first use (see clients.py)
+    return get_openai_client("EVENT_PREDICTION_OPENAI_API_KEY")
+
+def get_async_client():
+    return get_async_openai_client("EVENT_PREDICTION_OPENAI_API_KEY")
 
 # Define models
 class TopicResult(BaseModel):
@@ -25,9 +30,20 @@ class RiskOpportunityResult(BaseModel):
     opportunity: int
     rationale: str
 
+class ClusterAnalysis(BaseModel):
+    cluster_id: int
+    summary: str = Field(min_length=1)
+    topic: str = Field(min_length=1)
+    risk: int = Field(ge=1, le=10)
+    opportunity: int = Field(ge=1, le=10)
+    rationale: str
+
+COMBINED_ANALYSIS_MODEL = os.getenv("COMBINED_ANALYSIS_MODEL", "gpt-4o")
+
 def topic_generator(summary: str) -> str:
     """Simple function to just generate a topic for one summary (legacy version)"""
-    completion = client.beta.chat.completions.parse(
+    parsed = gateway.parse_model(
+        get_client(), "topic_generator",
         model="gpt-4o",
         messages=[
             {"role": "system", "content": "Generate a topic (1 to 3 words) based on the given summary of financial events."},
@@ -35,7 +51,7 @@ def topic_generator(summary: str) -> str:
         ],
         response_format=TopicResult
     )
-    response_content = completion.choices[0].message.parsed.model_dump()
+    response_content = parsed.model_dump()
     return response_content
 
 def analyze_clusters(summaries: List[str]) -> List[dict]:
@@ -54,7 +70,8 @@ def analyze_clusters(summaries: List[str]) -> List[dict]:
         {"role": "user", "content": json.dumps(summaries)}
     ]
 
-    topic_resp = client.chat.completions.create(
+    topic_resp = gateway.complete(
+        get_client(),
         model="gpt-4o",
         messages=topic_messages,
         temperature=0.2,
@@ -86,7 +103,8 @@ def analyze_clusters(summaries: List[str]) -> List[dict]:
     ]
 
 
-    ro_resp = client.chat.completions.create(
+    ro_resp = gateway.complete(
+        get_client(),
         model="gpt-4.1-nano",
         messages=ro_messages,
         temperature=0.6,
@@ -114,6 +132,65 @@ def analyze_clusters(summaries: List[str]) -> List[dict]:
 
     return combined
 
+def _cluster_analysis_request(clusters: List[List[str]], max_words: int) -> dict:
+    """Chat completion arguments for analyze_news_clusters()."""
+    payload = [{"cluster_id": idx, "news": news} for idx, news in enumerate(clusters)]
+    messages = [
+        {"role": "system", "content": (
+            "You are a data-driven financial analyst. "
+            "The user sends a JSON array of news clusters; each has a cluster_id and the summaries of its articles. "
+            "For every cluster return:\n"
+            f"• summary: a concise summary of the cluster's news in no more than {max_words} words\n"
+            "• topic: a topic of 1 to 3 words\n"
+            "• risk: an integer from 1 to 10 (10 = highest risk)\n"
+            "• opportunity: an integer from 1 to 10 (10 = greatest upside potential)\n"
+            "• rationale: one sentence explaining the scores\n\n"
+            "Reply only with a JSON object of the form "
+            "{\"clusters\": [{\"cluster_id\": int, \"summary\": str, \"topic\": str, "
+            "\"risk\": int, \"opportunity\": int, \"rationale\": str}]} "
+            "with exactly one item per input cluster."
+        )},
+        {"role": "user", "content": json.dumps(payload)}
+    ]
+    return {
+        "model": COMBINED_ANALYSIS_MODEL,
+        "messages": messages,
+        "temperature": 0.2,
+        "response_format": {"type": "json_object"},
+    }
+
+def _parse_cluster_analysis(content: str, num_clusters: int) -> List[Optional[dict]]:
+    items = json.loads(content).get("clusters", [])
+
+    # Validate item by item so one malformed cluster does not discard the rest
+    results = [None] * num_clusters
+    for item in items:
+        try:
+            analysis = ClusterAnalysis.model_validate(item)
+        except ValidationError as e:
+            print(f"[Combined analysis] invalid item skipped: {e}")
+            continue
+        if 0 <= analysis.cluster_id < num_clusters and results[analysis.cluster_id] is None:
+            results[analysis.cluster_id] = analysis.model_dump(exclude={"cluster_id"})
+    return results
+
+def analyze_news_clusters(clusters: List[List[str]], max_words: int = 150) -> List[Optional[dict]]:
+    """
+    Summarize, title and score every news cluster in a single request.
+
+    clusters: one list of article summaries per cluster.
+    Returns one dict per cluster (ClusterAnalysis fields without cluster_id), in input
+    order. An entry is None when the model skipped that cluster or its item failed
+    validation, so callers can fall back for just that cluster.
+    """
+    resp = gateway.complete(get_client(), **_cluster_analysis_request(clusters, max_words))
+    return _parse_cluster_analysis(resp.choices[0].message.content, len(clusters))
+
+async def analyze_news_clusters_async(clusters: List[List[str]], max_words: int = 150) -> List[Optional[dict]]:
+    """analyze_news_clusters() on the async client."""
+    resp = await gateway.complete_async(get_async_client(), **_cluster_analysis_request(clusters, max_words))
+    return _parse_cluster_analysis(resp.choices[0].message.content, len(clusters))
+
 if __name__ == "__main__":
     # Example usage
     example_summaries = [